@@ -0,0 +1,14 @@
+-- ncar_downloader.py 의 일괄 기록(ON CONFLICT (file_name))과 크기/체크섬 저장을 위한 변경
+
+-- 예전 한 건씩 기록하며 생긴 중복 파일 이름이 있으면 가장 먼저 들어간 행만 남김
+DELETE FROM downloaded_ncar_files a
+    USING downloaded_ncar_files b
+    WHERE a.file_name = b.file_name AND a.id > b.id;
+
+ALTER TABLE downloaded_ncar_files
+    ADD COLUMN IF NOT EXISTS file_size BIGINT,
+    ADD COLUMN IF NOT EXISTS md5 CHAR(32),
+    ADD COLUMN IF NOT EXISTS downloaded_at TIMESTAMP DEFAULT now();
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_downloaded_ncar_files_file_name
+    ON downloaded_ncar_files (file_name);
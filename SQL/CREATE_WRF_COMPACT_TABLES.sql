@@ -0,0 +1,32 @@
+-- 도메인별 정적 격자 (XLAT/XLONG 은 모든 시각에 동일하므로 한 번만 저장)
+CREATE TABLE IF NOT EXISTS wrf_domain_grid (
+    domain VARCHAR(20) PRIMARY KEY,
+    ny INTEGER NOT NULL,
+    nx INTEGER NOT NULL,
+    xlat BYTEA NOT NULL,   -- float32 little-endian, (ny, nx)
+    xlong BYTEA NOT NULL   -- float32 little-endian, (ny, nx)
+);
+
+-- 시각별 필드: T2(°C), 연직 평균 후 질량 격자로 보간한 U/V
+-- encoding = 'float32' 이면 scale/offset 은 NULL,
+-- encoding = 'int16'   이면 값 = 저장값 * scale + offset (-32768 = 결측)
+CREATE TABLE IF NOT EXISTS wrf_fields (
+    domain VARCHAR(20) NOT NULL REFERENCES wrf_domain_grid (domain),
+    timestamp TIMESTAMP NOT NULL,
+    encoding VARCHAR(10) NOT NULL,
+    t2 BYTEA NOT NULL,
+    t2_scale REAL,
+    t2_offset REAL,
+    u BYTEA NOT NULL,
+    u_scale REAL,
+    u_offset REAL,
+    v BYTEA NOT NULL,
+    v_scale REAL,
+    v_offset REAL,
+    PRIMARY KEY (domain, timestamp)
+);
+
+-- 부동소수 배열은 압축 효과가 작으므로 TOAST 압축을 끄고 바로 읽도록 함
+ALTER TABLE wrf_fields ALTER COLUMN t2 SET STORAGE EXTERNAL;
+ALTER TABLE wrf_fields ALTER COLUMN u SET STORAGE EXTERNAL;
+ALTER TABLE wrf_fields ALTER COLUMN v SET STORAGE EXTERNAL;
@@ -0,0 +1,12 @@
+-- 시간 범위 조회(iter_nc_range / iter_nc_timestamps)와 적재 시 ON CONFLICT (timestamp) 를 위한 고유 인덱스
+
+-- 예전 노트북 적재로 생긴 중복 시각이 있으면 가장 먼저 들어간 행만 남김
+DELETE FROM WRF_2024_01_NC a
+    USING WRF_2024_01_NC b
+    WHERE a.timestamp = b.timestamp AND a.id > b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_wrf_2024_01_nc_timestamp
+    ON WRF_2024_01_NC (timestamp);
+
+-- 고유 인덱스로 대체된 이전 일반 인덱스
+DROP INDEX IF EXISTS idx_wrf_2024_01_nc_timestamp;
@@ -0,0 +1,228 @@
+"""렌더링된 PNG 프레임들을 애니메이션 파일로 인코딩 (GIF / WebP / MP4 / WebM)
+
+- gif : 모든 프레임에 공통 팔레트 하나를 한 번만 계산해 적용 (프레임별 양자화 없음)
+- webp: ffmpeg(libwebp_anim) 이 있으면 PNG 를 흘려보내 인코딩, 없으면 Pillow 애니메이션 WebP
+- mp4 / webm: PNG 바이트를 그대로 ffmpeg 표준 입력으로 흘려보내 인코딩 (WRF_FFMPEG)
+
+    report = encode_animation(pngs, '/tmp/out.mp4', 'mp4', fps=2)
+    report['bytes'], report['seconds']
+
+프레임은 목록 대신 생성기로 줄 수도 있다 (렌더링되는 대로 인코더로 흘러가고 PNG 목록을 만들지 않음).
+"""
+import io
+import os
+import shutil
+import subprocess
+import threading
+import itertools
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from PIL import Image
+
+FFMPEG = os.environ.get('WRF_FFMPEG', 'ffmpeg')
+# 동영상 가로 최대 픽셀 (70인치 x 100dpi 프레임은 재생기 제한을 넘으므로 줄임)
+VIDEO_MAX_WIDTH = int(os.environ.get('WRF_VIDEO_MAX_WIDTH', '3840'))
+# 공통 팔레트를 만들 때 프레임을 이 가로 크기로 줄여 표본으로 사용
+PALETTE_SAMPLE_WIDTH = 512
+PALETTE_SAMPLE_FRAMES = 8
+
+FORMATS: Dict[str, dict] = {
+    'gif': {'mime': 'image/gif', 'suffix': '.gif'},
+    'webp': {'mime': 'image/webp', 'suffix': '.webp'},
+    'mp4': {'mime': 'video/mp4', 'suffix': '.mp4'},
+    'webm': {'mime': 'video/webm', 'suffix': '.webm'},
+}
+DEFAULT_FORMAT = 'gif'
+
+FFMPEG_CODECS = {
+    'mp4': ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23', '-pix_fmt', 'yuv420p',
+            '-movflags', '+faststart'],
+    'webm': ['-c:v', 'libvpx-vp9', '-crf', '35', '-b:v', '0', '-row-mt', '1', '-deadline', 'realtime',
+             '-cpu-used', '8', '-pix_fmt', 'yuv420p'],
+    # 애니메이션 WebP (ffmpeg 이 없으면 Pillow 로 저장)
+    'webp': ['-f', 'webp', '-c:v', 'libwebp_anim', '-lossless', '0', '-compression_level', '2',
+             '-loop', '0', '-pix_fmt', 'yuv420p'],
+}
+
+
+# ffmpeg 없이는 만들 수 없는 형식
+VIDEO_FORMATS = ('mp4', 'webm')
+
+
+class EncoderUnavailable(RuntimeError):
+    """요청한 형식을 이 서버에서 인코딩할 수 없음 (ffmpeg 없음 등)"""
+
+
+def parse_format(value: Optional[str]) -> str:
+    """형식 이름 검사 (잘못된 값은 ValueError)"""
+    fmt = (value or DEFAULT_FORMAT).lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown animation format: {value} (choose from {', '.join(FORMATS)})")
+    return fmt
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG) is not None
+
+
+def available_formats() -> List[str]:
+    return [fmt for fmt in FORMATS if fmt not in VIDEO_FORMATS or ffmpeg_available()]
+
+
+def _open_frame(frame: bytes) -> Image.Image:
+    return Image.open(io.BytesIO(frame)).convert('RGB')
+
+
+def global_palette(frames: List[bytes], colors: int = 256) -> Image.Image:
+    """표본 프레임들을 줄여 이어 붙인 이미지로 팔레트를 한 번 계산 (표본만 하나씩 디코딩)"""
+    step = max(1, len(frames) // PALETTE_SAMPLE_FRAMES)
+    samples = frames[::step][:PALETTE_SAMPLE_FRAMES]
+    sheet = None
+    for i, frame in enumerate(samples):
+        image = _open_frame(frame)
+        if sheet is None:
+            width = min(PALETTE_SAMPLE_WIDTH, image.width)
+            height = max(1, round(image.height * width / image.width))
+            sheet = Image.new('RGB', (width, height * len(samples)))
+        sheet.paste(image.resize((width, height), Image.Resampling.BILINEAR), (0, i * height))
+        del image
+    return sheet.quantize(colors=colors, method=Image.Quantize.MEDIANCUT)
+
+
+def _indexed_frames(frames: Iterable[bytes], palette: Image.Image) -> Iterator[Image.Image]:
+    """프레임을 하나씩 디코딩해 공통 팔레트로 바꾸고 RGB 이미지는 바로 버림"""
+    for frame in frames:
+        yield _open_frame(frame).quantize(palette=palette, dither=Image.Dither.NONE)
+
+
+def encode_gif(frames: Iterable[bytes], save_path: str, fps: int = 2):
+    if isinstance(frames, list):
+        palette = global_palette(frames)
+    else:
+        # 생성기는 앞쪽 표본 프레임만 모아 팔레트를 만들고 나머지는 그대로 흘려보냄
+        frames = iter(frames)
+        head = list(itertools.islice(frames, PALETTE_SAMPLE_FRAMES))
+        palette = global_palette(head)
+        frames = itertools.chain(head, frames)
+    indexed = _indexed_frames(frames, palette)
+    first = next(indexed)
+    first.save(
+        save_path,
+        format='GIF',
+        save_all=True,
+        append_images=indexed,
+        duration=int(1000 / fps),
+        loop=0,
+        optimize=False,
+    )
+
+
+def _run_ffmpeg(command: List[str], frames: Iterable[bytes]):
+    """PNG 프레임을 ffmpeg(image2pipe) 표준 입력으로 흘려보내고 끝날 때까지 기다림"""
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    # stderr 파이프가 차서 ffmpeg 가 멈추지 않도록 쓰는 동안 따로 비움
+    stderr_chunks: List[bytes] = []
+    drain = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    drain.start()
+    try:
+        try:
+            for frame in frames:
+                process.stdin.write(frame)
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = process.wait()
+    finally:
+        # 프레임을 쓰다가 다른 예외가 나도 ffmpeg 가 남지 않도록 정리
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        drain.join()
+    stderr = b''.join(stderr_chunks)
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+
+
+def _ffmpeg_input(fps: int) -> List[str]:
+    return [FFMPEG, '-hide_banner', '-loglevel', 'error', '-y',
+            '-f', 'image2pipe', '-framerate', str(fps), '-c:v', 'png', '-i', '-']
+
+
+def encode_webp(frames: Iterable[bytes], save_path: str, fps: int = 2, quality: int = 80):
+    """애니메이션 WebP: ffmpeg(libwebp_anim) 이 있으면 프레임을 흘려보내고, 없으면 Pillow 로 저장
+
+    Pillow 경로는 모든 프레임을 RGB 이미지로 디코딩해 넘기므로 프레임 수만큼 메모리를 쓴다.
+    """
+    if ffmpeg_available():
+        _run_ffmpeg(_ffmpeg_input(fps) + [*FFMPEG_CODECS['webp'], '-quality', str(quality), save_path],
+                    frames)
+        return
+    images = [_open_frame(frame) for frame in frames]
+    images[0].save(
+        save_path,
+        format='WEBP',
+        save_all=True,
+        append_images=images[1:],
+        duration=int(1000 / fps),
+        loop=0,
+        quality=quality,
+        method=2,  # 4 이상은 70인치 프레임에서 크기 이득에 비해 너무 느림
+    )
+
+
+def encode_video(frames: Iterable[bytes], save_path: str, fmt: str, fps: int = 2):
+    """PNG 프레임을 ffmpeg(image2pipe) 로 흘려보내 mp4/webm 으로 인코딩"""
+    if not ffmpeg_available():
+        raise EncoderUnavailable(f"{fmt} encoding needs ffmpeg ({FFMPEG} not found)")
+    # 짝수 크기로 맞추고 너무 큰 프레임은 줄임 (yuv420p 요구 사항)
+    scale = f"scale='trunc(min(iw,{VIDEO_MAX_WIDTH})/2)*2':-2"
+    _run_ffmpeg(_ffmpeg_input(fps) + ['-vf', scale, *FFMPEG_CODECS[fmt], save_path], frames)
+
+
+def encode_animation(frames: Iterable[bytes], save_path: str, fmt: str = DEFAULT_FORMAT,
+                     fps: int = 2) -> dict:
+    """프레임들을 fmt 형식으로 save_path 에 저장하고 (형식, 크기, 인코딩 시간) 보고
+
+    생성기를 주면 인코딩 시간에 프레임을 만드는 시간도 포함된다.
+    """
+    fmt = parse_format(fmt)
+    t0 = time.perf_counter()
+    if not isinstance(frames, list):
+        frames = iter(frames)
+        first = next(frames, None)
+        if first is None:
+            raise ValueError("No frames to encode")
+        count = [0]
+
+        def counted(items):
+            for item in items:
+                count[0] += 1
+                yield item
+
+        frames = counted(itertools.chain([first], frames))
+    elif not frames:
+        raise ValueError("No frames to encode")
+    else:
+        count = [len(frames)]
+    if fmt == 'gif':
+        encode_gif(frames, save_path, fps)
+    elif fmt == 'webp':
+        encode_webp(frames, save_path, fps)
+    else:
+        encode_video(frames, save_path, fmt, fps)
+    report = {
+        'format': fmt,
+        'mime': FORMATS[fmt]['mime'],
+        'path': save_path,
+        'frames': count[0],
+        'bytes': os.path.getsize(save_path),
+        'seconds': round(time.perf_counter() - t0, 3),
+    }
+    print(f"{fmt} 인코딩 완료: {report['frames']}개 프레임, "
+          f"{report['bytes'] / 1024 / 1024:.2f} MiB, {report['seconds']:.2f}s")
+    return report
@@ -0,0 +1,70 @@
+"""시각별 단건 조회 vs. 풀 커넥션 범위 조회 성능 비교
+
+로컬 PostgreSQL에 대해 실행하려면 WRF_DB_HOST 등 환경 변수를 지정한다.
+    WRF_DB_HOST=localhost python bench_db_fetch.py --start 2024-01-01T00:00 --hours 24
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from wrf_db import DB_CONFIG, close_pool, iter_nc_range
+
+
+def fetch_per_frame(timestamps):
+    """기존 방식: 시각마다 새 연결 + 단건 SELECT"""
+    total_bytes = 0
+    for ts in timestamps:
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT nc_data FROM WRF_2024_01_NC WHERE timestamp = %s", (ts,))
+                result = cursor.fetchone()
+                if result is not None:
+                    total_bytes += len(result[0])
+        finally:
+            conn.close()
+    return total_bytes
+
+
+def fetch_range(start, end):
+    """새 방식: 풀 커넥션 + 서버 측 커서 범위 조회"""
+    total_bytes = 0
+    for _, nc_data in iter_nc_range(start, end):
+        total_bytes += len(nc_data)
+    return total_bytes
+
+
+def run(label, func, *args, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        nbytes = func(*args)
+        timings.append(time.perf_counter() - t0)
+    best = min(timings)
+    print(f"{label:<12} best {best:8.3f}s  mean {sum(timings) / len(timings):8.3f}s  "
+          f"{nbytes / 1024 / 1024:8.1f} MiB  {nbytes / 1024 / 1024 / best:8.1f} MiB/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--start', type=datetime.fromisoformat, default=datetime(2024, 1, 1))
+    parser.add_argument('--hours', type=int, default=24)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    start = args.start
+    end = start + timedelta(hours=args.hours - 1)
+    timestamps = [start + timedelta(hours=i) for i in range(args.hours)]
+    print(f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}  {start} ~ {end}")
+
+    per_frame = run('per-frame', fetch_per_frame, timestamps, repeat=args.repeat)
+    ranged = run('range', fetch_range, start, end, repeat=args.repeat)
+    print(f"speedup: {per_frame / ranged:.2f}x")
+    close_pool()
+
+
+if __name__ == '__main__':
+    main()
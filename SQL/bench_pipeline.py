@@ -0,0 +1,400 @@
+"""합성 wrfout 으로 조회/디코딩/처리/렌더링/인코딩 단계별 시간 측정 (JSON 출력)
+
+실제 WRF 출력이나 운영 DB 없이, wrf_synthetic 으로 만든 파일을 SQLite(WRF_2024_01_NC 대용)
+에 넣고 세 뷰어의 처리 경로를 단계별로 잰다. 조회는 wrf_db 의 함수를 그대로 쓰고
+커넥션만 SQLite 로 바꿔 끼운다 (use_sqlite_store).
+
+- DB 뷰어 (wrf_result_db_plot): fetch(wrf_db) -> decode(wrf_io) -> process_data -> plot_frame / render
+  -> encode (형식별)
+- Flask 뷰어 (wrf_result_plot): process_timestamp_data, create_animation (조회부터 GIF 저장까지)
+- 파일 뷰어 (wrf_result_nc_plot): process_file_data, create_animation (eager / lazy)
+
+결과를 --output 으로 저장해 두고 다음 버전에서 --baseline 으로 비교하면
+tolerance 보다 느려진 단계가 있을 때 종료 코드 1 을 반환한다.
+
+    python bench_pipeline.py --hours 12 --ny 120 --nx 150 --nz 30 --output bench.json
+    python bench_pipeline.py --hours 12 --ny 120 --nx 150 --nz 30 --baseline bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import matplotlib.pyplot as plt
+import numpy as np
+import xarray as xr
+
+import wrf_boundary
+import wrf_db
+from animation_encoder import FORMATS, available_formats, encode_animation
+from frame_renderer import FrameRenderer
+from wrf_cache import FrameCache, LRUCache
+from wrf_io import open_nc_bytes
+from wrf_synthetic import generate, write_boundary
+
+# 이보다 짧은 단계는 측정 잡음이 커서 회귀 판정에서 제외
+MIN_COMPARE_SECONDS = 0.005
+FIELD_VARIABLES = ['XLAT', 'XLONG', 'T2', 'U', 'V', 'U10', 'V10']
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_sqlite(db_path: str, files) -> sqlite3.Connection:
+    """WRF_2024_01_NC 와 같은 (timestamp, nc_data) 테이블에 파일 원본을 넣음"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE IF NOT EXISTS WRF_2024_01_NC "
+                 "(timestamp TEXT PRIMARY KEY, nc_data BLOB NOT NULL)")
+    with conn:
+        for ts, path in files:
+            with open(path, 'rb') as f:
+                conn.execute("INSERT OR REPLACE INTO WRF_2024_01_NC VALUES (?, ?)", (ts.isoformat(), f.read()))
+    return conn
+
+
+class _SQLiteCursor:
+    """wrf_db 가 쓰는 psycopg2 커서 사용법(%s, = ANY(%s), itersize)을 SQLite 로 옮김"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._cursor = conn.cursor()
+        self.itersize = wrf_db.RANGE_ITERSIZE
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+        return False
+
+    def execute(self, query: str, params: tuple = ()):
+        args = []
+        for param in params:
+            if isinstance(param, list):
+                # = ANY(%s) 는 IN (?, ?, ...) 로 펼침
+                query = query.replace('= ANY(%s)', f"IN ({', '.join('?' * len(param))})", 1)
+                args.extend(ts.isoformat() for ts in param)
+            else:
+                args.append(param.isoformat() if isinstance(param, datetime) else param)
+        self._cursor.execute(query.replace('%s', '?'), args)
+
+    @staticmethod
+    def _row(row):
+        # PostgreSQL 처럼 timestamp 열은 datetime 으로 돌려줌
+        return tuple(datetime.fromisoformat(value) if i == 0 and isinstance(value, str) else value
+                     for i, value in enumerate(row))
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return None if row is None else self._row(row)
+
+    def __iter__(self):
+        while True:
+            rows = self._cursor.fetchmany(self.itersize)
+            if not rows:
+                return
+            for row in rows:
+                yield self._row(row)
+
+
+class _SQLiteConnection:
+    closed = False
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def cursor(self, name: Optional[str] = None) -> _SQLiteCursor:
+        return _SQLiteCursor(self._conn)
+
+    def rollback(self):
+        pass
+
+
+@contextlib.contextmanager
+def use_sqlite_store(conn: sqlite3.Connection):
+    """with 블록 동안 wrf_db 의 조회 함수들이 풀 대신 이 SQLite 연결을 쓰게 함"""
+    original = wrf_db.pooled_connection
+
+    @contextlib.contextmanager
+    def pooled_connection(timeout: float = wrf_db.POOL_TIMEOUT):
+        yield _SQLiteConnection(conn)
+
+    wrf_db.pooled_connection = pooled_connection
+    try:
+        yield
+    finally:
+        wrf_db.pooled_connection = original
+
+
+class Stages:
+    """단계별 측정값 (반복 중 가장 빠른 값을 대표값으로 사용)"""
+
+    def __init__(self):
+        self.results: Dict[str, dict] = {}
+
+    def record(self, name: str, seconds: float, frames: int = 0, nbytes: int = 0):
+        entry = self.results.setdefault(name, {'runs': [], 'frames': frames, 'bytes': nbytes})
+        entry['runs'].append(seconds)
+        entry['frames'], entry['bytes'] = frames, nbytes
+
+    def time(self, name: str, func: Callable, *args, frames: int = 0, nbytes: int = 0):
+        t0 = time.perf_counter()
+        result = func(*args)
+        self.record(name, time.perf_counter() - t0, frames, nbytes)
+        return result
+
+    def summary(self) -> Dict[str, dict]:
+        out = {}
+        for name, entry in self.results.items():
+            best = min(entry['runs'])
+            out[name] = {
+                'seconds': round(best, 6),
+                'mean_seconds': round(sum(entry['runs']) / len(entry['runs']), 6),
+                'runs': [round(x, 6) for x in entry['runs']],
+                'frames': entry['frames'],
+                'per_frame_ms': round(best / entry['frames'] * 1000, 3) if entry['frames'] else None,
+                'bytes': entry['bytes'],
+            }
+        return out
+
+
+def bench_db_path(stages: Stages, processor, start: datetime, end: datetime, workdir: str,
+                  formats: List[str]):
+    """DB 뷰어 경로: 범위 조회(wrf_db) -> 메모리에서 열기(wrf_io) -> 필드 처리 -> 그리기 -> 인코딩"""
+    timestamps = [start + timedelta(hours=i) for i in range(int((end - start).total_seconds() // 3600) + 1)]
+
+    def fetch():
+        return list(wrf_db.iter_nc_timestamps(timestamps))
+
+    rows = stages.time('db.fetch', fetch)
+    n, nbytes = len(rows), sum(len(blob) for _, blob in rows)
+    stages.results['db.fetch']['frames'], stages.results['db.fetch']['bytes'] = n, nbytes
+
+    def decode():
+        datasets = []
+        for _, blob in rows:
+            ds = open_nc_bytes(blob)
+            datasets.append((ds, ds[[name for name in FIELD_VARIABLES if name in ds]].load()))
+        return datasets
+
+    datasets = stages.time('db.decode', decode, frames=n, nbytes=nbytes)
+
+    def process():
+        return [processor.process_data(loaded) for _, loaded in datasets]
+
+    fields = stages.time('db.process_data', process, frames=n)
+    for ds, loaded in datasets:
+        loaded.close()
+        ds.close()
+
+    style = processor.get_frame_style()
+
+    def plot():
+        # 렌더링 엔진을 거치지 않는 직렬 경로: figure 하나에 plot_frame 후 PNG 저장
+        fig, ax = plt.subplots(figsize=style['figsize'], dpi=style['dpi'])
+        try:
+            for f in fields:
+                ax.clear()
+                processor.plot_frame(ax, *f)
+                fig.savefig(io.BytesIO(), format='png', dpi=style['dpi'])
+        finally:
+            plt.close(fig)
+
+    stages.time('db.plot_frame', plot, frames=n)
+
+    frames = [processor._frame_data(ts, f) for (ts, _), f in zip(rows, fields)]
+    pngs = stages.time('db.render', processor.renderer.render, processor.shapefile_path, style, frames,
+                       frames=n)
+    stages.results['db.render']['bytes'] = sum(len(png) for png in pngs)
+    for fmt in formats:
+        path = os.path.join(workdir, 'db_animation' + FORMATS[fmt]['suffix'])
+        report = stages.time(f'db.encode.{fmt}', encode_animation, pngs, path, fmt, frames=n)
+        stages.results[f'db.encode.{fmt}']['bytes'] = report['bytes']
+        os.remove(path)
+
+
+def bench_flask_path(stages: Stages, module, processor, start: datetime, end: datetime, workdir: str):
+    """Flask 뷰어 경로: process_timestamp_data, create_animation (조회 -> 처리 -> 그리기 -> GIF)"""
+    timestamps = [start + timedelta(hours=i) for i in range(int((end - start).total_seconds() // 3600) + 1)]
+    rows = list(wrf_db.iter_nc_timestamps(timestamps))
+    n, nbytes = len(rows), sum(len(blob) for _, blob in rows)
+    datasets = [open_nc_bytes(blob) for _, blob in rows]
+    try:
+        stages.time('flask.process_timestamp_data',
+                    lambda: [processor.process_timestamp_data(ds) for ds in datasets], frames=n)
+    finally:
+        for ds in datasets:
+            ds.close()
+
+    # 결과 파일이 저장소의 static 폴더가 아니라 작업 폴더에 생기도록 함
+    module.STATIC_DIR = workdir
+    report = stages.time('flask.create_animation', processor.create_animation, timestamps,
+                         frames=n, nbytes=nbytes)
+    stages.results['flask.create_animation']['output_bytes'] = report['bytes']
+    os.remove(report['path'])
+
+
+def bench_nc_path(stages: Stages, processor, files, start: datetime, end: datetime, workdir: str,
+                  loaders: List[str]):
+    """파일 뷰어 경로: 파일별 process_file_data, 그리고 create_animation 전체"""
+    n = len(files)
+    nbytes = sum(os.path.getsize(path) for _, path in files)
+    stages.time('nc.process_file_data', lambda: [processor.process_file_data(path) for _, path in files],
+                frames=n, nbytes=nbytes)
+    for loader in loaders:
+        processor.loader = loader
+        path = stages.time(f'nc.create_animation.{loader}', processor.create_animation, start, end, workdir,
+                           frames=n, nbytes=nbytes)
+        report = processor.last_memory_report or {}
+        stages.results[f'nc.create_animation.{loader}']['peak_rss_mib'] = report.get('peak_rss_mib')
+        os.remove(path)
+
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """baseline 보다 tolerance 이상 느려진 단계 이름 목록"""
+    regressions = []
+    print(f"\n{'stage':<32}{'baseline':>12}{'current':>12}{'change':>10}", file=sys.stderr)
+    for name, entry in current.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        change = entry['seconds'] / base['seconds'] - 1 if base['seconds'] else 0.0
+        slow = (change > tolerance and entry['seconds'] - base['seconds'] > MIN_COMPARE_SECONDS)
+        if slow:
+            regressions.append(name)
+        print(f"{name:<32}{base['seconds']:>11.3f}s{entry['seconds']:>11.3f}s{change:>+9.0%}"
+              f"{'  <-- slower' if slow else ''}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WRF 처리/렌더링 단계별 벤치마크 (합성 wrfout)")
+    parser.add_argument('--hours', type=int, default=6)
+    parser.add_argument('--ny', type=int, default=60)
+    parser.add_argument('--nx', type=int, default=70)
+    parser.add_argument('--nz', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--render-workers', type=int, default=1,
+                        help="1 이면 현재 프로세스에서 직렬 렌더링 (측정이 안정적)")
+    parser.add_argument('--figsize', type=float, nargs=2, metavar=('W', 'H'),
+                        help="프레임 크기 재정의 (기본값은 각 뷰어의 설정)")
+    parser.add_argument('--wind-level', default=None)
+    parser.add_argument('--formats', default=','.join(available_formats()),
+                        help="인코딩할 형식 (쉼표로 구분, 기본값: 이 서버에서 가능한 전체)")
+    parser.add_argument('--skip-nc', action='store_true', help="파일 뷰어 경로를 건너뜀")
+    parser.add_argument('--workdir', help="합성 파일을 둘 폴더 (기본값: 임시 폴더, 끝나면 삭제)")
+    parser.add_argument('--output', help="결과 JSON 경로 (기본값: 표준 출력)")
+    parser.add_argument('--baseline', help="비교할 이전 결과 JSON")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    tmp = None if args.workdir else tempfile.TemporaryDirectory(prefix='wrf_bench_')
+    workdir = args.workdir or tmp.name
+    data_dir = os.path.join(workdir, 'wrf')
+    # 뷰어 모듈이 불러올 때 읽는 설정이므로 import 전에 지정 (작업 폴더 밖에 파일을 남기지 않음)
+    os.environ.setdefault('WRF_CATALOG_PATH', os.path.join(workdir, 'catalog.sqlite'))
+
+    start = datetime(2024, 1, 1)
+    end = start + timedelta(hours=args.hours - 1)
+    t0 = time.perf_counter()
+    files = generate(data_dir, start, args.hours, ny=args.ny, nx=args.nx, nz=args.nz)
+    shapefile = write_boundary(os.path.join(workdir, 'boundary', 'boundary.shp'))
+    # Flask 뷰어는 불러올 때 기본 경계로 처리기를 만들므로 합성 경계를 먼저 기본값으로 지정
+    wrf_boundary.DEFAULT_SHAPEFILE = shapefile
+    # 모듈/처리기를 만들 때의 경계 로드 메시지도 표준 출력의 JSON 과 섞이지 않게 함
+    with contextlib.redirect_stdout(sys.stderr):
+        import wrf_result_db_plot
+        import wrf_result_nc_plot
+        import wrf_result_plot
+        from wrf_loader import lazy_available
+
+    conn = load_sqlite(os.path.join(workdir, 'bench.sqlite'), files)
+    setup_seconds = time.perf_counter() - t0
+    print(f"합성 파일 {len(files)}개 준비 ({setup_seconds:.1f}s): {args.ny}x{args.nx}x{args.nz}", file=sys.stderr)
+
+    renderer = FrameRenderer(workers=args.render_workers)
+    db_processor = wrf_result_db_plot.WRFDataProcessor(
+        shapefile, cache=FrameCache(os.path.join(workdir, 'frame_cache')), fields=LRUCache(max_items=1),
+        renderer=renderer, source='blob', wind_level=args.wind_level)
+    nc_processor = None
+    loaders = ['eager'] + (['lazy'] if lazy_available() else [])
+    if not args.skip_nc:
+        nc_processor = wrf_result_nc_plot.WRFDataProcessor(
+            data_dir, shapefile, renderer=renderer, wind_level=args.wind_level)
+    if args.figsize:
+        for processor in (db_processor, nc_processor):
+            if processor is not None:
+                processor.frame_style['figsize'] = tuple(args.figsize)
+
+    flask_processor = wrf_result_plot.WRFDataProcessor(shapefile)
+
+    formats = [fmt for fmt in args.formats.split(',') if fmt]
+    stages = Stages()
+    try:
+        # 뷰어의 진행 메시지가 표준 출력의 JSON 과 섞이지 않도록 stderr 로 보냄
+        with contextlib.redirect_stdout(sys.stderr), use_sqlite_store(conn):
+            for i in range(args.repeat):
+                print(f"반복 {i + 1}/{args.repeat}")
+                bench_db_path(stages, db_processor, start, end, workdir, formats)
+                bench_flask_path(stages, wrf_result_plot, flask_processor, start, end, workdir)
+                if nc_processor is not None:
+                    bench_nc_path(stages, nc_processor, files, start, end, workdir, loaders)
+    finally:
+        renderer.close()
+        conn.close()
+        if tmp is not None:
+            tmp.cleanup()
+
+    result = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'xarray': xr.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'grid': {'ny': args.ny, 'nx': args.nx, 'nz': args.nz, 'hours': args.hours},
+            'repeat': args.repeat,
+            'render_workers': args.render_workers,
+            'figsize': args.figsize,
+            'wind_level': db_processor.wind_level,
+            'formats': formats,
+            'setup_seconds': round(setup_seconds, 3),
+        },
+        'stages': stages.summary(),
+    }
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"결과 저장: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('grid') != result['meta']['grid']:
+            print("경고: baseline 과 격자/시간 설정이 다릅니다.", file=sys.stderr)
+        regressions = compare(result['stages'], baseline['stages'], args.tolerance)
+        if regressions:
+            print(f"\n{args.tolerance:.0%} 이상 느려진 단계: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -145,8 +145,8 @@ pip show beautifulsoup4 &> /dev/null || pip install beautifulsoup4
 pip show nest_asyncio &> /dev/null || pip install nest_asyncio
 pip show asyncio &> /dev/null || pip install asyncio
 pip show flask &? /dev/null || pip install flask
-python3 $HOME/WRF/download_geog_data.py
-mv $HOME/WRF/static/geog_data/geog_high_res_mandatory.tar.gz $HOME/WRF/WPS_GEOG
+# 구간 병렬로 받으면서 WPS_GEOG 에 바로 압축 해제 (압축 파일을 따로 옮기거나 풀지 않음)
+python3 $HOME/WRF/geog_downloader.py --extract $HOME/WRF/WPS_GEOG
 
 
 # grib2 데이터 다운로드
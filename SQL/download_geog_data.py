@@ -1,9 +1,7 @@
-from flask import Flask, jsonify, send_from_directory
-import requests
-from bs4 import BeautifulSoup
+from flask import Flask, jsonify, request, send_from_directory
 import os
-from urllib.parse import urljoin
 from concurrent.futures import ThreadPoolExecutor
+from geog_downloader import DownloadError, download_extract, download_segmented, find_geog_url
 
 app = Flask(__name__)
 
@@ -11,46 +9,33 @@ app = Flask(__name__)
 STATIC_DIR = os.path.join(app.root_path, 'static')
 os.makedirs(STATIC_DIR, exist_ok=True)  # static 폴더가 없으면 생성
 
+# ?extract=1 일 때 압축을 바로 풀 WPS geog 폴더
+WPS_GEOG_DIR = os.environ.get('WRF_WPS_GEOG', os.path.expanduser('~/WRF/WPS_GEOG'))
+
 # 비동기 작업을 위한 ThreadPoolExecutor 설정
 executor = ThreadPoolExecutor(max_workers=2)
 
-def download_geod_data():
-    url = "https://www2.mmm.ucar.edu/wrf/users/download/get_sources_wps_geog.html"
-    response = requests.get(url)
-    response.raise_for_status()
-
-    # BeautifulSoup으로 HTML 파싱
-    soup = BeautifulSoup(response.text, "html.parser")
-
-    # 링크 추출
-    download_link = soup.select_one('td[bgcolor="#FFFFFF"] a[href="../../src/wps_files/geog_high_res_mandatory.tar.gz"]')
-    if download_link:
-        relative_file_url = download_link["href"]
-        file_url = urljoin(url, relative_file_url)
-        file_name = os.path.basename(relative_file_url)
-        save_path = os.path.join(STATIC_DIR, file_name)
-
-        # 파일 다운로드
-        file_response = requests.get(file_url, stream=True)
-        file_response.raise_for_status()
-
-        with open(save_path, "wb") as f:
-            for chunk in file_response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        print(f"파일이 다운로드되었습니다: {save_path}")
-        
-        # 파일 존재 여부 확인
-        if os.path.exists(save_path):
-            print(f"파일이 static 디렉토리에 저장되었습니다: {save_path}")
-        else:
-            print(f"파일 저장에 실패했습니다: {save_path}")
-        
-        return file_name
-    else:
+def download_geod_data(extract: bool = False):
+    """geog 아카이브를 구간 병렬로 받음 (extract 이면 WPS_GEOG 에 바로 압축 해제)"""
+    file_url = find_geog_url()
+    if file_url is None:
         print("다운로드 링크를 찾을 수 없습니다.")
         return None
 
+    file_name = os.path.basename(file_url)
+    if extract:
+        stats = download_extract(file_url, WPS_GEOG_DIR)
+        print(f"{stats['members']}개 파일을 {WPS_GEOG_DIR} 에 풀었습니다 "
+              f"({stats['seconds']}s, {stats['mib_per_s']} MiB/s)")
+        return stats
+
+    save_path = os.path.join(STATIC_DIR, file_name)
+    stats = download_segmented(file_url, save_path)
+    print(f"파일이 static 디렉토리에 저장되었습니다: {save_path} "
+          f"({stats['seconds']}s, {stats['mib_per_s']} MiB/s)")
+    stats['file_name'] = file_name
+    return stats
+
 @app.route('/')
 def home():
     return jsonify({"message": "Welcome to the File Download Service. Use /download to start the download."})
@@ -61,14 +46,21 @@ def favicon():
 
 @app.route('/download', methods=['GET'])
 def download():
+    extract = request.args.get('extract', '0').lower() in ('1', 'true', 'yes')
     # 비동기로 download_geod_data 함수를 실행
-    future = executor.submit(download_geod_data)
-    file_name = future.result()
+    future = executor.submit(download_geod_data, extract)
+    try:
+        stats = future.result()
+    except DownloadError as e:
+        return jsonify({"status": "error", "message": f"파일을 다운로드할 수 없습니다: {e}"}), 502
 
-    if file_name:
-        return jsonify({"status": "success", "file_url": f"/static/{file_name}"})
-    else:
+    if stats is None:
         return jsonify({"status": "error", "message": "파일을 다운로드할 수 없습니다."}), 404
+    throughput = {"seconds": stats['seconds'], "mib_per_s": stats['mib_per_s'], "bytes": stats['bytes']}
+    if extract:
+        return jsonify({"status": "success", "extracted_to": WPS_GEOG_DIR, "members": stats['members'],
+                        **throughput})
+    return jsonify({"status": "success", "file_url": f"/static/{stats['file_name']}", **throughput})
 
 @app.route('/static/<path:filename>')
 def serve_file(filename):
@@ -0,0 +1,330 @@
+"""프로세스 풀 기반 병렬 프레임 렌더링 엔진
+
+각 워커 프로세스는 자신의 figure와 경계(wrf_boundary, 단순화 경로)를 한 번만 만들어 재사용하고,
+엔진은 완료된 프레임(PNG 바이트)을 요청 순서대로 돌려준다.
+워커 수가 1 이하이면 같은 렌더링 함수를 현재 프로세스에서 직렬로 실행한다
+(figure 를 공유하므로 여러 요청 스레드가 동시에 그리지 않도록 잠금 안에서 실행).
+
+표시 범위(bbox)가 정해진 스타일은 FrameCompositor를 사용한다. 축/눈금/컬러바 배경과
+경계선/격자 오버레이를 (bbox, figsize, dpi)마다 한 번만 래스터화해 두고,
+프레임마다 기온 컨투어와 바람 벡터만 그린 뒤 그 위에 오버레이를 합성한다.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.collections import Collection
+import numpy as np
+from PIL import Image
+
+from animation_encoder import encode_gif
+from wrf_boundary import Boundary, draw_boundary, get_boundary
+
+# 워커마다 figure 한 장(70x70인치 @100dpi 이면 RGBA 버퍼만 약 196 MB)과 컴포지터 배경
+# (최대 MAX_COMPOSITORS 개)을 계속 들고 있으므로, 워커를 늘리면 그만큼 메모리가 늘어난다.
+# 기본값은 작게 두고 메모리가 충분한 서버에서만 WRF_RENDER_WORKERS 로 늘린다.
+RENDER_WORKERS = int(os.environ.get('WRF_RENDER_WORKERS', min(4, os.cpu_count() or 1)))
+
+# 워커 프로세스별 상태 (figure, 정적 레이어 재사용, 경계는 wrf_boundary 가 보관)
+_state = {'figures': {}, 'compositors': OrderedDict()}
+_state_lock = threading.Lock()
+MAX_COMPOSITORS = 4
+
+# 정적 레이어 모양을 결정하는 스타일 항목 (컴포지터 캐시 키)
+STATIC_STYLE_KEYS = ('figsize', 'dpi', 'bbox', 'colorbar_label', 'cmap', 'levels',
+                     'boundary_linewidth', 'grid_alpha', 'title_fontsize', 'title_pad')
+
+
+def _get_figure(style: dict):
+    """스타일의 (figsize, dpi, colorbar) 조합마다 figure 하나를 재사용"""
+    key = (tuple(style['figsize']), style['dpi'], style.get('colorbar_label'))
+    figure = _state['figures'].get(key)
+    if figure is None:
+        fig, ax = plt.subplots(figsize=style['figsize'], dpi=style['dpi'])
+        figure = {'fig': fig, 'ax': ax, 'colorbar': None}
+        _state['figures'][key] = figure
+    return figure
+
+
+def draw_frame(ax, boundary: Boundary, style: dict, frame: dict):
+    """한 프레임의 기온 컨투어, 바람 벡터, 경계선, 격자, 제목을 그린다"""
+    xlat, xlong = frame['xlat'], frame['xlong']
+    u, v = frame['u'], frame['v']
+
+    levels = np.arange(*style['levels'])
+    contour = ax.contourf(xlong, xlat, frame['t2'], cmap=style['cmap'], levels=levels)
+
+    stride = style.get('quiver_stride', 1)
+    quiver = ax.quiver(xlong[::stride, ::stride],
+                       xlat[::stride, ::stride],
+                       u[::stride, ::stride],
+                       v[::stride, ::stride],
+                       scale=style['quiver_scale'],
+                       color=style['quiver_color'],
+                       alpha=style.get('quiver_alpha'))
+
+    draw_boundary(ax, boundary, style)
+
+    bbox = style.get('bbox')
+    if bbox is not None:
+        ax.set_xlim(bbox[0], bbox[2])
+        ax.set_ylim(bbox[1], bbox[3])
+
+    ax.grid(True, linestyle='--', alpha=style.get('grid_alpha', 0.5))
+
+    if frame.get('title'):
+        ax.set_title(frame['title'], **_title_kwargs(style))
+
+    return contour, quiver
+
+
+def _title_kwargs(style: dict) -> dict:
+    title_kwargs = {}
+    if style.get('title_fontsize') is not None:
+        title_kwargs['fontsize'] = style['title_fontsize']
+    if style.get('title_pad') is not None:
+        title_kwargs['pad'] = style['title_pad']
+    return title_kwargs
+
+
+def _contour_artists(contour) -> list:
+    # matplotlib 3.8부터 ContourSet 자체가 Collection
+    if isinstance(contour, Collection):
+        return [contour]
+    return list(contour.collections)
+
+
+class FrameCompositor:
+    """정적 레이어를 한 번 래스터화해 두고 프레임마다 동적 레이어만 그려 합성"""
+
+    def __init__(self, boundary: Boundary, style: dict, first_frame: dict):
+        self.style = style
+        self.levels = np.arange(*style['levels'])
+        self.fig, self.ax = plt.subplots(figsize=style['figsize'], dpi=style['dpi'])
+        fig, ax = self.fig, self.ax
+
+        if style.get('colorbar_label'):
+            contour = ax.contourf(first_frame['xlong'], first_frame['xlat'], first_frame['t2'],
+                                  cmap=style['cmap'], levels=self.levels)
+            self.colorbar = fig.colorbar(contour, ax=ax, label=style['colorbar_label'])
+            for artist in _contour_artists(contour):
+                artist.remove()
+        else:
+            self.colorbar = None
+
+        lines = draw_boundary(ax, boundary, style)
+        boundary = [] if lines is None else [lines]
+
+        bbox = style['bbox']
+        ax.set_xlim(bbox[0], bbox[2])
+        ax.set_ylim(bbox[1], bbox[3])
+        ax.set_title(' ', **_title_kwargs(style))
+
+        # 1) 배경: 축 바탕, 눈금, 레이블, 컬러바 (경계선/격자/테두리 제외)
+        for artist in boundary:
+            artist.set_visible(False)
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+        ax.grid(False)
+        fig.canvas.draw()
+        self.background = fig.canvas.copy_from_bbox(fig.bbox)
+
+        # 2) 오버레이: 경계선, 격자, 테두리만 투명 바탕 위에 래스터화
+        for artist in boundary:
+            artist.set_visible(True)
+        for spine in ax.spines.values():
+            spine.set_visible(True)
+        ax.grid(True, linestyle='--', alpha=style.get('grid_alpha', 0.5))
+        fig.patch.set_alpha(0)
+        ax.patch.set_visible(False)
+        ax.tick_params(which='both', labelbottom=False, labelleft=False, length=0)
+        ax.title.set_visible(False)
+        ax.xaxis.label.set_visible(False)
+        ax.yaxis.label.set_visible(False)
+        if self.colorbar is not None:
+            self.colorbar.ax.set_visible(False)
+        fig.canvas.draw()
+        overlay = np.asarray(fig.canvas.buffer_rgba())
+        self._overlay_idx = np.nonzero(overlay[..., 3])
+        pixels = overlay[self._overlay_idx].astype(np.float32)
+        self._overlay_rgb = pixels[:, :3]
+        self._overlay_alpha = pixels[:, 3:4] / 255.0
+        ax.title.set_visible(True)
+
+    def render(self, frame: dict) -> bytes:
+        style, ax, canvas = self.style, self.ax, self.fig.canvas
+        canvas.restore_region(self.background)
+
+        xlat, xlong = frame['xlat'], frame['xlong']
+        u, v = frame['u'], frame['v']
+        stride = style.get('quiver_stride', 1)
+        contour = ax.contourf(xlong, xlat, frame['t2'], cmap=style['cmap'], levels=self.levels)
+        quiver = ax.quiver(xlong[::stride, ::stride],
+                           xlat[::stride, ::stride],
+                           u[::stride, ::stride],
+                           v[::stride, ::stride],
+                           scale=style['quiver_scale'],
+                           color=style['quiver_color'],
+                           alpha=style.get('quiver_alpha'))
+        dynamic = _contour_artists(contour) + [quiver]
+        for artist in dynamic:
+            ax.draw_artist(artist)
+        ax.title.set_text(frame.get('title') or ' ')
+        ax.draw_artist(ax.title)
+
+        image = np.array(canvas.buffer_rgba())
+        for artist in dynamic:
+            artist.remove()
+
+        # 경계선/격자 오버레이 알파 합성
+        rows, cols = self._overlay_idx
+        base = image[rows, cols, :3].astype(np.float32)
+        blended = self._overlay_rgb * self._overlay_alpha + base * (1.0 - self._overlay_alpha)
+        image[rows, cols, :3] = np.rint(blended).astype(np.uint8)
+
+        buf = io.BytesIO()
+        Image.fromarray(image, 'RGBA').save(buf, format='PNG')
+        return buf.getvalue()
+
+    def close(self):
+        plt.close(self.fig)
+
+
+def _get_compositor(shapefile_path: str, style: dict, frame: dict) -> FrameCompositor:
+    key = (shapefile_path,) + tuple(repr(style.get(name)) for name in STATIC_STYLE_KEYS)
+    compositors = _state['compositors']
+    compositor = compositors.get(key)
+    if compositor is None:
+        compositor = FrameCompositor(get_boundary(shapefile_path), style, frame)
+        compositors[key] = compositor
+        while len(compositors) > MAX_COMPOSITORS:
+            _, old = compositors.popitem(last=False)
+            old.close()
+    else:
+        compositors.move_to_end(key)
+    return compositor
+
+
+def _render_full(shapefile_path: str, style: dict, frame: dict) -> bytes:
+    """표시 범위가 없는 스타일: 매 프레임 전체를 다시 그린다"""
+    boundary = get_boundary(shapefile_path)
+    figure = _get_figure(style)
+    fig, ax = figure['fig'], figure['ax']
+
+    # 컬러바는 figure당 한 번만 첫 프레임의 컨투어로 추가
+    if style.get('colorbar_label') and figure['colorbar'] is None:
+        contour = ax.contourf(frame['xlong'], frame['xlat'], frame['t2'],
+                              cmap=style['cmap'], levels=np.arange(*style['levels']))
+        figure['colorbar'] = fig.colorbar(contour, ax=ax, label=style['colorbar_label'])
+
+    ax.clear()
+    draw_frame(ax, boundary, style, frame)
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=style['dpi'])
+    return buf.getvalue()
+
+
+def render_frame(shapefile_path: str, style: dict, frame: dict) -> bytes:
+    """한 프레임을 그려 PNG 바이트로 반환 (직렬/병렬 경로 공용)"""
+    with _state_lock:
+        if style.get('bbox') is None:
+            return _render_full(shapefile_path, style, frame)
+        return _get_compositor(shapefile_path, style, frame).render(frame)
+
+
+def _render_task(args) -> bytes:
+    return render_frame(*args)
+
+
+def _init_worker(pid_queue):
+    """워커 PID 를 부모에게 알림 (메모리 측정용)"""
+    pid_queue.put(os.getpid())
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class FrameRenderer:
+    """프레임 목록을 워커 프로세스들에 나누어 렌더링하고 순서대로 반환"""
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = RENDER_WORKERS if workers is None else workers
+        self._executor = None
+        self._pid_queue = None
+        self._pids = set()
+        self._pids_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 웹 서버의 스레드 상태를 물려받지 않도록 spawn 사용
+            context = multiprocessing.get_context('spawn')
+            self._pid_queue = context.SimpleQueue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._pid_queue,),
+            )
+        return self._executor
+
+    def render_iter(self, shapefile_path: str, style: dict,
+                    frames: Iterable[dict]) -> Iterator[bytes]:
+        """프레임을 렌더링하여 입력 순서대로 PNG 바이트를 생성"""
+        if self.workers <= 1:
+            for frame in frames:
+                yield render_frame(shapefile_path, style, frame)
+            return
+
+        executor = self._get_executor()
+        # 메모리 사용량을 제한하기 위해 워커 수의 2배까지만 동시에 제출
+        window = deque()
+        for frame in frames:
+            window.append(executor.submit(_render_task, (shapefile_path, style, frame)))
+            if len(window) >= self.workers * 2:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+    def worker_pids(self) -> List[int]:
+        """현재 살아 있는 워커 프로세스 PID (메모리 측정용, 풀이 없으면 빈 목록)"""
+        with self._pids_lock:
+            queue = self._pid_queue
+            if queue is None:
+                return []
+            while not queue.empty():
+                self._pids.add(queue.get())
+            self._pids = {pid for pid in self._pids if _alive(pid)}
+            return sorted(self._pids)
+
+    def render(self, shapefile_path: str, style: dict, frames: Iterable[dict]) -> List[bytes]:
+        return list(self.render_iter(shapefile_path, style, frames))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        with self._pids_lock:
+            if self._pid_queue is not None:
+                self._pid_queue.close()
+                self._pid_queue = None
+            self._pids = set()
+
+
+def save_gif(frames: List[bytes], save_path: str, fps: int = 2):
+    """PNG 프레임들을 GIF로 저장 (공통 팔레트, 다른 형식은 animation_encoder.encode_animation)"""
+    encode_gif(frames, save_path, fps)
@@ -0,0 +1,351 @@
+"""WPS geog 아카이브 구간 병렬 다운로드 (이어받기) + 받으면서 바로 압축 해제
+
+큰 아카이브 하나를 8 KiB 단위 단일 스트림으로 받던 방식 대신, 바이트 구간(Range)을
+workers 개 연결로 나누어 받는다.
+
+- 파일 모드: <파일>.part 의 각 구간 위치에 바로 쓰고, 구간별 진행을 <파일>.part.json 에
+  저장해 두어 중단 후 다시 실행하면 남은 부분만 받는다.
+- 압축 해제 모드 (extract_to): 구간을 메모리 창(window) 안에서 병렬로 받고 순서대로
+  tarfile(r|gz) 에 흘려보내 WPS_GEOG 에 바로 푼다. 압축 파일은 디스크에 남지 않는다.
+  끊긴 구간은 그 구간 안에서 이어받지만, 프로세스가 중단되면 처음부터 다시 받는다.
+
+새 노드에서 psycopg2 없이 실행되도록 requests / bs4 외의 의존성은 두지 않는다.
+
+    python geog_downloader.py --dest static
+    python geog_downloader.py --extract $HOME/WRF/WPS_GEOG --workers 8
+"""
+import argparse
+import io
+import json
+import os
+import re
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+
+CHUNK_SIZE = 1024 * 1024
+SEGMENT_SIZE = 64 * 1024 * 1024    # 파일 모드 구간 크기
+PIECE_SIZE = 16 * 1024 * 1024      # 압축 해제 모드 구간 크기 (메모리에 올라가는 단위)
+DEFAULT_WORKERS = int(os.environ.get('WRF_GEOG_WORKERS', '8'))
+RETRIES = 5
+TIMEOUT = (10, 60)
+REPORT_INTERVAL = 10.0
+HEADERS = {'User-Agent': 'Mozilla/5.0 (compatible; WRF geog downloader)'}
+GEOG_PAGE = "https://www2.mmm.ucar.edu/wrf/users/download/get_sources_wps_geog.html"
+GEOG_ARCHIVE = "../../src/wps_files/geog_high_res_mandatory.tar.gz"
+
+_CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+_local = threading.local()
+
+
+class DownloadError(Exception):
+    """다운로드 실패"""
+
+
+def _session() -> requests.Session:
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+        session.headers.update(HEADERS)
+    return session
+
+
+def find_geog_url(page: str = GEOG_PAGE) -> Optional[str]:
+    """WPS geog 다운로드 페이지에서 필수 고해상도 아카이브 링크를 찾음"""
+    response = requests.get(page, timeout=TIMEOUT)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.text, "html.parser")
+    link = soup.select_one(f'td[bgcolor="#FFFFFF"] a[href="{GEOG_ARCHIVE}"]')
+    return urljoin(page, link["href"]) if link else None
+
+
+def probe(url: str) -> Tuple[Optional[int], bool]:
+    """(전체 크기, Range 지원 여부)"""
+    with _session().get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        match = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+        if response.status_code == 206 and match and match.group(3) != '*':
+            return int(match.group(3)), True
+        length = response.headers.get('Content-Length')
+        return (int(length) if length is not None else None), False
+
+
+def fetch_range(url: str, start: int, end: int, sink: Callable[[bytes], None],
+                retries: int = RETRIES) -> int:
+    """[start, end] 구간을 받아 sink 로 넘김 (끊기면 받은 곳부터 다시 요청)"""
+    received = 0
+    for attempt in range(1, retries + 1):
+        offset = start + received
+        try:
+            headers = {'Range': f'bytes={offset}-{end}'}
+            with _session().get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+                match = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+                if response.status_code != 206 or not match or int(match.group(1)) != offset:
+                    raise DownloadError(f"{url}: 구간 요청 실패 (상태 코드 {response.status_code})")
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    chunk = chunk[:end + 1 - (start + received)]
+                    sink(chunk)
+                    received += len(chunk)
+            if start + received > end:
+                return received
+            raise DownloadError(f"{url}: 구간 {start}-{end} 가 {received} bytes 에서 끊겼습니다")
+        except (requests.RequestException, DownloadError) as e:
+            if attempt == retries:
+                raise DownloadError(str(e)) from e
+            print(f"구간 {start}-{end} 다시 시도 ({attempt}/{retries}): {e}")
+            time.sleep(min(2 ** attempt, 30))
+    return received
+
+
+class Throughput:
+    """받은 바이트 누적과 주기적 진행률 출력"""
+
+    def __init__(self, total: Optional[int], done: int = 0, interval: float = REPORT_INTERVAL):
+        self.total = total
+        self.done = done
+        self.received = 0
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._t0 = self._last = time.perf_counter()
+
+    def add(self, nbytes: int):
+        with self._lock:
+            self.done += nbytes
+            self.received += nbytes
+            now = time.perf_counter()
+            if now - self._last >= self.interval:
+                self._last = now
+                print(self.line())
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self._t0
+
+    @property
+    def mib_per_s(self) -> float:
+        return self.received / 1024 / 1024 / max(self.seconds, 1e-9)
+
+    def line(self) -> str:
+        gib = self.done / 1024 ** 3
+        total = f" / {self.total / 1024 ** 3:.2f} GiB" if self.total else ''
+        return f"{gib:.2f} GiB{total}, {self.mib_per_s:.1f} MiB/s"
+
+    def report(self) -> dict:
+        return {'bytes': self.received, 'seconds': round(self.seconds, 1),
+                'mib_per_s': round(self.mib_per_s, 1)}
+
+
+def _plan(size: int, segment_size: int) -> List[List[int]]:
+    """[시작, 끝, 받은 바이트] 구간 목록"""
+    return [[start, min(start + segment_size, size) - 1, 0] for start in range(0, size, segment_size)]
+
+
+def download_segmented(url: str, dest: str, workers: int = DEFAULT_WORKERS,
+                       segment_size: int = SEGMENT_SIZE) -> dict:
+    """url 을 구간 병렬로 dest 에 받음 (dest.part / dest.part.json 이 있으면 이어받기)"""
+    size, ranges = probe(url)
+    part, state_path = dest + '.part', dest + '.part.json'
+    if size is None or not ranges:
+        raise DownloadError(f"{url}: 서버가 Range 요청을 지원하지 않습니다")
+
+    segments = None
+    if os.path.exists(state_path) and os.path.exists(part):
+        with open(state_path) as f:
+            state = json.load(f)
+        if state.get('url') == url and state.get('size') == size:
+            segments = state['segments']
+    if segments is None:
+        segments = _plan(size, segment_size)
+        with open(part, 'wb') as f:
+            f.truncate(size)
+    done = sum(seg[2] for seg in segments)
+    if done:
+        print(f"{done / 1024 ** 3:.2f} GiB 까지 받은 파일을 이어받습니다.")
+
+    meter = Throughput(size, done)
+    state_lock = threading.Lock()
+    last_saved = [time.monotonic()]
+
+    def save_state(force: bool = False):
+        with state_lock:
+            if not force and time.monotonic() - last_saved[0] < 1.0:
+                return
+            last_saved[0] = time.monotonic()
+            tmp = state_path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump({'url': url, 'size': size, 'segments': segments}, f)
+            os.replace(tmp, state_path)
+
+    fd = os.open(part, os.O_WRONLY)
+
+    def run(segment):
+        start, end, received = segment
+
+        def sink(chunk):
+            os.pwrite(fd, chunk, start + segment[2])
+            segment[2] += len(chunk)
+            meter.add(len(chunk))
+            save_state()
+
+        if start + received <= end:
+            fetch_range(url, start + received, end, sink)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='geog-segment') as executor:
+            for future in [executor.submit(run, seg) for seg in segments]:
+                future.result()
+    finally:
+        os.close(fd)
+        save_state(force=True)
+
+    os.replace(part, dest)
+    os.remove(state_path)
+    stats = meter.report()
+    stats.update(path=dest, size=size)
+    return stats
+
+
+def _extract_stream(tar: tarfile.TarFile, extract_to: str) -> int:
+    """tar 스트림을 순서대로 풀고 파일 수를 반환"""
+    members = 0
+    with tar:
+        for member in tar:
+            # 아카이브 밖 경로/링크를 막는 data 필터 (지원하는 Python 에서만)
+            if hasattr(tarfile, 'data_filter'):
+                tar.extract(member, extract_to, filter='data')
+            else:
+                tar.extract(member, extract_to)
+            members += 1
+    return members
+
+
+class OrderedReader(io.RawIOBase):
+    """구간을 병렬로 받고 순서대로 읽게 해 주는 파일 객체
+
+    window 개 구간까지만 미리 받아 두므로 메모리는 window * piece_size 로 제한된다.
+    """
+
+    def __init__(self, url: str, size: int, workers: int = DEFAULT_WORKERS,
+                 piece_size: int = PIECE_SIZE, window: Optional[int] = None,
+                 meter: Optional[Throughput] = None):
+        self.url = url
+        self.pieces = _plan(size, piece_size)
+        self.meter = meter or Throughput(size)
+        self._ready: Dict[int, bytes] = {}
+        self._next = 0
+        self._buffer = memoryview(b'')
+        self._error = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._slots = threading.Semaphore(window or workers * 2)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='geog-piece')
+        self._feeder = threading.Thread(target=self._feed, name='geog-feeder', daemon=True)
+        self._feeder.start()
+
+    def _feed(self):
+        for index in range(len(self.pieces)):
+            self._slots.acquire()
+            if self._closed or self._error is not None:
+                return
+            self._executor.submit(self._fetch, index)
+
+    def _fetch(self, index: int):
+        start, end, _ = self.pieces[index]
+        parts = []
+
+        def sink(chunk):
+            parts.append(chunk)
+            self.meter.add(len(chunk))
+
+        try:
+            fetch_range(self.url, start, end, sink)
+            data, error = b''.join(parts), None
+        except Exception as e:
+            data, error = None, e
+        with self._cond:
+            if error is not None:
+                self._error = error
+            else:
+                self._ready[index] = data
+            self._cond.notify_all()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if not len(self._buffer):
+            if self._next >= len(self.pieces):
+                return 0
+            with self._cond:
+                while self._next not in self._ready and self._error is None:
+                    self._cond.wait()
+                if self._error is not None:
+                    raise DownloadError(str(self._error))
+                self._buffer = memoryview(self._ready.pop(self._next))
+            self._next += 1
+            self._slots.release()
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._slots.release()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        super().close()
+
+
+def download_extract(url: str, extract_to: str, workers: int = DEFAULT_WORKERS,
+                     piece_size: int = PIECE_SIZE) -> dict:
+    """아카이브를 구간 병렬로 받으면서 extract_to 에 바로 풂"""
+    size, ranges = probe(url)
+    if size is None or not ranges:
+        raise DownloadError(f"{url}: 서버가 Range 요청을 지원하지 않습니다")
+    os.makedirs(extract_to, exist_ok=True)
+    meter = Throughput(size)
+    reader = OrderedReader(url, size, workers, piece_size, meter=meter)
+    try:
+        with io.BufferedReader(reader, CHUNK_SIZE) as stream:
+            members = _extract_stream(tarfile.open(fileobj=stream, mode='r|gz'), extract_to)
+    finally:
+        reader.close()
+    stats = meter.report()
+    stats.update(path=extract_to, size=size, members=members)
+    return stats
+
+
+def extract_archive(path: str, extract_to: str) -> int:
+    """이미 받은 아카이브를 스트림으로 풂 (파일 수 반환)"""
+    os.makedirs(extract_to, exist_ok=True)
+    return _extract_stream(tarfile.open(path, mode='r|gz'), extract_to)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WPS geog 아카이브 구간 병렬 다운로드")
+    parser.add_argument('--url', help="기본값은 WPS geog 다운로드 페이지에서 찾은 링크")
+    parser.add_argument('--dest', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    parser.add_argument('--extract', metavar='WPS_GEOG', help="받으면서 이 폴더에 바로 압축 해제")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    url = args.url or find_geog_url()
+    if url is None:
+        raise SystemExit("다운로드 링크를 찾을 수 없습니다.")
+    if args.extract:
+        stats = download_extract(url, args.extract, args.workers)
+    else:
+        os.makedirs(args.dest, exist_ok=True)
+        stats = download_segmented(url, os.path.join(args.dest, os.path.basename(url)), args.workers)
+    print(f"완료: {stats}")
+
+
+if __name__ == '__main__':
+    main()
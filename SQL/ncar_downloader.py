@@ -0,0 +1,275 @@
+"""NCAR GRIB2 파일 병렬 다운로드 (청크 스트리밍, .part 이어받기, 크기/체크섬 검증, 일괄 기록)
+
+파일 하나를 response.content 로 통째로 메모리에 올리고 한 건씩 commit 하던 방식 대신,
+워커 수만큼 keep-alive 세션으로 동시에 받아 디스크에 바로 쓰고, 끊긴 파일은 HTTP Range 로
+이어서 받는다. 완료 기록은 downloaded_ncar_files 에 batch_size 건씩 한 번에 넣는다.
+ALTER_DOWNLOADED_NCAR_TABLE.sql 이 먼저 적용되어 있어야 한다.
+
+    python ncar_downloader.py --dest static --workers 4
+    python ncar_downloader.py --dest /tmp/ncar --url http://localhost:8000/gfs.0p25.grib2
+"""
+import argparse
+import hashlib
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import requests
+from psycopg2.extras import execute_values
+from requests.adapters import HTTPAdapter
+
+from wrf_db import close_pool, pooled_connection
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_WORKERS = int(os.environ.get('WRF_NCAR_WORKERS', '4'))
+DEFAULT_BATCH_SIZE = 20
+RETRIES = 3
+TIMEOUT = (10, 60)  # (연결, 읽기) 초
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)'}
+
+_CONTENT_RANGE = re.compile(r'bytes (?:(\d+)-\d+|\*)/(\d+|\*)')
+_local = threading.local()
+# 같은 폴더에 두 번의 다운로드가 동시에 .part 를 이어 쓰지 않도록
+_run_lock = threading.Lock()
+
+
+class DownloadError(Exception):
+    """다운로드 실패 또는 검증 실패 (retry=False 이면 다시 시도해도 소용없음)"""
+
+    def __init__(self, message: str, retry: bool = True):
+        super().__init__(message)
+        self.retry = retry
+
+
+def _session(pool_size: int = DEFAULT_WORKERS) -> requests.Session:
+    """스레드별 keep-alive 세션 (파일마다 연결을 새로 맺지 않음)"""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _local.session = session
+    return session
+
+
+def _content_range(value: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """Content-Range 헤더에서 (시작 위치, 전체 크기)"""
+    match = _CONTENT_RANGE.match(value or '')
+    if not match:
+        return None, None
+    start, total = match.groups()
+    return (int(start) if start else None), (int(total) if total != '*' else None)
+
+
+def _hash_file(path: str, chunk_size: int = CHUNK_SIZE):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+    return md5
+
+
+def fetch(url: str, dest: str, expected_md5: Optional[str] = None,
+          session: Optional[requests.Session] = None, chunk_size: int = CHUNK_SIZE) -> dict:
+    """url 을 dest 로 한 번 받아 봄 (dest.part 가 있으면 그 뒤부터 이어받기)
+
+    실패해도 .part 는 남겨 두어 다음 시도에서 이어받는다 (체크섬 불일치는 삭제).
+    """
+    session = session or _session()
+    part = dest + '.part'
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+    t0 = time.perf_counter()
+
+    with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+        if response.status_code == 416:
+            # 이미 끝까지 받은 .part 이면 검증만 하고, 아니면 처음부터 다시 받음
+            _, total = _content_range(response.headers.get('Content-Range'))
+            if total is None or total != offset:
+                os.remove(part)
+                raise DownloadError(f"{url}: 이어받기 범위 오류 (part {offset}, 서버 {total})")
+            md5, received = _hash_file(part, chunk_size), 0
+        elif response.status_code in (200, 206):
+            if response.status_code == 206:
+                start, total = _content_range(response.headers.get('Content-Range'))
+                if start != offset:
+                    # 요청과 다른 위치의 조각은 .part 에 이어 붙일 수 없으므로 처음부터 다시 받음
+                    os.remove(part)
+                    raise DownloadError(f"{url}: 이어받기 위치 불일치 (part {offset}, 서버 {start})")
+                mode, md5 = 'ab', _hash_file(part, chunk_size)
+            else:
+                # Range 를 무시한 서버(200)는 전체를 다시 보내므로 처음부터 씀
+                offset, mode, md5 = 0, 'wb', hashlib.md5()
+                length = response.headers.get('Content-Length')
+                total = int(length) if length is not None else None
+            received = 0
+            with open(part, mode) as f:
+                for chunk in response.iter_content(chunk_size):
+                    f.write(chunk)
+                    md5.update(chunk)
+                    received += len(chunk)
+        else:
+            # 4xx (408/429 제외) 는 다시 요청해도 같은 결과
+            code = response.status_code
+            raise DownloadError(f"{url}: 상태 코드 {code}", retry=code >= 500 or code in (408, 429))
+
+    size = os.path.getsize(part)
+    if total is not None and size != total:
+        raise DownloadError(f"{url}: 크기 불일치 ({size} / {total} bytes)")
+    digest = md5.hexdigest()
+    if expected_md5 and digest != expected_md5.lower():
+        os.remove(part)
+        raise DownloadError(f"{url}: 체크섬 불일치 ({digest} != {expected_md5})")
+    os.replace(part, dest)
+    return {'path': dest, 'size': size, 'md5': digest, 'received': received,
+            'resumed': offset > 0, 'seconds': time.perf_counter() - t0}
+
+
+def download_file(url: str, dest: str, expected_md5: Optional[str] = None,
+                  retries: int = RETRIES, chunk_size: int = CHUNK_SIZE) -> dict:
+    """연결이 끊기면 .part 에서 이어받으며 retries 번까지 다시 시도"""
+    for attempt in range(1, retries + 1):
+        try:
+            return fetch(url, dest, expected_md5, chunk_size=chunk_size)
+        except (requests.RequestException, DownloadError, OSError) as e:
+            if attempt == retries or not getattr(e, 'retry', True):
+                raise DownloadError(str(e)) from e
+            print(f"{os.path.basename(dest)} 다시 시도 ({attempt}/{retries}): {e}")
+            time.sleep(min(2 ** attempt, 30))
+
+
+def download_many(items: Sequence[Tuple[str, str, Optional[str]]], dest_dir: str,
+                  workers: int = DEFAULT_WORKERS,
+                  on_done: Optional[Callable[[str, dict], None]] = None) -> dict:
+    """(파일 이름, url, md5 또는 None) 목록을 workers 개 동시 다운로드
+
+    on_done(file_name, result) 은 완료된 순서대로 호출 스레드에서 불린다.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    stats = {'files': 0, 'failed': 0, 'bytes': 0, 'resumed': 0, 'seconds': 0.0}
+    if not items:
+        return stats
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ncar-download') as executor:
+        futures = {
+            executor.submit(download_file, url.strip(), os.path.join(dest_dir, name), md5): name
+            for name, url, md5 in items
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except (DownloadError, OSError) as e:
+                # 디스크 오류 등으로 한 파일이 실패해도 나머지는 계속 받음
+                print("파일을 다운로드할 수 없습니다:", e)
+                stats['failed'] += 1
+                continue
+            stats['files'] += 1
+            stats['bytes'] += result['received']
+            stats['resumed'] += result['resumed']
+            if on_done is not None:
+                on_done(name, result)
+            elapsed = time.perf_counter() - t0
+            mib = stats['bytes'] / 1024 / 1024
+            print(f"[{stats['files'] + stats['failed']}/{len(items)}] 다운로드 완료: {name} "
+                  f"({mib:.1f} MiB, {mib / elapsed:.1f} MiB/s)")
+    stats['seconds'] = time.perf_counter() - t0
+    return stats
+
+
+def pending_files(conn) -> List[Tuple[str, str, Optional[str]]]:
+    """ncar_data 중 아직 받지 않은 (파일 이름, url, md5)"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT n.file_name, n.url_path FROM ncar_data n "
+            "WHERE NOT EXISTS (SELECT 1 FROM downloaded_ncar_files d WHERE d.file_name = n.file_name) "
+            "ORDER BY n.time"
+        )
+        return [(name, url, None) for name, url in cursor.fetchall()]
+
+
+def record_downloads(conn, rows: Iterable[Tuple[str, int, str]]):
+    """(파일 이름, 크기, md5) 를 한 번의 INSERT 로 기록"""
+    rows = list(rows)
+    if not rows:
+        return
+    with conn.cursor() as cursor:
+        execute_values(
+            cursor,
+            "INSERT INTO downloaded_ncar_files (file_name, file_size, md5) VALUES %s "
+            "ON CONFLICT (file_name) DO NOTHING",
+            rows
+        )
+    conn.commit()
+
+
+def download_pending(dest_dir: str, workers: int = DEFAULT_WORKERS,
+                     batch_size: int = DEFAULT_BATCH_SIZE) -> Optional[Dict]:
+    """ncar_data 의 미다운로드 파일을 받아 downloaded_ncar_files 에 기록
+
+    다른 다운로드가 진행 중이면 None 을 반환한다.
+    """
+    if not _run_lock.acquire(blocking=False):
+        return None
+    try:
+        with pooled_connection() as conn:
+            items = pending_files(conn)
+            if not items:
+                print("다운로드할 새로운 데이터가 없습니다.")
+                return {'files': 0, 'failed': 0, 'bytes': 0, 'resumed': 0, 'seconds': 0.0,
+                        'downloaded': []}
+            print(f"{len(items)}개 파일을 워커 {workers}개로 다운로드합니다.")
+
+            done: List[Tuple[str, int, str]] = []
+            downloaded: List[str] = []
+
+            def on_done(name, result):
+                done.append((name, result['size'], result['md5']))
+                downloaded.append(name)
+                if len(done) >= batch_size:
+                    record_downloads(conn, done)
+                    done.clear()
+
+            try:
+                stats = download_many(items, dest_dir, workers, on_done)
+            finally:
+                record_downloads(conn, done)
+        stats['downloaded'] = downloaded
+        mib = stats['bytes'] / 1024 / 1024
+        print(f"\n다운로드 완료 ({stats['seconds']:.1f}s): 성공 {stats['files']}개 "
+              f"(이어받기 {stats['resumed']}개), 실패 {stats['failed']}개, "
+              f"{mib:.1f} MiB, {mib / max(stats['seconds'], 1e-9):.1f} MiB/s")
+        return stats
+    finally:
+        _run_lock.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NCAR GRIB2 파일 병렬 다운로드")
+    parser.add_argument('--dest', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--url', action='append',
+                        help="DB 대신 주어진 URL 만 받음 (여러 번 지정 가능, 기록하지 않음)")
+    args = parser.parse_args()
+
+    if args.url:
+        items = [(os.path.basename(url.split('?')[0]), url, None) for url in args.url]
+        stats = download_many(items, args.dest, args.workers)
+        print(stats)
+        return
+
+    try:
+        download_pending(args.dest, args.workers, args.batch_size)
+    finally:
+        close_pool()
+
+
+if __name__ == '__main__':
+    main()
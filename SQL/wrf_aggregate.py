@@ -0,0 +1,411 @@
+"""기간 통계 (T2 평균/표준편차/최저/최고, 임계값 미만 시간 수, 바람장미) 한 번 훑기 집계
+
+시각별 필드를 메모리에 모으지 않고 한 번씩만 읽으며 격자 크기(O(grid))의 누적값만 유지한다.
+    - T2 평균/분산: Welford (부분 결과는 Chan 방식으로 병합)
+    - 최저/최고, 임계값 미만 시간 수, 평균 풍속: 격자별 누적
+    - 바람장미: 질량 격자로 보간한 U/V 의 (풍향 16방위 x 풍속 구간) 개수 (영역 전체, 지점)
+구간을 시간순 조각으로 나눠 여러 프로세스가 각자 DB/파일을 읽고 부분 결과를 병합할 수 있다.
+
+    python wrf_aggregate.py --start 2024-01-01T00:00 --end 2024-01-31T23:00 --stat freezing_hours --png out.png
+    python wrf_aggregate.py --start 2024-01-01T00:00 --end 2024-01-31T23:00 --from-dir /home/yurim2/WRF/WRF-4.1.2/test/em_real
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import xarray as xr
+from matplotlib import colormaps
+
+from wrf_io import (DEFAULT_WIND_LEVEL, INGEST_WIND_LEVEL, crop_fields, dataset_window, extract_fields,
+                    get_window, open_nc_bytes)
+
+AGGREGATE_WORKERS = int(os.environ.get('WRF_AGGREGATE_WORKERS', min(4, os.cpu_count() or 1)))
+# 프로세스 하나가 맡을 최소 시간 수 (짧은 구간은 나누지 않음)
+MIN_HOURS_PER_WORKER = 48
+
+DIRECTION_SECTORS = 16
+SPEED_BINS = (0.0, 2.0, 4.0, 6.0, 8.0, 10.0, np.inf)  # m/s
+DEFAULT_THRESHOLDS = (0.0,)  # °C, 0 은 결빙(영하) 시간
+
+MAP_STATISTICS = ('t2_mean', 't2_std', 't2_min', 't2_max', 'freezing_hours', 'wind_speed_mean')
+STATISTICS = MAP_STATISTICS + ('wind_rose',)
+# 그림 제목/색 막대 (다른 뷰어 그림과 같이 영문)
+STAT_LABELS = {
+    't2_mean': 'Mean temperature (°C)',
+    't2_std': 'Temperature std. dev. (°C)',
+    't2_min': 'Minimum temperature (°C)',
+    't2_max': 'Maximum temperature (°C)',
+    'freezing_hours': 'Hours below 0°C (h)',
+    'wind_speed_mean': 'Mean wind speed (m/s)',
+}
+
+
+def parse_statistic(value: Optional[str]) -> str:
+    stat = (value or 't2_mean').lower()
+    if stat not in STATISTICS:
+        raise ValueError(f"Unknown statistic: {value} (choose from {', '.join(STATISTICS)})")
+    return stat
+
+
+def wind_direction(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """바람이 불어오는 방향 (기상 관례, 북=0°, 시계 방향)"""
+    return (270.0 - np.degrees(np.arctan2(v, u))) % 360.0
+
+
+def rose_counts(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """(방위, 풍속 구간) 개수"""
+    u = np.asarray(u, dtype=np.float64).ravel()
+    v = np.asarray(v, dtype=np.float64).ravel()
+    valid = np.isfinite(u) & np.isfinite(v)
+    u, v = u[valid], v[valid]
+    width = 360.0 / DIRECTION_SECTORS
+    sector = ((wind_direction(u, v) + width / 2) // width).astype(np.int64) % DIRECTION_SECTORS
+    speed = np.digitize(np.hypot(u, v), SPEED_BINS[1:-1])
+    counts = np.zeros((DIRECTION_SECTORS, len(SPEED_BINS) - 1), dtype=np.int64)
+    np.add.at(counts, (sector, speed), 1)
+    return counts
+
+
+class RunningStats:
+    """격자별 누적 통계 (한 시각씩 update, 다른 구간의 결과와 merge)"""
+
+    def __init__(self, thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+                 point: Optional[Tuple[int, int]] = None):
+        self.thresholds = tuple(float(t) for t in thresholds)
+        self.point = point
+        self.hours = 0
+        self.first = None
+        self.last = None
+        self.xlat = None
+        self.xlong = None
+        self.region = None  # 바람장미에 넣을 격자 (bbox 안쪽)
+
+    def _init(self, xlat, xlong, region):
+        shape = xlat.shape
+        self.xlat, self.xlong = xlat, xlong
+        self.region = np.ones(shape, dtype=bool) if region is None else region
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape, dtype=np.float64)
+        self.m2 = np.zeros(shape, dtype=np.float64)
+        self.minimum = np.full(shape, np.inf, dtype=np.float64)
+        self.maximum = np.full(shape, -np.inf, dtype=np.float64)
+        self.below = {t: np.zeros(shape, dtype=np.int64) for t in self.thresholds}
+        self.speed_sum = np.zeros(shape, dtype=np.float64)
+        self.rose = np.zeros((DIRECTION_SECTORS, len(SPEED_BINS) - 1), dtype=np.int64)
+        self.point_rose = np.zeros_like(self.rose)
+
+    @property
+    def nbytes(self) -> int:
+        """누적 배열의 바이트 크기 (LRUCache 크기 계산용)"""
+        if self.xlat is None:
+            return 0
+        arrays = [self.xlat, self.xlong, self.region, self.count, self.mean, self.m2, self.minimum,
+                  self.maximum, self.speed_sum, *self.below.values()]
+        return sum(int(a.nbytes) for a in arrays)
+
+    def update(self, timestamp: datetime, fields: tuple, region: Optional[np.ndarray] = None):
+        xlat, xlong, t2, u, v = fields
+        if self.xlat is None:
+            self._init(xlat, xlong, region)
+        elif t2.shape != self.count.shape:
+            raise ValueError(f"Grid changed at {timestamp}: {t2.shape} != {self.count.shape}")
+        self.hours += 1
+        self.first = timestamp if self.first is None else min(self.first, timestamp)
+        self.last = timestamp if self.last is None else max(self.last, timestamp)
+
+        t2 = np.asarray(t2, dtype=np.float64)
+        valid = np.isfinite(t2)
+        self.count += valid
+        delta = np.where(valid, t2 - self.mean, 0.0)
+        self.mean += np.divide(delta, self.count, out=np.zeros_like(delta), where=self.count > 0)
+        self.m2 += delta * np.where(valid, t2 - self.mean, 0.0)
+        np.fmin(self.minimum, t2, out=self.minimum)
+        np.fmax(self.maximum, t2, out=self.maximum)
+        for threshold, below in self.below.items():
+            below += valid & (t2 < threshold)
+
+        speed = np.hypot(u, v)
+        self.speed_sum += np.nan_to_num(speed)
+        self.rose += rose_counts(u[self.region], v[self.region])
+        if self.point is not None:
+            self.point_rose += rose_counts(u[self.point], v[self.point])
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        """다른 시간 구간의 부분 결과를 합침 (Chan 병렬 분산 공식)"""
+        if other.xlat is None:
+            return self
+        if self.xlat is None:
+            self.__dict__.update(other.__dict__)
+            return self
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(n > 0, other.count / np.maximum(n, 1), 0.0)
+        self.mean += delta * weight
+        self.m2 += other.m2 + delta ** 2 * self.count * weight
+        self.count = n
+        np.fmin(self.minimum, other.minimum, out=self.minimum)
+        np.fmax(self.maximum, other.maximum, out=self.maximum)
+        for threshold in self.thresholds:
+            self.below[threshold] += other.below[threshold]
+        self.speed_sum += other.speed_sum
+        self.rose += other.rose
+        self.point_rose += other.point_rose
+        self.hours += other.hours
+        self.first = min(self.first, other.first)
+        self.last = max(self.last, other.last)
+        return self
+
+    def field(self, stat: str, threshold: float = 0.0) -> np.ndarray:
+        """격자 통계 배열 (자료가 없는 격자는 NaN)"""
+        empty = self.count == 0
+        if stat == 't2_mean':
+            values = self.mean.copy()
+        elif stat == 't2_std':
+            values = np.sqrt(self.m2 / np.maximum(self.count - 1, 1))
+        elif stat == 't2_min':
+            values = self.minimum.copy()
+        elif stat == 't2_max':
+            values = self.maximum.copy()
+        elif stat == 'freezing_hours':
+            if float(threshold) not in self.below:
+                raise ValueError(f"Threshold {threshold} was not aggregated (have {list(self.below)})")
+            values = self.below[float(threshold)].astype(np.float64)
+        elif stat == 'wind_speed_mean':
+            values = self.speed_sum / max(self.hours, 1)
+        else:
+            raise ValueError(f"{stat} is not a map statistic")
+        values[empty] = np.nan
+        return values
+
+    def wind_rose(self, point: bool = False) -> dict:
+        counts = self.point_rose if point else self.rose
+        total = int(counts.sum())
+        width = 360.0 / DIRECTION_SECTORS
+        return {
+            'directions': [i * width for i in range(DIRECTION_SECTORS)],
+            'speed_bins': [float(x) for x in SPEED_BINS[:-1]] + [None],
+            'counts': counts.tolist(),
+            'frequency': (counts / total).round(5).tolist() if total else counts.tolist(),
+            'samples': total,
+        }
+
+
+def _iter_db_fields(timestamps: Sequence[datetime], source: str, domain: str, wind_level: str,
+                    bbox=None) -> Iterator[Tuple[datetime, tuple]]:
+    if source == 'compact':
+        from wrf_compact import CompactReader
+        reader = CompactReader(domain)
+        window = None if bbox is None else get_window(domain, reader.get_grid()[0].shape, bbox, reader.get_grid)
+        for timestamp, fields in reader.iter_fields(timestamps):
+            yield timestamp, crop_fields(fields, window)
+        return
+    from wrf_db import iter_nc_timestamps
+    for timestamp, nc_data in iter_nc_timestamps(timestamps):
+        ds = open_nc_bytes(nc_data)
+        try:
+            window = None if bbox is None else dataset_window(ds, bbox, domain)
+            yield timestamp, extract_fields(ds, window, wind_level)
+        finally:
+            ds.close()
+
+
+def _iter_file_fields(folder: str, timestamps: Sequence[datetime], domain: str, wind_level: str,
+                      bbox=None) -> Iterator[Tuple[datetime, tuple]]:
+    from wrf_catalog import get_catalog
+    wanted = set(timestamps)
+    for timestamp, path in get_catalog(folder).find(min(timestamps), max(timestamps), domain):
+        if timestamp in wanted:
+            with xr.open_dataset(path) as ds:
+                window = None if bbox is None else dataset_window(ds, bbox, domain)
+                yield timestamp, extract_fields(ds, window, wind_level)
+
+
+def aggregate_chunk(timestamps: Sequence[datetime], bbox=None, point=None, wind_level: str = DEFAULT_WIND_LEVEL,
+                    thresholds: Sequence[float] = DEFAULT_THRESHOLDS, source: str = 'blob',
+                    domain: str = 'd01', folder: Optional[str] = None) -> RunningStats:
+    """연속된 시각들을 한 번씩 읽어 부분 통계를 만듦 (프로세스 풀 작업 단위)
+
+    bbox 가 있으면 변수를 읽기 전에 그 영역으로 잘라내고, 바람장미는 bbox 안쪽 격자만 센다.
+    point 는 (lat, lon), 지점 값/바람장미는 가장 가까운 격자를 사용한다.
+    """
+    if folder:
+        rows = _iter_file_fields(folder, timestamps, domain, wind_level, bbox)
+    else:
+        rows = _iter_db_fields(timestamps, source, domain, wind_level, bbox)
+    stats = RunningStats(thresholds)
+    region = None
+    for timestamp, fields in rows:
+        if stats.xlat is None:
+            xlat, xlong = fields[0], fields[1]
+            if bbox is not None:
+                west, south, east, north = bbox
+                region = (xlong >= west) & (xlong <= east) & (xlat >= south) & (xlat <= north)
+            if point is not None:
+                distance = (xlat - point[0]) ** 2 + ((xlong - point[1]) * np.cos(np.radians(point[0]))) ** 2
+                stats.point = np.unravel_index(int(np.argmin(distance)), xlat.shape)
+        stats.update(timestamp, fields, region)
+    return stats
+
+
+def _aggregate_task(args) -> RunningStats:
+    return aggregate_chunk(*args)
+
+
+def aggregate(timestamps: Sequence[datetime], bbox=None, point=None, wind_level: str = DEFAULT_WIND_LEVEL,
+              thresholds: Sequence[float] = DEFAULT_THRESHOLDS, source: str = 'blob', domain: str = 'd01',
+              folder: Optional[str] = None, workers: int = AGGREGATE_WORKERS) -> RunningStats:
+    """시각들을 시간순 조각으로 나눠 workers 개 프로세스에서 집계하고 병합"""
+    if wind_level == INGEST_WIND_LEVEL and (source != 'compact' or folder):
+        raise ValueError("wind_level=ingest is only available from the compact DB store")
+    timestamps = sorted(set(timestamps))
+    workers = max(1, min(workers, len(timestamps) // MIN_HOURS_PER_WORKER))
+    t0 = time.perf_counter()
+    if workers <= 1:
+        stats = aggregate_chunk(timestamps, bbox, point, wind_level, thresholds, source, domain, folder)
+    else:
+        chunks = [list(chunk) for chunk in np.array_split(np.array(timestamps, dtype=object), workers)]
+        tasks = [(chunk, bbox, point, wind_level, thresholds, source, domain, folder) for chunk in chunks]
+        # 웹 서버의 스레드 상태를 물려받지 않도록 spawn 사용
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            stats = RunningStats(thresholds)
+            for partial in executor.map(_aggregate_task, tasks):
+                stats.merge(partial)
+    print(f"{stats.hours}/{len(timestamps)}개 시각 집계 완료 (프로세스 {workers}개, {time.perf_counter() - t0:.1f}s)")
+    return stats
+
+
+def summary(stats: RunningStats, stat: str, threshold: float = 0.0, include_grid: bool = False) -> dict:
+    """JSON 응답용 결과"""
+    result = {
+        'statistic': stat,
+        'hours': stats.hours,
+        'first': stats.first.isoformat() if stats.first else None,
+        'last': stats.last.isoformat() if stats.last else None,
+    }
+    if stat == 'wind_rose':
+        result['region'] = stats.wind_rose()
+        if stats.point is not None:
+            result['point'] = dict(stats.wind_rose(point=True), i=int(stats.point[0]), j=int(stats.point[1]),
+                                   lat=float(stats.xlat[stats.point]), lon=float(stats.xlong[stats.point]))
+        return result
+
+    if stats.xlat is None:
+        return result
+    values = stats.field(stat, threshold)
+    if stat == 'freezing_hours':
+        result['threshold'] = threshold
+    inside = values[stats.region]
+    if np.isfinite(inside).any():
+        result['region'] = {'mean': float(np.nanmean(inside)), 'min': float(np.nanmin(inside)),
+                            'max': float(np.nanmax(inside))}
+    if stats.point is not None:
+        result['point'] = {'i': int(stats.point[0]), 'j': int(stats.point[1]),
+                           'lat': float(stats.xlat[stats.point]), 'lon': float(stats.xlong[stats.point]),
+                           'value': float(values[stats.point])}
+    if include_grid:
+        result['grid'] = {
+            'xlat': np.round(stats.xlat, 5).tolist(),
+            'xlong': np.round(stats.xlong, 5).tolist(),
+            'values': [[None if not np.isfinite(x) else round(float(x), 3) for x in row] for row in values],
+        }
+    return result
+
+
+def render_png(stats: RunningStats, stat: str, threshold: float = 0.0, boundary=None,
+               bbox=None, figsize=(10, 9), dpi: int = 100) -> bytes:
+    """통계 지도(컨투어 + 경계) 또는 바람장미 PNG"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    period = f"{stats.first:%Y-%m-%d %H:%M} ~ {stats.last:%Y-%m-%d %H:%M} ({stats.hours}h)" if stats.hours else ''
+
+    if stat == 'wind_rose':
+        point = stats.point is not None
+        counts = stats.point_rose if point else stats.rose
+        total = max(int(counts.sum()), 1)
+        ax = fig.add_subplot(projection='polar')
+        ax.set_theta_zero_location('N')
+        ax.set_theta_direction(-1)
+        width = 2 * np.pi / DIRECTION_SECTORS
+        theta = np.arange(DIRECTION_SECTORS) * width
+        bottom = np.zeros(DIRECTION_SECTORS)
+        cmap = colormaps['viridis']
+        nbins = counts.shape[1]
+        for k in range(nbins):
+            freq = counts[:, k] / total * 100
+            hi = SPEED_BINS[k + 1]
+            label = f"{SPEED_BINS[k]:g}+ m/s" if not np.isfinite(hi) else f"{SPEED_BINS[k]:g}-{hi:g} m/s"
+            ax.bar(theta, freq, width=width * 0.95, bottom=bottom, color=cmap(k / max(nbins - 1, 1)),
+                   edgecolor='white', linewidth=0.5, label=label)
+            bottom += freq
+        ax.set_yticklabels([f"{t:g}%" for t in ax.get_yticks()])
+        ax.legend(loc='lower left', bbox_to_anchor=(1.02, 0.0), fontsize='small')
+        where = f"({float(stats.xlat[stats.point]):.3f}, {float(stats.xlong[stats.point]):.3f})" if point else 'region'
+        ax.set_title(f"Wind rose {where}\n{period}", pad=20)
+    else:
+        ax = fig.add_subplot()
+        values = stats.field(stat, threshold)
+        cmap = 'Blues' if stat == 'freezing_hours' else 'viridis' if stat.startswith('wind') else 'coolwarm'
+        contour = ax.contourf(stats.xlong, stats.xlat, values, levels=20, cmap=cmap)
+        fig.colorbar(contour, ax=ax, label=STAT_LABELS[stat])
+        if boundary is not None:
+            from wrf_boundary import draw_boundary
+            draw_boundary(ax, boundary, {'bbox': bbox, 'figsize': figsize, 'dpi': dpi})
+        if bbox is not None:
+            ax.set_xlim(bbox[0], bbox[2])
+            ax.set_ylim(bbox[1], bbox[3])
+        if stats.point is not None:
+            ax.plot(stats.xlong[stats.point], stats.xlat[stats.point], 'k^')
+        ax.grid(True, linestyle='--', alpha=0.3)
+        title = STAT_LABELS[stat]
+        if stat == 'freezing_hours' and threshold != 0.0:
+            title = f"Hours below {threshold:g}°C (h)"
+        ax.set_title(f"{title}\n{period}")
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+def hourly(start: datetime, end: datetime) -> List[datetime]:
+    return [start + timedelta(hours=i) for i in range(int((end - start).total_seconds() // 3600) + 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="기간 통계/바람장미 한 번 훑기 집계")
+    parser.add_argument('--start', type=datetime.fromisoformat, required=True)
+    parser.add_argument('--end', type=datetime.fromisoformat, required=True)
+    parser.add_argument('--stat', type=parse_statistic, default='t2_mean')
+    parser.add_argument('--threshold', type=float, default=0.0, help="freezing_hours 의 기준 기온 (°C)")
+    parser.add_argument('--bbox', type=float, nargs=4, metavar=('W', 'S', 'E', 'N'))
+    parser.add_argument('--point', type=float, nargs=2, metavar=('LAT', 'LON'))
+    parser.add_argument('--wind-level', default=DEFAULT_WIND_LEVEL)
+    parser.add_argument('--source', choices=('blob', 'compact'), default='blob')
+    parser.add_argument('--from-dir', dest='folder', help="DB 대신 wrfout 파일 폴더에서 읽음")
+    parser.add_argument('--workers', type=int, default=AGGREGATE_WORKERS)
+    parser.add_argument('--png', help="결과 그림 경로")
+    parser.add_argument('--grid', action='store_true', help="JSON 에 격자 값 포함")
+    args = parser.parse_args()
+
+    thresholds = tuple(sorted({0.0, args.threshold}))
+    stats = aggregate(hourly(args.start, args.end), args.bbox, args.point, args.wind_level, thresholds,
+                      args.source, folder=args.folder, workers=args.workers)
+    print(json.dumps(summary(stats, args.stat, args.threshold, args.grid), ensure_ascii=False, indent=2))
+    if args.png:
+        with open(args.png, 'wb') as f:
+            f.write(render_png(stats, args.stat, args.threshold, bbox=args.bbox))
+        print(f"그림 저장: {args.png}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""경계 shapefile 을 한 번만 읽어 단순화된 matplotlib 경로로 보관
+
+요청/프레임마다 gpd.read_file 과 gdf.plot 을 하는 대신, 프로세스별로 한 번 읽어
+경위도(EPSG:4326, 뷰어 축 좌표)로 변환한 뒤 여러 단순화 단계의 복합 Path 를 미리 만든다.
+그릴 때는 출력 픽셀 크기에 맞는 단계를 골라 PathCollection 하나만 추가한다.
+
+단순화 허용 오차는 출력 한 픽셀의 절반(경위도 단위)이므로 눈으로 보이는 차이가 없다.
+인접한 행정 경계가 어긋나지 않도록 가능하면 shapely.coverage_simplify(공유 경계를 함께
+단순화)를 쓰고, 없거나 실패하면 도형별 preserve_topology 단순화로 대신한다.
+
+    boundary = get_boundary(path)
+    draw_boundary(ax, boundary, style)
+"""
+import os
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from matplotlib import rcParams
+from matplotlib.collections import PathCollection
+from matplotlib.path import Path
+
+DEFAULT_SHAPEFILE = os.environ.get('WRF_SHAPEFILE', "/home/yurim2/WRF/pohang_shp/pohang.shp")
+# 단순화 단계: 경계 전체 너비를 256 * 2^k 픽셀로 그릴 때의 반 픽셀 (k = 0..7)
+LEVEL_WIDTHS = tuple(256 * 2 ** k for k in range(8))
+
+
+def _ring_codes(n: int) -> np.ndarray:
+    codes = np.full(n, Path.LINETO, dtype=Path.code_type)
+    codes[0] = Path.MOVETO
+    codes[-1] = Path.CLOSEPOLY
+    return codes
+
+
+def geometry_path(geometries: Sequence) -> Optional[Path]:
+    """도형들의 모든 외곽/내부 고리와 선을 복합 Path 하나로"""
+    vertices, codes = [], []
+
+    def add_line(coords, closed):
+        coords = np.asarray(coords, dtype=np.float64)[:, :2]
+        if len(coords) < 2:
+            return
+        vertices.append(coords)
+        if closed:
+            codes.append(_ring_codes(len(coords)))
+        else:
+            line = np.full(len(coords), Path.LINETO, dtype=Path.code_type)
+            line[0] = Path.MOVETO
+            codes.append(line)
+
+    def add(geometry):
+        if geometry is None or geometry.is_empty:
+            return
+        kind = geometry.geom_type
+        if kind == 'Polygon':
+            add_line(geometry.exterior.coords, True)
+            for ring in geometry.interiors:
+                add_line(ring.coords, True)
+        elif kind in ('LineString', 'LinearRing'):
+            add_line(geometry.coords, kind == 'LinearRing')
+        elif hasattr(geometry, 'geoms'):
+            for part in geometry.geoms:
+                add(part)
+
+    for geometry in geometries:
+        add(geometry)
+    if not vertices:
+        return None
+    return Path(np.concatenate(vertices), np.concatenate(codes))
+
+
+def simplify_geometries(geometries: np.ndarray, tolerance: float) -> np.ndarray:
+    """공유 경계를 유지하는 단순화 (coverage_simplify, 실패 시 도형별 preserve_topology)"""
+    polygonal = all(g is None or g.geom_type in ('Polygon', 'MultiPolygon') for g in geometries)
+    if polygonal and hasattr(shapely, 'coverage_simplify'):
+        try:
+            return shapely.coverage_simplify(geometries, tolerance)
+        except shapely.errors.GEOSException as e:
+            print(f"경계 coverage 단순화 실패, 도형별로 단순화합니다: {e}")
+    return shapely.simplify(geometries, tolerance, preserve_topology=True)
+
+
+class Boundary:
+    """경위도로 변환한 경계와 단순화 단계별 복합 Path"""
+
+    def __init__(self, path: str, gdf: Optional[gpd.GeoDataFrame] = None):
+        self.path = path
+        gdf = gpd.read_file(path) if gdf is None else gdf
+        if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+            gdf = gdf.to_crs(epsg=4326)
+        self.gdf = gdf
+        self.bounds = tuple(float(x) for x in gdf.total_bounds)
+        # gdf.plot 과 같은 축 비율 (경위도면 위도에 따른 보정, 좌표계가 없으면 1:1)
+        if gdf.crs is not None:
+            self.aspect = 1 / np.cos(np.radians((self.bounds[1] + self.bounds[3]) / 2))
+        else:
+            self.aspect = 'equal'
+
+        geometries = np.asarray(gdf.geometry.values, dtype=object)
+        width = max(self.bounds[2] - self.bounds[0], self.bounds[3] - self.bounds[1])
+        # (허용 오차, Path) 를 오차가 큰 단계부터
+        self.levels: List[tuple] = []
+        for pixels in LEVEL_WIDTHS:
+            tolerance = width / pixels / 2
+            self.levels.append((tolerance, geometry_path(simplify_geometries(geometries, tolerance))))
+        self.full = geometry_path(geometries)
+        self._geojson: Dict[Optional[float], str] = {}
+
+    def tolerance_for(self, style: dict) -> float:
+        """스타일의 표시 범위와 출력 크기로 정한 반 픽셀 크기 (경위도)"""
+        bbox = style.get('bbox') or self.bounds
+        figsize = style.get('figsize') or rcParams['figure.figsize']
+        dpi = style.get('dpi') or rcParams['figure.dpi']
+        width_px = figsize[0] * dpi
+        height_px = figsize[1] * dpi
+        return min((bbox[2] - bbox[0]) / width_px, (bbox[3] - bbox[1]) / height_px) / 2
+
+    def get_path(self, tolerance: float = 0.0) -> Optional[Path]:
+        """허용 오차 이하인 가장 단순한 단계 (없으면 원본)"""
+        for level_tolerance, path in self.levels:
+            if level_tolerance <= tolerance:
+                return path
+        return self.full
+
+    def vertex_counts(self) -> dict:
+        counts = {f"{tolerance:.2e}": 0 if path is None else len(path.vertices)
+                  for tolerance, path in self.levels}
+        counts['full'] = 0 if self.full is None else len(self.full.vertices)
+        return counts
+
+    def geojson(self, tolerance: Optional[float] = None) -> str:
+        """GeoJSON 문자열 (tolerance 가 있으면 같은 방식으로 단순화)"""
+        text = self._geojson.get(tolerance)
+        if text is None:
+            gdf = self.gdf
+            if tolerance:
+                gdf = gdf.set_geometry(simplify_geometries(
+                    np.asarray(gdf.geometry.values, dtype=object), tolerance), crs=gdf.crs)
+            text = self._geojson[tolerance] = gdf.to_json()
+        return text
+
+
+_boundaries: Dict[str, Boundary] = {}
+_lock = threading.Lock()
+
+
+def get_boundary(path: str = DEFAULT_SHAPEFILE) -> Boundary:
+    """프로세스별로 한 번만 읽는 경계"""
+    boundary = _boundaries.get(path)
+    if boundary is None:
+        with _lock:
+            boundary = _boundaries.get(path)
+            if boundary is None:
+                boundary = _boundaries[path] = Boundary(path)
+                print(f"경계 shapefile 로드: {path} (정점 수 {boundary.vertex_counts()})")
+    return boundary
+
+
+def draw_boundary(ax, boundary: Boundary, style: Optional[dict] = None) -> Optional[PathCollection]:
+    """출력 픽셀 크기에 맞는 단순화 단계의 경계선을 PathCollection 하나로 추가 (gdf.plot 대체)"""
+    style = style or {}
+    path = boundary.get_path(boundary.tolerance_for(style))
+    if path is None:
+        return None
+    linewidth = style.get('boundary_linewidth')
+    collection = PathCollection(
+        [path],
+        facecolors='none',
+        edgecolors='black',
+        linewidths=rcParams['patch.linewidth'] if linewidth is None else linewidth,
+    )
+    ax.add_collection(collection, autolim=True)
+    ax.autoscale_view()
+    ax.set_aspect(boundary.aspect)
+    return collection
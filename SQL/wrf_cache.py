@@ -0,0 +1,206 @@
+"""WRF 결과 렌더링/처리 결과를 재사용하기 위한 캐시 모듈"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Hashable, Iterable, List, Optional
+
+
+def _sizeof(value: Any) -> int:
+    """캐시 항목의 대략적인 바이트 크기 계산"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(_sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_sizeof(item) for item in value.values())
+    return 0
+
+
+class LRUCache:
+    """항목 수/바이트 크기로 제한되는 스레드 안전 메모리 LRU 캐시"""
+
+    def __init__(self, max_items: int = 128, max_bytes: Optional[int] = None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None):
+        size = _sizeof(value) if size is None else size
+        with self._lock:
+            if key in self._data:
+                self._total_bytes -= self._sizes.pop(key)
+                del self._data[key]
+            # 단일 항목이 전체 한도보다 크면 캐시하지 않음
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = value
+            self._sizes[key] = size
+            self._total_bytes += size
+            while len(self._data) > self.max_items or (
+                self.max_bytes is not None and self._total_bytes > self.max_bytes
+            ):
+                old_key, _ = self._data.popitem(last=False)
+                self._total_bytes -= self._sizes.pop(old_key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'items': len(self._data),
+                'bytes': self._total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class FrameCache:
+    """렌더링된 프레임(PNG 바이트) 캐시: 메모리 LRU 앞단 + 디스크 저장소"""
+
+    def __init__(self,
+                 cache_dir: str,
+                 max_memory_bytes: int = 512 * 1024 * 1024,
+                 max_disk_bytes: Optional[int] = 10 * 1024 * 1024 * 1024,
+                 suffix: str = ".png"):
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.suffix = suffix
+        self.memory = LRUCache(max_items=10_000, max_bytes=max_memory_bytes)
+        self.disk_hits = 0
+        self._disk_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._disk_bytes = self._scan_disk_bytes()
+
+    @staticmethod
+    def make_key(timestamp: datetime,
+                 variables: Iterable[str],
+                 zoom_box: Optional[Iterable[float]] = None,
+                 style: Optional[dict] = None) -> str:
+        """(시각, 변수 집합, 확대 영역, 스타일)로부터 캐시 키 생성"""
+        box = 'full' if zoom_box is None else ','.join(f"{float(x):.6f}" for x in zoom_box)
+        style_str = repr(sorted((style or {}).items()))
+        raw = '|'.join([timestamp.isoformat(), ','.join(sorted(variables)), box, style_str])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + self.suffix)
+
+    def _scan_disk_bytes(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self.memory.get(key)
+        if data is not None:
+            return data
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        # 디스크에서 찾은 항목은 메모리로 승격
+        self.disk_hits += 1
+        self.memory.put(key, data)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes):
+        self.memory.put(key, data)
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 동시 쓰기에도 깨진 파일이 보이지 않도록 임시 파일 후 교체
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"프레임 캐시 저장 실패 ({key}): {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._disk_lock:
+            self._disk_bytes += len(data) - old_size
+            if self.max_disk_bytes is not None and self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def missing(self, keys: Iterable[str]) -> List[str]:
+        """캐시에 없는 키 목록 반환"""
+        return [key for key in keys if key not in self.memory and not os.path.exists(self._path(key))]
+
+    def _evict_disk(self):
+        """오래 사용되지 않은 파일부터 디스크 한도의 90%까지 삭제"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(self.suffix):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        target = int(self.max_disk_bytes * 0.9)
+        for _, size, path in sorted(entries):
+            if self._disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self._disk_bytes -= size
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        stats = self.memory.stats()
+        stats['disk_hits'] = self.disk_hits
+        stats['disk_bytes'] = self._disk_bytes
+        return stats
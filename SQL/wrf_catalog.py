@@ -0,0 +1,250 @@
+"""wrfout 파일 카탈로그 (SQLite 에 저장, mtime 비교로 증분 갱신, 이분 탐색으로 시간 범위 조회)
+
+요청마다 폴더 전체를 glob + strptime 으로 훑는 대신, 파일별 (경로, 유효 시각, 도메인,
+격자 크기, 변수 목록, mtime) 을 저장해 두고 바뀐 파일만 다시 읽는다.
+폴더 훑기는 요청 경로 밖(백그라운드)에서 하며, 캐시/저장소 폴더(SKIP_DIRS)는 내려가지 않는다.
+
+    python wrf_catalog.py /home/yurim2/WRF/SQL
+    python wrf_catalog.py /home/yurim2/WRF/SQL --start 2024-01-01T00:00 --end 2024-01-02T00:00
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import netCDF4
+
+from wrf_io import parse_wrfout_time
+
+CATALOG_PATH = os.environ.get(
+    'WRF_CATALOG_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "wrf_catalog.sqlite")
+)
+# 이 간격(초) 안의 요청은 폴더를 다시 훑지 않음
+REFRESH_INTERVAL = float(os.environ.get('WRF_CATALOG_REFRESH', '10'))
+# 훑지 않을 하위 폴더 (뷰어 캐시/저장소/결과물은 wrfout 이 없고 파일 수만 많음), WRF_CATALOG_SKIP 로 추가
+SKIP_DIRS = frozenset(
+    ['frame_cache', 'tile_cache', 'grid_cache', 'animations', 'timeseries_store',
+     'timeseries_store.building', 'timeseries_store.old', 'static', 'templates', '__pycache__']
+    + [d for d in os.environ.get('WRF_CATALOG_SKIP', '').split(',') if d]
+)
+# 저장소를 다시 만들 때 생기는 임시/이전 폴더 (이름이 바뀌어도 건너뜀)
+SKIP_SUFFIXES = ('.building', '.old')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS wrf_files (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    valid_time TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    ny INTEGER,
+    nx INTEGER,
+    nz INTEGER,
+    variables TEXT,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_wrf_files_domain_time ON wrf_files (root, domain, valid_time);
+"""
+
+
+def _read_header(path: str) -> Tuple[Optional[int], Optional[int], Optional[int], str]:
+    """파일 헤더에서 (ny, nx, nz, 변수 목록) 만 읽음"""
+    with netCDF4.Dataset(path) as nc:
+        dims = nc.dimensions
+
+        def size(name):
+            return len(dims[name]) if name in dims else None
+
+        return size('south_north'), size('west_east'), size('bottom_top'), ','.join(nc.variables)
+
+
+class WRFCatalog:
+    """한 출력 폴더(하위 폴더 포함)의 wrfout 카탈로그"""
+
+    def __init__(self, root: str, db_path: str = CATALOG_PATH, pattern_prefix: str = 'wrfout_',
+                 refresh_interval: float = REFRESH_INTERVAL):
+        self.root = os.path.abspath(root)
+        self.pattern_prefix = pattern_prefix
+        self.refresh_interval = refresh_interval
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        # _lock 은 갱신끼리, _db_lock 은 공유 연결 사용을 직렬화 (폴더를 훑는 동안에는 _db_lock 을 잡지 않음)
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._background: Optional[threading.Thread] = None
+        # 도메인별 정렬된 (시각 목록, 경로 목록)
+        self._index: Dict[str, Tuple[List[datetime], List[str]]] = {}
+        self._load_index()
+
+    def _scan(self) -> Dict[str, Tuple[float, int]]:
+        found = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames
+                           if d not in SKIP_DIRS and not d.startswith('.') and not d.endswith(SKIP_SUFFIXES)]
+            for name in filenames:
+                if not name.startswith(self.pattern_prefix):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found[path] = (st.st_mtime, st.st_size)
+        return found
+
+    def refresh(self, force: bool = False) -> int:
+        """바뀐 파일만 카탈로그에 반영하고 반영한 파일 수를 반환"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return 0
+            self._last_refresh = now
+
+            with self._db_lock:
+                known = {
+                    path: (mtime, size)
+                    for path, mtime, size in self._conn.execute(
+                        "SELECT path, mtime, size FROM wrf_files WHERE root = ?", (self.root,)
+                    )
+                }
+            found = self._scan()
+            removed = [path for path in known if path not in found]
+            changed = [path for path, stat in found.items() if known.get(path) != stat]
+
+            rows = []
+            for path in changed:
+                name = os.path.basename(path)
+                valid_time = parse_wrfout_time(name)
+                if valid_time is None:
+                    continue
+                try:
+                    ny, nx, nz, variables = _read_header(path)
+                except OSError as e:
+                    # 아직 쓰는 중인 파일 등은 다음 갱신 때 다시 시도
+                    print(f"{path} 헤더를 읽지 못했습니다: {e}")
+                    continue
+                mtime, size = found[path]
+                rows.append((path, self.root, valid_time.isoformat(), name.split('_')[1],
+                             ny, nx, nz, variables, mtime, size))
+
+            if removed or rows:
+                with self._db_lock, self._conn:
+                    self._conn.executemany("DELETE FROM wrf_files WHERE path = ?", [(p,) for p in removed])
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO wrf_files "
+                        "(path, root, valid_time, domain, ny, nx, nz, variables, mtime, size) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows
+                    )
+                self._load_index()
+            return len(removed) + len(rows)
+
+    def refresh_async(self):
+        """갱신 주기가 지났으면 요청을 막지 않도록 백그라운드 스레드에서 갱신"""
+        if time.monotonic() - self._last_refresh < self.refresh_interval:
+            return
+        with self._lock:
+            if self._background is not None and self._background.is_alive():
+                return
+            self._background = threading.Thread(target=self.refresh, name='wrf-catalog-refresh', daemon=True)
+            self._background.start()
+
+    def _load_index(self):
+        index: Dict[str, Tuple[List[datetime], List[str]]] = {}
+        # 같은 시각이 여러 run 에 있으면 가장 최근에 쓰인 파일을 사용
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT domain, valid_time, path FROM wrf_files WHERE root = ? "
+                "ORDER BY domain, valid_time, mtime", (self.root,)
+            ).fetchall()
+        for domain, valid_time, path in rows:
+            times, paths = index.setdefault(domain, ([], []))
+            ts = datetime.fromisoformat(valid_time)
+            if times and times[-1] == ts:
+                paths[-1] = path
+            else:
+                times.append(ts)
+                paths.append(path)
+        self._index = index
+
+    def find(self, start: datetime, end: datetime, domain: str = 'd01') -> List[Tuple[datetime, str]]:
+        """[start, end] 구간의 (시각, 경로) 를 시간순으로 반환
+
+        목록에 있는 구간은 폴더를 훑지 않고 바로 답하고 (갱신은 백그라운드),
+        마지막 시각 이후를 요청할 때만 (새 파일일 수 있으므로) 그 자리에서 갱신한다.
+        """
+        times, paths = self._index.get(domain, ([], []))
+        if not times or end > times[-1]:
+            self.refresh()
+            times, paths = self._index.get(domain, ([], []))
+        else:
+            self.refresh_async()
+        lo = bisect_left(times, start)
+        hi = bisect_right(times, end)
+        return list(zip(times[lo:hi], paths[lo:hi]))
+
+    def info(self, path: str) -> Optional[dict]:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT valid_time, domain, ny, nx, nz, variables, mtime, size FROM wrf_files WHERE path = ?",
+                (path,)
+            ).fetchone()
+        if row is None:
+            return None
+        valid_time, domain, ny, nx, nz, variables, mtime, size = row
+        return {'path': path, 'valid_time': datetime.fromisoformat(valid_time), 'domain': domain,
+                'shape': (ny, nx, nz), 'variables': variables.split(',') if variables else [],
+                'mtime': mtime, 'size': size}
+
+    def stats(self) -> dict:
+        return {domain: {'files': len(times), 'first': times[0].isoformat(), 'last': times[-1].isoformat()}
+                for domain, (times, _) in self._index.items() if times}
+
+    def close(self):
+        with self._db_lock:
+            self._conn.close()
+
+
+_catalogs: Dict[str, WRFCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(root: str) -> WRFCatalog:
+    """폴더별로 공유하는 카탈로그"""
+    root = os.path.abspath(root)
+    with _catalogs_lock:
+        catalog = _catalogs.get(root)
+        if catalog is None:
+            catalog = _catalogs[root] = WRFCatalog(root)
+        return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="wrfout 파일 카탈로그 갱신/조회")
+    parser.add_argument('root')
+    parser.add_argument('--db', default=CATALOG_PATH)
+    parser.add_argument('--domain', default='d01')
+    parser.add_argument('--start', type=datetime.fromisoformat)
+    parser.add_argument('--end', type=datetime.fromisoformat)
+    args = parser.parse_args()
+
+    catalog = WRFCatalog(args.root, args.db)
+    t0 = time.perf_counter()
+    changed = catalog.refresh(force=True)
+    print(f"{changed}개 파일 갱신 ({time.perf_counter() - t0:.2f}s)")
+    for domain, info in catalog.stats().items():
+        print(f"{domain}: {info['files']}개 파일, {info['first']} ~ {info['last']}")
+    if args.start and args.end:
+        for ts, path in catalog.find(args.start, args.end, args.domain):
+            print(ts, path)
+    catalog.close()
+
+
+if __name__ == '__main__':
+    main()
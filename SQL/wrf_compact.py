@@ -0,0 +1,203 @@
+"""뷰어용 필드를 변수별 압축 배열로 저장/조회 (wrf_domain_grid + wrf_fields)
+
+WRF_2024_01_NC 는 시각마다 wrfout 전체를 BYTEA 로 저장하지만, 뷰어는 XLAT/XLONG, T2,
+연직 평균 U/V 만 사용한다. 이 모듈은 정적 격자를 도메인당 한 번만 저장하고,
+시각별 필드는 float32 (또는 scale/offset 을 둔 int16) 배열로 저장한다.
+
+기존 BYTEA 데이터 변환:
+    python wrf_compact.py --start 2024-01-01T00:00 --end 2024-01-31T23:00 --encoding int16
+"""
+import argparse
+import threading
+from datetime import datetime
+from typing import Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import psycopg2
+
+from wrf_db import iter_nc_range, iter_query, pooled_connection
+from wrf_io import DEFAULT_WIND_LEVEL, extract_fields, open_nc_bytes
+
+DEFAULT_DOMAIN = 'd01'
+ENCODINGS = ('float32', 'int16')
+INT16_MISSING = -32768
+
+_FIELD_COLUMNS = ("timestamp, encoding, t2, t2_scale, t2_offset, "
+                  "u, u_scale, u_offset, v, v_scale, v_offset")
+
+
+def encode_array(values: np.ndarray, encoding: str = 'float32') -> Tuple[bytes, Optional[float], Optional[float]]:
+    """배열을 (바이트, scale, offset) 으로 인코딩"""
+    values = np.asarray(values, dtype=np.float32)
+    if encoding == 'float32':
+        return values.astype('<f4').tobytes(), None, None
+    if encoding != 'int16':
+        raise ValueError(f"지원하지 않는 인코딩입니다: {encoding}")
+
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.full(values.shape, INT16_MISSING, dtype='<i2').tobytes(), 1.0, 0.0
+    vmin, vmax = float(values[finite].min()), float(values[finite].max())
+    offset = (vmin + vmax) / 2
+    scale = (vmax - vmin) / 65532 or 1.0
+    quantized = np.rint((np.where(finite, values, offset) - offset) / scale)
+    quantized = np.where(finite, quantized, INT16_MISSING).astype('<i2')
+    return quantized.tobytes(), scale, offset
+
+
+def decode_array(data: bytes, shape: Tuple[int, int], encoding: str = 'float32',
+                 scale: Optional[float] = None, offset: Optional[float] = None) -> np.ndarray:
+    """encode_array 의 역변환"""
+    if encoding == 'float32':
+        return np.frombuffer(data, dtype='<f4').reshape(shape)
+    if encoding != 'int16':
+        raise ValueError(f"지원하지 않는 인코딩입니다: {encoding}")
+    quantized = np.frombuffer(data, dtype='<i2').reshape(shape)
+    values = quantized.astype(np.float32) * np.float32(scale) + np.float32(offset)
+    values[quantized == INT16_MISSING] = np.nan
+    return values
+
+
+def write_domain_grid(conn, domain: str, xlat: np.ndarray, xlong: np.ndarray):
+    """도메인 정적 격자 저장 (이미 있으면 유지)"""
+    ny, nx = xlat.shape
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO wrf_domain_grid (domain, ny, nx, xlat, xlong) VALUES (%s, %s, %s, %s, %s) "
+            "ON CONFLICT (domain) DO NOTHING",
+            (domain, ny, nx,
+             psycopg2.Binary(encode_array(xlat)[0]),
+             psycopg2.Binary(encode_array(xlong)[0]))
+        )
+
+
+def field_row(domain: str, timestamp: datetime, t2: np.ndarray, u: np.ndarray, v: np.ndarray,
+              encoding: str = 'float32') -> tuple:
+    """wrf_fields 한 행의 값 (domain, timestamp, encoding, t2, t2_scale, ...)"""
+    row = [domain, timestamp, encoding]
+    for values in (t2, u, v):
+        data, scale, offset = encode_array(values, encoding)
+        row.extend([data, scale, offset])
+    return tuple(row)
+
+
+def write_fields(conn, domain: str, timestamp: datetime, t2: np.ndarray, u: np.ndarray, v: np.ndarray,
+                 encoding: str = 'float32'):
+    """시각별 필드 저장 (같은 시각이 있으면 덮어씀)"""
+    row = list(field_row(domain, timestamp, t2, u, v, encoding))
+    for i in (3, 6, 9):
+        row[i] = psycopg2.Binary(row[i])
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO wrf_fields (domain, " + _FIELD_COLUMNS + ") "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) "
+            "ON CONFLICT (domain, timestamp) DO UPDATE SET "
+            "encoding = EXCLUDED.encoding, "
+            "t2 = EXCLUDED.t2, t2_scale = EXCLUDED.t2_scale, t2_offset = EXCLUDED.t2_offset, "
+            "u = EXCLUDED.u, u_scale = EXCLUDED.u_scale, u_offset = EXCLUDED.u_offset, "
+            "v = EXCLUDED.v, v_scale = EXCLUDED.v_scale, v_offset = EXCLUDED.v_offset",
+            tuple(row)
+        )
+
+
+class CompactReader:
+    """wrf_domain_grid + wrf_fields 에서 (xlat, xlong, t2, u, v) 를 읽는 리더
+
+    WRFDataProcessor.process_data 결과와 같은 모양의 튜플을 반환한다.
+    정적 격자는 프로세스당 도메인별로 한 번만 읽는다.
+    """
+
+    _grids = {}
+    _grid_lock = threading.Lock()
+
+    def __init__(self, domain: str = DEFAULT_DOMAIN):
+        self.domain = domain
+
+    def get_grid(self) -> Tuple[np.ndarray, np.ndarray]:
+        grid = self._grids.get(self.domain)
+        if grid is not None:
+            return grid
+        with self._grid_lock:
+            grid = self._grids.get(self.domain)
+            if grid is None:
+                with pooled_connection() as conn:
+                    with conn.cursor() as cursor:
+                        cursor.execute(
+                            "SELECT ny, nx, xlat, xlong FROM wrf_domain_grid WHERE domain = %s",
+                            (self.domain,)
+                        )
+                        result = cursor.fetchone()
+                if result is None:
+                    raise LookupError(f"{self.domain} 도메인 격자가 없습니다.")
+                ny, nx, xlat, xlong = result
+                grid = (decode_array(bytes(xlat), (ny, nx)), decode_array(bytes(xlong), (ny, nx)))
+                self._grids[self.domain] = grid
+        return grid
+
+    def _decode_row(self, row) -> Tuple[datetime, tuple]:
+        xlat, xlong = self.get_grid()
+        timestamp, encoding = row[0], row[1]
+        fields = []
+        for i in (2, 5, 8):
+            fields.append(decode_array(bytes(row[i]), xlat.shape, encoding, row[i + 1], row[i + 2]))
+        t2, u, v = fields
+        return timestamp, (xlat, xlong, t2, u, v)
+
+    def get_fields(self, timestamp: datetime) -> Optional[tuple]:
+        with pooled_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT " + _FIELD_COLUMNS + " FROM wrf_fields WHERE domain = %s AND timestamp = %s",
+                    (self.domain, timestamp)
+                )
+                row = cursor.fetchone()
+        return None if row is None else self._decode_row(row)[1]
+
+    def iter_fields(self, timestamps: Sequence[datetime]) -> Iterator[Tuple[datetime, tuple]]:
+        """지정한 시각들의 필드를 한 번의 쿼리로 시간순 스트리밍"""
+        self.get_grid()
+        rows = iter_query(
+            "SELECT " + _FIELD_COLUMNS + " FROM wrf_fields "
+            "WHERE domain = %s AND timestamp = ANY(%s) ORDER BY timestamp",
+            (self.domain, list(timestamps)),
+            itersize=24,
+        )
+        for row in rows:
+            yield self._decode_row(row)
+
+
+def migrate_blobs(start: datetime, end: datetime, domain: str = DEFAULT_DOMAIN,
+                  encoding: str = 'float32', wind_level: str = DEFAULT_WIND_LEVEL) -> int:
+    """WRF_2024_01_NC 의 BYTEA 데이터를 압축 테이블로 변환 (U/V 는 wind_level 로 계산)"""
+    count = 0
+    with pooled_connection() as conn:
+        for timestamp, nc_data in iter_nc_range(start, end):
+            ds = open_nc_bytes(nc_data)
+            try:
+                xlat, xlong, t2, u, v = extract_fields(ds, wind_level=wind_level)
+            finally:
+                ds.close()
+            if count == 0:
+                write_domain_grid(conn, domain, xlat, xlong)
+            write_fields(conn, domain, timestamp, t2, u, v, encoding)
+            conn.commit()
+            count += 1
+            print(f"{timestamp} 변환 완료 ({len(nc_data) / 1024:.0f} KiB BYTEA)")
+    print(f"총 {count}개 시각 변환 완료")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WRF_2024_01_NC BYTEA 를 압축 필드 테이블로 변환")
+    parser.add_argument('--start', type=datetime.fromisoformat, required=True)
+    parser.add_argument('--end', type=datetime.fromisoformat, required=True)
+    parser.add_argument('--domain', default=DEFAULT_DOMAIN)
+    parser.add_argument('--encoding', choices=ENCODINGS, default='float32')
+    parser.add_argument('--wind-level', default=DEFAULT_WIND_LEVEL,
+                        help="저장할 바람 높이 (column, 10m, k0, kA-B)")
+    args = parser.parse_args()
+    migrate_blobs(args.start, args.end, args.domain, args.encoding, args.wind_level)
+
+
+if __name__ == '__main__':
+    main()
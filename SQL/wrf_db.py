@@ -0,0 +1,136 @@
+"""WRF 결과 DB 접근 계층 (커넥션 풀 + 시간 범위 일괄 조회)"""
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import psycopg2
+from psycopg2 import pool
+
+# 로컬 PostgreSQL로 테스트할 때는 환경 변수로 접속 정보를 바꾼다
+DB_CONFIG = {
+    'host': os.environ.get('WRF_DB_HOST', '172.27.80.1'),
+    'port': int(os.environ.get('WRF_DB_PORT', '5432')),
+    'database': os.environ.get('WRF_DB_NAME', 'calpuff'),
+    'user': os.environ.get('WRF_DB_USER', 'postgres'),
+    'password': os.environ.get('WRF_DB_PASSWORD', '1201'),
+}
+POOL_MIN_CONN = int(os.environ.get('WRF_DB_POOL_MIN', '1'))
+POOL_MAX_CONN = int(os.environ.get('WRF_DB_POOL_MAX', '8'))
+# 풀의 커넥션이 모두 사용 중일 때 기다리는 최대 시간(초), 넘으면 PoolTimeout
+POOL_TIMEOUT = float(os.environ.get('WRF_DB_POOL_TIMEOUT', '30'))
+
+# 서버 측 커서가 한 번에 가져오는 행 수 (행 하나가 수 MB 이므로 작게 유지)
+RANGE_ITERSIZE = 2
+
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool.getconn 은 기다리지 않고 PoolError 를 내므로 빈 자리를 세마포어로 기다림
+_pool_slots = threading.BoundedSemaphore(POOL_MAX_CONN)
+
+
+class PoolTimeout(pool.PoolError):
+    """POOL_TIMEOUT 동안 빈 커넥션이 없음 (잠시 후 다시 시도하면 되는 일시적 상태)"""
+
+
+def get_pool() -> pool.ThreadedConnectionPool:
+    """프로세스 전역 커넥션 풀 (최초 호출 시 생성)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pool.ThreadedConnectionPool(POOL_MIN_CONN, POOL_MAX_CONN, **DB_CONFIG)
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+@contextmanager
+def pooled_connection(timeout: float = POOL_TIMEOUT):
+    """풀에서 커넥션을 빌려주고, 사용 후 트랜잭션을 정리하여 반납
+
+    풀이 모두 사용 중이면 timeout 초까지 기다리고, 그래도 없으면 PoolTimeout.
+    """
+    if not _pool_slots.acquire(timeout=timeout):
+        raise PoolTimeout(f"No free database connection after {timeout:g}s (pool max {POOL_MAX_CONN})")
+    try:
+        conn = get_pool().getconn()
+        broken = False
+        try:
+            yield conn
+        except psycopg2.OperationalError:
+            broken = True
+            raise
+        finally:
+            if not broken and not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            get_pool().putconn(conn, close=broken or bool(conn.closed))
+    finally:
+        _pool_slots.release()
+
+
+def fetch_nc_blob(timestamp: datetime) -> Optional[bytes]:
+    """단일 시각의 nc_data 조회"""
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT nc_data FROM WRF_2024_01_NC WHERE timestamp = %s",
+                (timestamp,)
+            )
+            result = cursor.fetchone()
+    return None if result is None else result[0]
+
+
+def iter_query(query: str, params: tuple, itersize: int = RANGE_ITERSIZE) -> Iterator[tuple]:
+    """서버 측 커서로 쿼리 결과를 itersize 행씩 스트리밍"""
+    with pooled_connection() as conn:
+        # 이름 있는 커서 = 서버 측 커서
+        with conn.cursor(name='wrf_stream') as cursor:
+            cursor.itersize = itersize
+            cursor.execute(query, params)
+            for row in cursor:
+                yield row
+
+
+def iter_nc_range(start: datetime, end: datetime,
+                  itersize: int = RANGE_ITERSIZE) -> Iterator[Tuple[datetime, bytes]]:
+    """[start, end] 구간의 (timestamp, nc_data)를 한 번의 쿼리로 시간순 스트리밍"""
+    return iter_query(
+        "SELECT timestamp, nc_data FROM WRF_2024_01_NC "
+        "WHERE timestamp BETWEEN %s AND %s ORDER BY timestamp",
+        (start, end),
+        itersize,
+    )
+
+
+def iter_nc_timestamps(timestamps: Sequence[datetime],
+                       itersize: int = RANGE_ITERSIZE) -> Iterator[Tuple[datetime, bytes]]:
+    """지정한 시각들의 (timestamp, nc_data)를 한 번의 쿼리로 시간순 스트리밍"""
+    return iter_query(
+        "SELECT timestamp, nc_data FROM WRF_2024_01_NC "
+        "WHERE timestamp = ANY(%s) ORDER BY timestamp",
+        (list(timestamps),),
+        itersize,
+    )
+
+
+def fetch_latest_timestamps(count: int) -> List[datetime]:
+    """가장 최근 count 개 시각 (오래된 순)"""
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT timestamp FROM WRF_2024_01_NC ORDER BY timestamp DESC LIMIT %s",
+                (count,)
+            )
+            rows = cursor.fetchall()
+    return sorted(row[0] for row in rows)
@@ -0,0 +1,176 @@
+"""브라우저 렌더링용 필드 바이너리 묶음 (T2/U/V 시계열 + 정적 격자)
+
+서버에서 프레임을 그리는 대신 process_data 결과 배열을 작은 바이너리로 보내고
+animation.html 의 canvas 렌더러가 컨투어와 바람 벡터를 직접 그린다.
+
+형식 (리틀 엔디언):
+    b'WRFF' | uint32 헤더 길이 | JSON 헤더 | 8바이트 정렬 패딩 | 배열 데이터
+
+헤더의 variables[이름] = {dtype, shape, offset, length, scale, add_offset, nodata}
+    값 = add_offset + scale * 저장값   (uint8 의 nodata(255) 는 NaN)
+float16 은 scale=1, add_offset=0 으로 값을 그대로 저장한다.
+
+    payload = pack_fields(times, fields, encoding='uint8', grid_id=grid_id(xlat, xlong))
+    header, arrays = unpack(payload)
+"""
+import hashlib
+import json
+import struct
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from matplotlib import colormaps, colors as mcolors
+
+MAGIC = b'WRFF'
+VERSION = 1
+ENCODINGS = ('uint8', 'float16')
+DEFAULT_ENCODING = 'uint8'
+UINT8_NODATA = 255
+ALIGN = 8
+
+
+def parse_encoding(value: Optional[str]) -> str:
+    """인코딩 이름 검사 (잘못된 값은 ValueError)"""
+    encoding = (value or DEFAULT_ENCODING).lower()
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown field encoding: {value} (choose from {', '.join(ENCODINGS)})")
+    return encoding
+
+
+def quantize(values: np.ndarray, encoding: str = DEFAULT_ENCODING) -> Tuple[np.ndarray, float, float]:
+    """(저장 배열, scale, add_offset)
+
+    uint8 은 배열 전체의 최소/최대를 0~254 로 선형 양자화한다 (오차는 scale/2 이내).
+    """
+    values = np.asarray(values, dtype=np.float32)
+    if encoding == 'float16':
+        return values.astype(np.float16), 1.0, 0.0
+
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.full(values.shape, UINT8_NODATA, dtype=np.uint8), 1.0, 0.0
+    lo = float(values[finite].min())
+    hi = float(values[finite].max())
+    scale = (hi - lo) / (UINT8_NODATA - 1) or 1.0
+    q = np.rint((np.where(finite, values, lo) - lo) / scale)
+    q = np.clip(q, 0, UINT8_NODATA - 1).astype(np.uint8)
+    q[~finite] = UINT8_NODATA
+    return q, scale, lo
+
+
+def dequantize(data: np.ndarray, scale: float, add_offset: float,
+               nodata: Optional[int] = None) -> np.ndarray:
+    values = data.astype(np.float32) * np.float32(scale) + np.float32(add_offset)
+    if nodata is not None:
+        values[data == nodata] = np.nan
+    return values
+
+
+def grid_id(xlat: np.ndarray, xlong: np.ndarray) -> str:
+    """격자 좌표 내용으로 정한 식별자 (같은 격자면 브라우저 캐시를 그대로 사용)"""
+    digest = hashlib.sha1()
+    for array in (xlat, xlong):
+        array = np.ascontiguousarray(array, dtype=np.float32)
+        digest.update(str(array.shape).encode('ascii'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _pack(header: dict, arrays: Dict[str, Tuple[np.ndarray, float, float, Optional[int]]]) -> bytes:
+    chunks = []
+    variables = {}
+    offset = 0
+    for name, (data, scale, add_offset, nodata) in arrays.items():
+        data = np.ascontiguousarray(data)
+        raw = data.astype(data.dtype.newbyteorder('<'), copy=False).tobytes()
+        pad = -offset % ALIGN
+        if pad:
+            chunks.append(b'\0' * pad)
+            offset += pad
+        variables[name] = {
+            'dtype': data.dtype.name,
+            'shape': list(data.shape),
+            'offset': offset,
+            'length': len(raw),
+            'scale': scale,
+            'add_offset': add_offset,
+            'nodata': nodata,
+        }
+        chunks.append(raw)
+        offset += len(raw)
+
+    header = dict(header, version=VERSION, variables=variables)
+    encoded = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    # 데이터 시작 위치를 8바이트 경계에 맞춤 (브라우저 TypedArray 뷰가 복사 없이 만들어짐)
+    encoded += b' ' * (-(len(MAGIC) + 4 + len(encoded)) % ALIGN)
+    return b''.join([MAGIC, struct.pack('<I', len(encoded)), encoded] + chunks)
+
+
+def unpack(payload: bytes) -> Tuple[dict, Dict[str, np.ndarray]]:
+    """(헤더, {이름: 원래 단위 float32 배열})"""
+    if payload[:4] != MAGIC:
+        raise ValueError("Not a WRFF payload")
+    (length,) = struct.unpack_from('<I', payload, 4)
+    header = json.loads(payload[8:8 + length])
+    base = 8 + length
+    arrays = {}
+    for name, info in header['variables'].items():
+        start = base + info['offset']
+        data = np.frombuffer(payload, dtype=np.dtype(info['dtype']).newbyteorder('<'),
+                             count=int(np.prod(info['shape'])), offset=start).reshape(info['shape'])
+        arrays[name] = dequantize(data, info['scale'], info['add_offset'], info['nodata'])
+    return header, arrays
+
+
+def style_header(style: dict) -> dict:
+    """서버 프레임과 같은 모양으로 그리기 위한 스타일 (구간 경계, 구간별 색, 바람 벡터 설정)"""
+    levels = np.arange(*style['levels'])
+    cmap = colormaps[style['cmap']]
+    # contourf 와 같은 방식으로 구간 중앙값의 색을 사용
+    norm = mcolors.Normalize(vmin=levels[0], vmax=levels[-1])
+    centers = (levels[:-1] + levels[1:]) / 2
+    return {
+        'levels': [round(float(x), 6) for x in levels],
+        'colors': [mcolors.to_hex(cmap(norm(x))) for x in centers],
+        'bbox': [float(x) for x in style['bbox']],
+        'quiver_stride': style.get('quiver_stride', 1),
+        'quiver_scale': style['quiver_scale'],
+        'quiver_color': style['quiver_color'],
+    }
+
+
+def pack_grid(xlat: np.ndarray, xlong: np.ndarray) -> bytes:
+    """정적 격자 (float32 그대로, 한 번 받아 브라우저에 캐시)"""
+    return _pack(
+        {'kind': 'grid', 'grid': grid_id(xlat, xlong), 'shape': list(xlat.shape)},
+        {
+            'xlat': (np.asarray(xlat, dtype=np.float32), 1.0, 0.0, None),
+            'xlong': (np.asarray(xlong, dtype=np.float32), 1.0, 0.0, None),
+        },
+    )
+
+
+def pack_fields(times: List[datetime], fields: List[tuple], encoding: str = DEFAULT_ENCODING,
+                style: Optional[dict] = None, grid: Optional[str] = None) -> bytes:
+    """시각별 (xlat, xlong, t2, u, v) 를 (nt, ny, nx) 배열 3개로 묶음"""
+    encoding = parse_encoding(encoding)
+    if not fields:
+        raise ValueError("No fields to pack")
+    shape = fields[0][2].shape
+    arrays = {}
+    for index, name in ((2, 't2'), (3, 'u'), (4, 'v')):
+        stacked = np.stack([f[index] for f in fields]).astype(np.float32, copy=False)
+        data, scale, add_offset = quantize(stacked, encoding)
+        arrays[name] = (data, scale, add_offset, UINT8_NODATA if encoding == 'uint8' else None)
+
+    header = {
+        'kind': 'fields',
+        'encoding': encoding,
+        'grid': grid or grid_id(fields[0][0], fields[0][1]),
+        'shape': list(shape),
+        'times': [ts.isoformat() for ts in times],
+    }
+    if style is not None:
+        header['style'] = style_header(style)
+    return _pack(header, arrays)
@@ -0,0 +1,222 @@
+"""wrfout 파일들을 병렬로 DB에 적재 (바이너리 COPY + ON CONFLICT)
+
+INSERT_WRF_DATA_ARRAY 노트북의 적재 과정을 대체한다. 파일을 to_netcdf 로 다시 쓰지 않고
+원본 바이트를 그대로 COPY 로 흘려보내며, 이미 있는 시각은 건너뛴다.
+CREATE_WRF_TIMESTAMP_INDEX.sql 의 timestamp 고유 인덱스가 먼저 있어야 한다.
+
+    python wrf_ingest.py /home/yurim2/WRF/WRF-4.1.2/test/em_real --workers 4
+    python wrf_ingest.py /home/yurim2/WRF/WRF-4.1.2/test/em_real --target compact --encoding int16
+"""
+import argparse
+import glob
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Sequence, Tuple
+
+import psycopg2
+import xarray as xr
+
+from pg_copy import COPY_CHUNK_SIZE, CopyStream, FileField
+from wrf_compact import DEFAULT_DOMAIN, ENCODINGS, field_row, write_domain_grid
+from wrf_db import POOL_MAX_CONN, close_pool, pooled_connection
+from wrf_io import DEFAULT_WIND_LEVEL, INGEST_WIND_LEVEL, extract_fields, parse_wind_level, parse_wrfout_time
+
+DEFAULT_PATTERN = 'wrfout_d01_*'
+DEFAULT_BATCH_SIZE = 8
+TARGETS = ('blob', 'compact')
+
+BLOB_STAGING = (
+    "CREATE TEMP TABLE IF NOT EXISTS wrf_nc_staging "
+    "(timestamp TIMESTAMP, nc_data BYTEA) ON COMMIT DELETE ROWS"
+)
+COMPACT_STAGING = (
+    "CREATE TEMP TABLE IF NOT EXISTS wrf_fields_staging "
+    "(LIKE wrf_fields INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+)
+COMPACT_TYPES = ('text', 'timestamp', 'text',
+                 'bytea', 'float4', 'float4',
+                 'bytea', 'float4', 'float4',
+                 'bytea', 'float4', 'float4')
+
+
+def find_wrfout_files(folder: str, pattern: str = DEFAULT_PATTERN) -> List[Tuple[datetime, str]]:
+    """폴더의 wrfout 파일을 (시각, 경로) 목록으로 시간순 정렬"""
+    files = []
+    for path in glob.glob(os.path.join(folder, pattern)):
+        timestamp = parse_wrfout_time(path)
+        if timestamp is None:
+            print(f'{path}의 형식이 잘못되었습니다.')
+            continue
+        files.append((timestamp, path))
+    return sorted(files)
+
+
+def existing_timestamps(timestamps: Sequence[datetime], target: str, domain: str) -> set:
+    """이미 적재된 시각 (다시 보내지 않도록 미리 한 번에 조회)"""
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            if target == 'compact':
+                cursor.execute(
+                    "SELECT timestamp FROM wrf_fields WHERE domain = %s AND timestamp = ANY(%s)",
+                    (domain, list(timestamps))
+                )
+            else:
+                cursor.execute(
+                    "SELECT timestamp FROM WRF_2024_01_NC WHERE timestamp = ANY(%s)",
+                    (list(timestamps),)
+                )
+            return {row[0] for row in cursor.fetchall()}
+
+
+def ingest_blob_batch(batch: Sequence[Tuple[datetime, str]]) -> Tuple[int, int]:
+    """파일 원본을 WRF_2024_01_NC 에 적재하고 (신규 행 수, 보낸 바이트) 반환"""
+    stream = CopyStream(((ts, FileField(path)) for ts, path in batch), ('timestamp', 'bytea'))
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(BLOB_STAGING)
+            cursor.copy_expert(
+                "COPY wrf_nc_staging (timestamp, nc_data) FROM STDIN WITH (FORMAT binary)",
+                stream, size=COPY_CHUNK_SIZE
+            )
+            cursor.execute(
+                "INSERT INTO WRF_2024_01_NC (timestamp, nc_data) "
+                "SELECT timestamp, nc_data FROM wrf_nc_staging "
+                "ON CONFLICT (timestamp) DO NOTHING"
+            )
+            inserted = cursor.rowcount
+        conn.commit()
+    return inserted, stream.bytes_sent
+
+
+def _compact_rows(batch, domain: str, encoding: str, grid: list, wind_level: str):
+    for timestamp, path in batch:
+        with xr.open_dataset(path) as ds:
+            xlat, xlong, t2, u, v = extract_fields(ds, wind_level=wind_level)
+        if not grid:
+            grid.append((xlat, xlong))
+        yield field_row(domain, timestamp, t2, u, v, encoding)
+
+
+def ingest_compact_batch(batch: Sequence[Tuple[datetime, str]], domain: str = DEFAULT_DOMAIN,
+                         encoding: str = 'float32',
+                         wind_level: str = DEFAULT_WIND_LEVEL) -> Tuple[int, int]:
+    """필드를 추출해 wrf_fields 에 적재하고 (신규 행 수, 보낸 바이트) 반환
+
+    U/V 는 wind_level 로 계산해 저장하며, 뷰어에서는 wind_level=ingest 로 읽는다.
+    """
+    grid = []
+    stream = CopyStream(_compact_rows(batch, domain, encoding, grid, wind_level), COMPACT_TYPES)
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(COMPACT_STAGING)
+            cursor.copy_expert(
+                "COPY wrf_fields_staging FROM STDIN WITH (FORMAT binary)",
+                stream, size=COPY_CHUNK_SIZE
+            )
+            # 격자는 COPY 중에 읽은 첫 파일 것을 사용 (이미 있으면 유지)
+            write_domain_grid(conn, domain, *grid[0])
+            cursor.execute(
+                "INSERT INTO wrf_fields SELECT * FROM wrf_fields_staging "
+                "ON CONFLICT (domain, timestamp) DO NOTHING"
+            )
+            inserted = cursor.rowcount
+        conn.commit()
+    return inserted, stream.bytes_sent
+
+
+def compact_wind_level(value: str) -> str:
+    """compact 에 저장할 바람 높이 검증 (ingest 는 저장된 값을 읽을 때만 쓰므로 ValueError)"""
+    level = parse_wind_level(value)
+    if level == INGEST_WIND_LEVEL:
+        raise ValueError("wind level 'ingest' reads stored winds; choose column, 10m, k0 or kA-B to ingest")
+    return level
+
+
+def ingest(folder: str, pattern: str = DEFAULT_PATTERN, workers: int = 4,
+           batch_size: int = DEFAULT_BATCH_SIZE, target: str = 'blob',
+           domain: str = DEFAULT_DOMAIN, encoding: str = 'float32', skip_existing: bool = True,
+           wind_level: str = DEFAULT_WIND_LEVEL) -> dict:
+    """폴더의 wrfout 파일들을 workers 개 커넥션으로 나누어 적재"""
+    # 잘못된 바람 높이는 묶음마다 실패하지 않도록 작업을 나누기 전에 한 번 검사
+    wind_level = compact_wind_level(wind_level)
+    files = find_wrfout_files(folder, pattern)
+    if skip_existing and files:
+        existing = existing_timestamps([ts for ts, _ in files], target, domain)
+        if existing:
+            print(f'이미 적재된 {len(existing)}개 시각은 건너뜁니다.')
+            files = [(ts, path) for ts, path in files if ts not in existing]
+    if not files:
+        print('적재할 파일이 없습니다.')
+        return {'files': 0, 'inserted': 0, 'failed': 0, 'bytes': 0, 'seconds': 0.0}
+
+    workers = max(1, min(workers, POOL_MAX_CONN))
+    batches = [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+    print(f'{len(files)}개 파일을 {len(batches)}개 묶음, 워커 {workers}개로 적재합니다.')
+
+    stats = {'files': 0, 'inserted': 0, 'failed': 0, 'bytes': 0}
+    lock = threading.Lock()
+    t0 = time.perf_counter()
+
+    def run(batch):
+        if target == 'compact':
+            return ingest_compact_batch(batch, domain, encoding, wind_level)
+        return ingest_blob_batch(batch)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                inserted, nbytes = future.result()
+            except (psycopg2.Error, OSError, ValueError) as e:
+                print(f'{batch[0][0]} ~ {batch[-1][0]} 적재에 실패했습니다:', e)
+                with lock:
+                    stats['failed'] += len(batch)
+                continue
+            with lock:
+                stats['files'] += len(batch)
+                stats['inserted'] += inserted
+                stats['bytes'] += nbytes
+                elapsed = time.perf_counter() - t0
+                mib = stats['bytes'] / 1024 / 1024
+                print(f"[{stats['files'] + stats['failed']}/{len(files)}] "
+                      f"신규 {stats['inserted']}개, {mib:.1f} MiB, "
+                      f"{mib / elapsed:.1f} MiB/s, {stats['files'] / elapsed:.1f} files/s")
+
+    stats['seconds'] = time.perf_counter() - t0
+    print(f"\n처리 완료 ({stats['seconds']:.1f}s):")
+    print(f"성공: {stats['files']} 파일 (신규 {stats['inserted']}개)")
+    print(f"실패: {stats['failed']} 파일")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="wrfout 파일 병렬 적재 (바이너리 COPY)")
+    parser.add_argument('folder')
+    parser.add_argument('--pattern', default=DEFAULT_PATTERN)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--target', choices=TARGETS, default='blob',
+                        help="blob = WRF_2024_01_NC, compact = wrf_fields (CREATE_WRF_COMPACT_TABLES.sql)")
+    parser.add_argument('--domain', default=DEFAULT_DOMAIN)
+    parser.add_argument('--encoding', choices=ENCODINGS, default='float32')
+    parser.add_argument('--wind-level', default=DEFAULT_WIND_LEVEL,
+                        help="compact 에 저장할 바람 높이 (column, 10m, k0, kA-B)")
+    parser.add_argument('--no-skip-existing', dest='skip_existing', action='store_false')
+    args = parser.parse_args()
+    try:
+        args.wind_level = compact_wind_level(args.wind_level)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        ingest(args.folder, args.pattern, args.workers, args.batch_size, args.target,
+               args.domain, args.encoding, args.skip_existing, args.wind_level)
+    finally:
+        close_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""WRF netCDF 데이터 입출력 공통 함수"""
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+
+import netCDF4
+import numpy as np
+import xarray as xr
+
+
+def open_nc_bytes(data: bytes) -> xr.Dataset:
+    """DB(BYTEA)에 저장된 netCDF 파일을 디스크에 쓰지 않고 메모리에서 연다
+
+    반환된 Dataset은 사용 후 반드시 close() 해야 한다.
+    """
+    nc = netCDF4.Dataset('inmemory.nc', mode='r', memory=bytes(data))
+    return xr.open_dataset(xr.backends.NetCDF4DataStore(nc))
+
+
+def destagger(u: np.ndarray, v: np.ndarray):
+    """스태거 격자의 U/V를 질량 격자(south_north x west_east)로 보간 (앞쪽 시간 축 허용)"""
+    u_adj = 0.5 * (u[..., :-1] + u[..., 1:])
+    v_adj = 0.5 * (v[..., :-1, :] + v[..., 1:, :])
+    return u_adj, v_adj
+
+
+# (도메인, 격자 크기, bbox, pad, align) 별 잘라내기 범위 캐시
+_windows = {}
+_windows_lock = threading.Lock()
+
+
+def bbox_window(xlat: np.ndarray, xlong: np.ndarray, bbox, pad: int = 2,
+                align: int = 1) -> Optional[Tuple[slice, slice]]:
+    """bbox (west, south, east, north) 를 덮는 질량 격자 i/j 범위 (겹치지 않으면 None)
+
+    등고선이 경계에서 끊기지 않도록 pad 칸 여유를 두고, 바람 벡터 간격(align)에 맞춰
+    시작 위치를 정렬하여 전체 격자로 그린 것과 같은 격자점에 화살표가 찍히게 한다.
+    """
+    west, south, east, north = bbox
+    inside = (xlong >= west) & (xlong <= east) & (xlat >= south) & (xlat <= north)
+    rows = np.flatnonzero(inside.any(axis=1))
+    cols = np.flatnonzero(inside.any(axis=0))
+    if rows.size == 0 or cols.size == 0:
+        return None
+    i0 = max(rows[0] - pad, 0)
+    j0 = max(cols[0] - pad, 0)
+    i0 -= i0 % align
+    j0 -= j0 % align
+    i1 = min(rows[-1] + pad + 1, xlat.shape[0])
+    j1 = min(cols[-1] + pad + 1, xlat.shape[1])
+    return slice(int(i0), int(i1)), slice(int(j0), int(j1))
+
+
+def get_window(domain: str, shape: Tuple[int, int], bbox,
+               load_grid: Callable[[], Tuple[np.ndarray, np.ndarray]],
+               pad: int = 2, align: int = 1) -> Optional[Tuple[slice, slice]]:
+    """도메인별로 한 번만 계산하는 bbox_window (load_grid 는 캐시에 없을 때만 호출)"""
+    key = (domain, tuple(shape), tuple(float(x) for x in bbox), pad, align)
+    with _windows_lock:
+        if key in _windows:
+            return _windows[key]
+    xlat, xlong = load_grid()
+    window = bbox_window(xlat, xlong, bbox, pad, align)
+    with _windows_lock:
+        _windows[key] = window
+    return window
+
+
+def dataset_window(ds: xr.Dataset, bbox, domain: str = 'd01', pad: int = 2,
+                   align: int = 1) -> Optional[Tuple[slice, slice]]:
+    """wrfout Dataset 의 bbox 잘라내기 범위"""
+    shape = (ds.sizes['south_north'], ds.sizes['west_east'])
+    return get_window(
+        domain, shape, bbox,
+        lambda: (ds['XLAT'].isel(Time=0).values, ds['XLONG'].isel(Time=0).values),
+        pad, align
+    )
+
+
+def crop_dataset(ds: xr.Dataset, window: Optional[Tuple[slice, slice]]) -> xr.Dataset:
+    """질량/스태거 격자 차원을 함께 잘라냄 (지연 로딩이므로 실제 읽기 전에 적용됨)"""
+    if window is None:
+        return ds
+    rows, cols = window
+    return ds.isel(
+        south_north=rows,
+        west_east=cols,
+        south_north_stag=slice(rows.start, rows.stop + 1),
+        west_east_stag=slice(cols.start, cols.stop + 1),
+        missing_dims='ignore',
+    )
+
+
+def crop_fields(fields: tuple, window: Optional[Tuple[slice, slice]]) -> tuple:
+    """이미 읽은 (xlat, xlong, t2, u, v) 질량 격자 배열들을 잘라냄"""
+    if window is None:
+        return fields
+    rows, cols = window
+    return tuple(field[rows, cols] for field in fields)
+
+
+# 바람 높이 선택
+#   column : 전체 연직 평균 (기존 방식)
+#   10m    : U10/V10 (2차원 변수만 읽음)
+#   k0     : 가장 낮은 모델 층
+#   kA-B   : A~B 층 평균 (예: k0-4)
+#   ingest : 적재 시 미리 계산해 둔 값 (압축 저장소 전용)
+DEFAULT_WIND_LEVEL = 'column'
+INGEST_WIND_LEVEL = 'ingest'
+_WIND_RANGE = re.compile(r'^k(\d+)-(\d+)$')
+
+
+class WindLevelError(ValueError):
+    """바람 높이가 자료의 모델 층 범위를 벗어남 (요청 오류)"""
+
+
+def check_wind_layers(level: str, layers: Optional[slice], nz: int):
+    """kA-B 층 범위가 bottom_top 층 수 안에 있는지 확인 (잘라서 계산하지 않음)"""
+    if layers is not None and layers.stop is not None and layers.stop > nz:
+        raise WindLevelError(f"Wind level {level} is outside the {nz} model levels (k0-{nz - 1})")
+
+
+def parse_wind_level(value: Optional[str]) -> str:
+    """바람 높이 문자열 검증 (잘못된 값이면 ValueError)"""
+    level = (value or DEFAULT_WIND_LEVEL).strip().lower()
+    if level in ('column', '10m', 'k0', INGEST_WIND_LEVEL):
+        return level
+    match = _WIND_RANGE.match(level)
+    if match and int(match.group(1)) <= int(match.group(2)):
+        return level
+    raise ValueError(f"Unknown wind level: {value} (column, 10m, k0, kA-B, ingest)")
+
+
+def wind_source(level: str = DEFAULT_WIND_LEVEL):
+    """바람 높이에 필요한 ((u 변수, v 변수), bottom_top 범위) (10m 이면 범위 None)"""
+    if level == '10m':
+        return ('U10', 'V10'), None
+    if level == 'column':
+        return ('U', 'V'), slice(None)
+    if level == 'k0':
+        return ('U', 'V'), slice(0, 1)
+    match = _WIND_RANGE.match(level)
+    if match is None:
+        raise ValueError(f"Wind level {level} cannot be computed from wrfout variables")
+    return ('U', 'V'), slice(int(match.group(1)), int(match.group(2)) + 1)
+
+
+def select_wind(ds: xr.Dataset, level: str = DEFAULT_WIND_LEVEL, time=0):
+    """바람 높이에 해당하는 (u, v) DataArray (지연 로딩, U/V 는 스태거 격자 그대로)"""
+    (u_name, v_name), layers = wind_source(level)
+    u = ds[u_name].isel(Time=time)
+    v = ds[v_name].isel(Time=time)
+    if layers is not None:
+        check_wind_layers(level, layers, ds.sizes['bottom_top'])
+        u = u.isel(bottom_top=layers)
+        v = v.isel(bottom_top=layers)
+        u = u.mean(dim='bottom_top')
+        v = v.mean(dim='bottom_top')
+    return u, v
+
+
+def extract_wind(ds: xr.Dataset, level: str = DEFAULT_WIND_LEVEL):
+    """질량 격자의 (u, v) 를 필요한 층만 읽어서 계산"""
+    u, v = select_wind(ds, level)
+    if level == '10m':
+        return u.values, v.values
+    return destagger(u.values, v.values)
+
+
+def extract_fields(ds: xr.Dataset, window: Optional[Tuple[slice, slice]] = None,
+                   wind_level: str = DEFAULT_WIND_LEVEL):
+    """뷰어가 사용하는 (xlat, xlong, t2[°C], u, v) 를 NumPy 배열로 추출
+
+    U/V 는 wind_level 에 따라 필요한 층만 읽어 질량 격자로 보간한다.
+    window 가 있으면 변수를 읽기 전에 잘라낸다.
+    """
+    ds = crop_dataset(ds, window)
+    xlat = ds['XLAT'].isel(Time=0).values
+    xlong = ds['XLONG'].isel(Time=0).values
+    t2 = ds['T2'].isel(Time=0).values - 273.15  # 섭씨 변환
+    u, v = extract_wind(ds, wind_level)
+    return xlat, xlong, t2, u, v
+
+
+def parse_wrfout_time(filename: str) -> Optional[datetime]:
+    """wrfout_d01_2024-01-01_04:00:00 형식 파일 이름에서 시각 추출 (형식이 다르면 None)"""
+    name = os.path.basename(filename)
+    parts = name.split('_')
+    if len(parts) < 4 or parts[0] != 'wrfout':
+        return None
+    try:
+        return datetime.strptime(f"{parts[2]}_{parts[3]}".replace(' ', ''), '%Y-%m-%d_%H:%M:%S')
+    except ValueError:
+        return None
@@ -0,0 +1,143 @@
+"""애니메이션 생성 작업 큐 (작업 ID, 진행률, 동일 요청 병합, 대기열 크기 제한)
+
+    jobs = JobQueue(run_job, workers=2, max_pending=8)
+    job, created = jobs.submit(key, args)   # 대기열이 가득 차면 QueueFull
+    jobs.get(job.id).to_dict()
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFull(Exception):
+    """대기 중인 작업 수가 한도에 도달함"""
+
+
+class Job:
+    def __init__(self, key: Hashable, args: tuple):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.args = args
+        self.status = QUEUED
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def set_progress(self, done: int, total: int):
+        self.done, self.total = done, total
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': {'done': self.done, 'total': self.total},
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobQueue:
+    """고정 개수의 워커 스레드가 처리하는 작업 큐
+
+    같은 key 의 작업이 대기/실행 중이면 새 작업을 만들지 않고 기존 작업을 돌려준다.
+    runner(job, *args) 의 반환값이 job.result 가 된다.
+    """
+
+    def __init__(self, runner: Callable[..., Any], workers: int = 2, max_pending: int = 8,
+                 max_finished: int = 100, reuse_result: Optional[Callable[[Job], bool]] = None):
+        self.runner = runner
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        # 끝난 작업의 결과를 다시 써도 되는지 (예: 결과 파일이 아직 있는지)
+        self.reuse_result = reuse_result
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._active: Dict[Hashable, Job] = {}
+        self._finished: Dict[Hashable, Job] = {}
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._workers = [
+            threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, key: Hashable, args: tuple = ()) -> Tuple[Job, bool]:
+        """(작업, 새로 만들었는지) 반환, 대기열이 가득 차면 QueueFull"""
+        with self._cond:
+            job = self._active.get(key)
+            if job is not None:
+                return job, False
+            job = self._finished.get(key)
+            if job is not None and job.status == DONE and (self.reuse_result is None or self.reuse_result(job)):
+                return job, False
+            if len(self._pending) >= self.max_pending:
+                raise QueueFull(f"{len(self._pending)} jobs are already waiting")
+
+            job = Job(key, args)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._pending.append(job)
+            self._cond.notify()
+            return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def position(self, job: Job) -> Optional[int]:
+        """대기열에서의 순서 (0 = 다음 차례), 대기 중이 아니면 None"""
+        with self._cond:
+            try:
+                return self._pending.index(job)
+            except ValueError:
+                return None
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            running = sum(1 for job in self._active.values() if job.status == RUNNING)
+            return {'pending': len(self._pending), 'running': running,
+                    'max_pending': self.max_pending, 'workers': len(self._workers)}
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                job = self._pending.popleft()
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            try:
+                result, status, error = self.runner(job, *job.args), DONE, None
+            except Exception as e:
+                print(f"작업 {job.id} 실패: {e}")
+                result, status, error = None, FAILED, str(e)
+
+            with self._cond:
+                job.result, job.status, job.error = result, status, error
+                job.finished_at = time.time()
+                self._active.pop(job.key, None)
+                self._finished[job.key] = job
+                self._trim()
+
+    def _trim(self):
+        # 오래된 완료 작업 기록 정리 (대기/실행 중인 작업은 유지)
+        finished = [job for job in self._jobs.values() if job.status in (DONE, FAILED)]
+        for job in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job.id]
+            if self._finished.get(job.key) is job:
+                del self._finished[job.key]
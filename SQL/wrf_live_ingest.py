@@ -0,0 +1,326 @@
+"""운영 중인 WRF 출력 폴더를 감시해 새 wrfout 파일을 바로 적재하고 프레임을 미리 렌더링
+
+WRF 가 한 시간씩 wrfout_d01_* 를 쓰는 동안 계속 실행해 두면, 파일 쓰기가 끝난 시각을
+DB(WRF_2024_01_NC 또는 wrf_fields)에 넣고 그 시각의 프레임을 뷰어와 같은 프레임 캐시에
+만들어 두므로, 최신 예측을 쓰기 직후 몇 초 안에 볼 수 있다.
+
+    감시(폴링) -> 적재(직렬, 메인 스레드) -> 렌더링 대기열(크기 제한, 최신 것부터 꺼냄, 가장 오래된 것 버림) -> 렌더링 스레드
+
+- 파일 완료 판단: (크기, 수정 시각)이 settle 초 동안 그대로이고 netCDF 로 열려 마지막 T2 를 읽을 수 있을 때
+- 렌더링이 밀려도 적재는 멈추지 않는다. 대기열에서는 가장 최근 시각부터 렌더링하고
+  가득 차면 가장 오래된 시각을 버린다 (버린 시각은 뷰어가 처음 요청할 때 렌더링됨).
+
+    python wrf_live_ingest.py /home/yurim2/WRF/WRF-4.1.2/test/em_real
+    python wrf_live_ingest.py /home/yurim2/WRF/WRF-4.1.2/test/em_real --target compact --encoding int16
+"""
+import argparse
+import fnmatch
+import os
+import signal
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import netCDF4
+import psycopg2
+import xarray as xr
+
+from wrf_compact import DEFAULT_DOMAIN, ENCODINGS
+from wrf_db import close_pool
+from wrf_ingest import (DEFAULT_PATTERN, TARGETS, existing_timestamps, ingest_blob_batch,
+                        ingest_compact_batch)
+from wrf_io import parse_wrfout_time
+
+DEFAULT_FOLDER = os.environ.get('WRF_OUTPUT_DIR', '/home/yurim2/WRF/WRF-4.1.2/test/em_real')
+DEFAULT_POLL = 5.0
+DEFAULT_SETTLE = 10.0
+DEFAULT_RENDER_QUEUE = 6
+# 크기가 변하지 않는데도 settle 의 이 배수만큼 계속 열리지 않으면 실패로 기록
+UNREADABLE_FACTOR = 30
+RETRY_DELAY = 30.0
+
+
+def is_complete(path: str) -> bool:
+    """netCDF 헤더와 마지막 시각의 T2 를 읽을 수 있으면 쓰기가 끝난 것으로 판단"""
+    try:
+        with netCDF4.Dataset(path) as nc:
+            if nc.dimensions['Time'].size < 1:
+                return False
+            nc.variables['T2'][-1]
+        return True
+    except (OSError, KeyError, IndexError, RuntimeError):
+        return False
+
+
+class FileWatcher:
+    """폴더를 주기적으로 훑어 쓰기가 끝난 wrfout 파일을 시간순으로 알려줌"""
+
+    def __init__(self, folder: str, pattern: str = DEFAULT_PATTERN, settle: float = DEFAULT_SETTLE):
+        self.folder = folder
+        self.pattern = pattern
+        self.settle = settle
+        # 경로 -> ((크기, 수정 시각), 처음 그 상태를 본 시각)
+        self._seen: Dict[str, Tuple[tuple, float]] = {}
+        self._done = set()
+        self.failed = set()
+
+    def poll(self) -> List[Tuple[datetime, str]]:
+        now = time.monotonic()
+        ready = []
+        try:
+            entries = list(os.scandir(self.folder))
+        except OSError as e:
+            print(f"{self.folder} 를 읽을 수 없습니다: {e}")
+            return ready
+        for entry in entries:
+            if not fnmatch.fnmatch(entry.name, self.pattern) or entry.path in self._done:
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            previous = self._seen.get(entry.path)
+            if previous is None or previous[0] != signature:
+                # 새 파일이거나 아직 쓰는 중
+                self._seen[entry.path] = (signature, now)
+                self.failed.discard(entry.path)
+                continue
+            stable_for = now - previous[1]
+            if stable_for < self.settle or entry.path in self.failed:
+                continue
+            timestamp = parse_wrfout_time(entry.path)
+            if timestamp is None:
+                print(f"{entry.path}의 형식이 잘못되었습니다.")
+                self._done.add(entry.path)
+                continue
+            if is_complete(entry.path):
+                ready.append((timestamp, entry.path))
+            elif stable_for > self.settle * UNREADABLE_FACTOR:
+                print(f"{entry.path} 를 netCDF 로 읽을 수 없어 건너뜁니다 (파일이 바뀌면 다시 시도).")
+                self.failed.add(entry.path)
+        return sorted(ready)
+
+    def mark_done(self, path: str):
+        self._done.add(path)
+        self._seen.pop(path, None)
+
+
+class LatestQueue:
+    """크기가 제한된 최신 우선(LIFO) 대기열
+
+    가장 최근에 넣은 항목부터 꺼내고, 가득 차면 가장 오래된 항목을 버리므로 넣는 쪽이 막히지 않음.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_RENDER_QUEUE):
+        self._items = deque()
+        self._maxsize = maxsize
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item) -> Optional[object]:
+        """넣고, 밀려난 항목이 있으면 반환"""
+        with self._cond:
+            dropped = None
+            if len(self._items) >= self._maxsize:
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+            return dropped
+
+    def get(self, timeout: Optional[float] = None):
+        """가장 최근 항목 (timeout 동안 없으면 None)"""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            return self._items.pop() if self._items else None
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+
+class FramePrerenderer(threading.Thread):
+    """대기열의 시각을 뷰어와 같은 스타일/캐시 키로 렌더링해 프레임 캐시에 저장"""
+
+    def __init__(self, queue: LatestQueue, target: str = 'blob', render_workers: int = 1):
+        super().__init__(name='frame-prerender', daemon=True)
+        # 뷰어 모듈의 처리기를 그대로 사용해 캐시 키/스타일/잘라내기가 같도록 함
+        from fastapi import HTTPException
+        from frame_renderer import FrameRenderer
+        from wrf_result_db_plot import WRFDataProcessor
+
+        self.queue = queue
+        self._http_error = HTTPException
+        self.processor = WRFDataProcessor(source='compact' if target == 'compact' else 'blob',
+                                          renderer=FrameRenderer(render_workers))
+        self.stop_event = threading.Event()
+        self.rendered = 0
+        self.failed = 0
+        self.last_latency = None
+
+    def prime_fields(self, timestamp: datetime, path: str):
+        """방금 적재한 파일에서 바로 필드를 만들어 두어 DB 를 다시 읽지 않게 함 (blob 저장소)"""
+        if self.processor.compact is not None:
+            return
+        with xr.open_dataset(path) as ds:
+            fields = self.processor.process_data(ds)
+        self.processor.field_cache.put(self.processor._field_key(timestamp), fields)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            item = self.queue.get(timeout=1.0)
+            if item is None:
+                continue
+            timestamp, path, ready_at = item
+            try:
+                self.prime_fields(timestamp, path)
+                for _ in self.processor.iter_frames([timestamp]):
+                    pass
+            except self._http_error as e:
+                self.failed += 1
+                print(f"{timestamp} 프레임 렌더링 실패: {e.detail}")
+                continue
+            except Exception as e:
+                self.failed += 1
+                print(f"{timestamp} 프레임 렌더링 실패: {e}")
+                continue
+            self.rendered += 1
+            self.last_latency = time.monotonic() - ready_at
+            print(f"{timestamp} 프레임 준비 완료 (파일 완료 후 {self.last_latency:.1f}s, 대기 {len(self.queue)}개)")
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+        self.processor.renderer.close()
+
+
+class LiveIngest:
+    """감시 -> 적재 -> 미리 렌더링 파이프라인"""
+
+    def __init__(self, folder: str = DEFAULT_FOLDER, pattern: str = DEFAULT_PATTERN,
+                 poll: float = DEFAULT_POLL, settle: float = DEFAULT_SETTLE,
+                 target: str = 'blob', domain: str = DEFAULT_DOMAIN, encoding: str = 'float32',
+                 render: bool = True, render_queue: int = DEFAULT_RENDER_QUEUE, render_workers: int = 1):
+        self.watcher = FileWatcher(folder, pattern, settle)
+        self.poll_interval = poll
+        self.target = target
+        self.domain = domain
+        self.encoding = encoding
+        self.queue = LatestQueue(render_queue)
+        self.renderer = FramePrerenderer(self.queue, target, render_workers) if render else None
+        self.stop_event = threading.Event()
+        self._retry_at: Dict[str, float] = {}
+        self._checked_existing = False
+        self.stats = {'ingested': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+
+    def _ingest(self, timestamp: datetime, path: str) -> bool:
+        """한 파일 적재 (DB 오류면 False, 나중에 다시 시도)"""
+        t0 = time.perf_counter()
+        try:
+            if self.target == 'compact':
+                inserted, nbytes = ingest_compact_batch([(timestamp, path)], self.domain, self.encoding)
+            else:
+                inserted, nbytes = ingest_blob_batch([(timestamp, path)])
+        except (psycopg2.Error, OSError, ValueError) as e:
+            print(f"{timestamp} 적재에 실패했습니다 ({RETRY_DELAY:.0f}s 후 다시 시도):", e)
+            self.stats['failed'] += 1
+            return False
+        self.stats['ingested' if inserted else 'skipped'] += 1
+        self.stats['bytes'] += nbytes
+        print(f"{timestamp} 적재 완료 ({'신규' if inserted else '이미 있음'}, "
+              f"{nbytes / 1024 / 1024:.1f} MiB, {time.perf_counter() - t0:.2f}s)")
+        return True
+
+    def _skip_existing(self, ready: List[Tuple[datetime, str]]) -> set:
+        """시작 직후 한 번: 이미 적재된 시각은 적재하지 않음 (프레임은 확인 후 필요하면 렌더링)"""
+        if self._checked_existing or not ready:
+            return set()
+        self._checked_existing = True
+        try:
+            existing = existing_timestamps([ts for ts, _ in ready], self.target, self.domain)
+        except psycopg2.Error as e:
+            print("적재된 시각 조회에 실패했습니다:", e)
+            self._checked_existing = False
+            return set()
+        if existing:
+            print(f"이미 적재된 {len(existing)}개 시각은 적재를 건너뜁니다.")
+        return existing
+
+    def step(self):
+        """한 번 폴링하고 완료된 파일을 시간순으로 적재"""
+        now = time.monotonic()
+        ready = [(ts, path) for ts, path in self.watcher.poll()
+                 if self._retry_at.get(path, 0) <= now]
+        existing = self._skip_existing(ready)
+        for timestamp, path in ready:
+            if self.stop_event.is_set():
+                break
+            ready_at = time.monotonic()
+            if timestamp not in existing and not self._ingest(timestamp, path):
+                self._retry_at[path] = time.monotonic() + RETRY_DELAY
+                continue
+            self._retry_at.pop(path, None)
+            self.watcher.mark_done(path)
+            if self.renderer is not None:
+                dropped = self.queue.put((timestamp, path, ready_at))
+                if dropped is not None:
+                    print(f"렌더링이 밀려 {dropped[0]} 미리 렌더링을 건너뜁니다.")
+
+    def run(self):
+        print(f"{self.watcher.folder} 감시 시작 (패턴 {self.watcher.pattern}, "
+              f"{self.poll_interval}s 간격, 안정 {self.watcher.settle}s, 대상 {self.target})")
+        if self.renderer is not None:
+            self.renderer.start()
+        try:
+            while not self.stop_event.is_set():
+                self.step()
+                self.stop_event.wait(self.poll_interval)
+        finally:
+            if self.renderer is not None:
+                self.renderer.stop()
+            print(f"감시 종료: {self.status()}")
+
+    def stop(self, *_):
+        self.stop_event.set()
+
+    def status(self) -> dict:
+        status = dict(self.stats, unreadable=len(self.watcher.failed), queued=len(self.queue),
+                      dropped=self.queue.dropped)
+        if self.renderer is not None:
+            status.update(rendered=self.renderer.rendered, render_failed=self.renderer.failed,
+                          last_latency=self.renderer.last_latency)
+        return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WRF 출력 폴더 감시 -> DB 적재 -> 프레임 미리 렌더링")
+    parser.add_argument('folder', nargs='?', default=DEFAULT_FOLDER)
+    parser.add_argument('--pattern', default=DEFAULT_PATTERN)
+    parser.add_argument('--poll', type=float, default=DEFAULT_POLL, help="폴더 확인 간격 (초)")
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE,
+                        help="크기/수정 시각이 이 시간 동안 그대로면 쓰기 완료로 봄 (초)")
+    parser.add_argument('--target', choices=TARGETS, default='blob')
+    parser.add_argument('--domain', default=DEFAULT_DOMAIN)
+    parser.add_argument('--encoding', choices=ENCODINGS, default='float32')
+    parser.add_argument('--render-queue', type=int, default=DEFAULT_RENDER_QUEUE,
+                        help="미리 렌더링 대기열 크기 (가득 차면 가장 오래된 시각을 버림)")
+    parser.add_argument('--render-workers', type=int, default=1)
+    parser.add_argument('--no-render', dest='render', action='store_false')
+    args = parser.parse_args()
+
+    live = LiveIngest(args.folder, args.pattern, args.poll, args.settle, args.target, args.domain,
+                      args.encoding, args.render, args.render_queue, args.render_workers)
+    signal.signal(signal.SIGINT, live.stop)
+    signal.signal(signal.SIGTERM, live.stop)
+    try:
+        live.run()
+    finally:
+        close_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""긴 시간 범위의 wrfout 파일들을 하나의 지연 로딩 Dataset 으로 열어 시간 청크 단위로 처리
+
+파일마다 전체를 읽어 리스트에 모아두는 대신, 필요한 변수/영역/층만 골라
+open_mfdataset(dask) 으로 열고, 메모리 상한에 맞춘 시간 청크씩 계산해서 프레임을 내보낸다.
+"""
+import os
+from datetime import datetime
+from typing import Iterator, List, Sequence, Tuple
+
+import xarray as xr
+
+try:
+    import dask
+except ImportError:  # dask 가 없으면 파일별로 읽는 방식만 사용
+    dask = None
+
+from wrf_io import DEFAULT_WIND_LEVEL, check_wind_layers, crop_dataset, destagger, wind_source
+
+# 요청 하나의 메모리 상한 (MB, 렌더링 워커 포함 RSS, 0 이면 검사하지 않음)
+# 뷰어가 PeakRSSMonitor 로 측정하다가 넘으면 요청을 중단한다.
+MEMORY_LIMIT_MB = int(os.environ.get('WRF_LOADER_MEMORY_MB', '4096'))
+# 시간 청크 하나의 예상 크기 (MB), 상한이 있으면 그 1/4 을 넘지 않게 줄임
+CHUNK_MEMORY_MB = int(os.environ.get('WRF_LOADER_CHUNK_MB', '512'))
+
+
+def chunk_budget_mb(memory_limit_mb: int = MEMORY_LIMIT_MB, chunk_mb: int = CHUNK_MEMORY_MB) -> int:
+    return max(1, min(chunk_mb, memory_limit_mb // 4)) if memory_limit_mb > 0 else chunk_mb
+
+
+def lazy_available() -> bool:
+    return dask is not None
+
+
+def _preprocess(window, wind_level: str):
+    (u_name, v_name), layers = wind_source(wind_level)
+
+    def preprocess(ds: xr.Dataset) -> xr.Dataset:
+        # 시각은 파일 이름(카탈로그)에서 가져오므로 파일마다 Time 이 하나여야 함
+        if ds.sizes.get('Time', 1) != 1:
+            raise ValueError(f"{ds.encoding.get('source', 'wrfout file')} has {ds.sizes['Time']} time steps; "
+                             f"the lazy loader expects one time step per file (split it with ncks/cdo)")
+        ds = ds[['XLAT', 'XLONG', 'T2', u_name, v_name]]
+        ds = crop_dataset(ds, window)
+        if layers is not None:
+            check_wind_layers(wind_level, layers, ds.sizes['bottom_top'])
+            ds = ds.isel(bottom_top=layers)
+        return ds
+
+    return preprocess
+
+
+def chunk_hours(ds: xr.Dataset, chunk_bytes: int) -> int:
+    """읽어 들인 원본 + 계산 결과가 chunk_bytes 정도가 되는 시간 청크 크기 (추정치)"""
+    hours = ds.sizes['Time']
+    per_hour = sum(var.nbytes for var in ds.data_vars.values()) / max(hours, 1)
+    # 원본 청크와 연직 평균/보간 중간 결과를 함께 고려해 2배로 잡음
+    return int(max(1, min(hours, chunk_bytes // max(2 * per_hour, 1))))
+
+
+def iter_fields_lazy(files: Sequence[Tuple[datetime, str]], window=None,
+                     wind_level: str = DEFAULT_WIND_LEVEL,
+                     chunk_memory_mb: int = CHUNK_MEMORY_MB) -> Iterator[Tuple[datetime, tuple]]:
+    """(시각, (xlat, xlong, t2, u, v)) 를 시간순으로 생성 (시간 청크 단위로 계산)
+
+    files 의 시각과 Time 을 하나씩 대응시키므로 파일마다 Time 이 하나여야 한다 (아니면 ValueError).
+    """
+    if dask is None:
+        raise RuntimeError("dask is required for the lazy loader")
+    if not files:
+        return
+    timestamps: List[datetime] = [ts for ts, _ in files]
+    ds = xr.open_mfdataset(
+        [path for _, path in files],
+        combine='nested',
+        concat_dim='Time',
+        preprocess=_preprocess(window, wind_level),
+        data_vars='all',
+        coords='minimal',
+        compat='override',
+        join='override',
+        chunks={'Time': 1},
+        parallel=False,
+    )
+    try:
+        if ds.sizes['Time'] != len(timestamps):
+            raise ValueError(f"Expected {len(timestamps)} time steps from {len(timestamps)} files, "
+                             f"got {ds.sizes['Time']}")
+        step = chunk_hours(ds, chunk_memory_mb * 1024 * 1024)
+        ds = ds.chunk({'Time': step})
+        (u_name, v_name), layers = wind_source(wind_level)
+        xlat = ds['XLAT'].isel(Time=0).values
+        xlong = ds['XLONG'].isel(Time=0).values
+        print(f"{len(timestamps)}개 시각을 {step}시간 청크로 계산합니다.")
+
+        for k in range(0, len(timestamps), step):
+            part = ds.isel(Time=slice(k, k + step))
+            # 필요한 층은 preprocess 에서 이미 골라 두었으므로 남은 층 평균만 계산
+            u, v = part[u_name], part[v_name]
+            if layers is not None:
+                u = u.mean(dim='bottom_top')
+                v = v.mean(dim='bottom_top')
+            t2, u, v = dask.compute(part['T2'].data - 273.15, u.data, v.data)
+            if layers is not None:
+                u, v = destagger(u, v)
+            for m in range(t2.shape[0]):
+                yield timestamps[k + m], (xlat, xlong, t2[m], u[m], v[m])
+    finally:
+        ds.close()
@@ -0,0 +1,127 @@
+"""요청별 최대 RSS 측정 (/proc/<pid>/statm 을 주기적으로 읽는 샘플러 스레드)
+
+렌더링 워커처럼 메모리를 많이 쓰는 자식 프로세스의 RSS 도 함께 합산할 수 있고,
+상한(limit_bytes)을 주면 넘었을 때 check()/guard() 가 MemoryLimitExceeded 를 낸다.
+"""
+import os
+import threading
+from typing import Callable, Iterable, Iterator, Optional
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+SAMPLE_INTERVAL = 0.05
+
+
+def current_rss(pid='self') -> Optional[int]:
+    """프로세스 RSS (바이트, 기본은 현재 프로세스), /proc 이 없거나 종료된 프로세스면 None"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryLimitExceeded(RuntimeError):
+    """측정한 RSS 가 요청 메모리 상한을 넘음"""
+
+
+def _children_rss(pids: Iterable[int]) -> int:
+    return sum(rss for rss in (current_rss(pid) for pid in pids) if rss is not None)
+
+
+class PeakRSSMonitor:
+    """with 블록 동안의 최대 RSS 를 기록
+
+        with PeakRSSMonitor(child_pids=renderer.worker_pids) as mem:
+            ...
+        print(mem.report())
+
+    child_pids 를 주면 샘플마다 그 프로세스들의 RSS 를 더해 (현재 + 자식) 합계의 최대를 기록한다.
+    프로세스 전체 RSS 이므로 동시에 처리되는 다른 요청의 사용량도 포함된다.
+    limit_bytes 를 주면 합계가 그 값을 넘은 뒤의 check() 가 MemoryLimitExceeded 를 낸다.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL,
+                 child_pids: Optional[Callable[[], Iterable[int]]] = None,
+                 limit_bytes: Optional[int] = None):
+        self.interval = interval
+        self.child_pids = child_pids
+        self.limit_bytes = limit_bytes or None
+        self.exceeded_bytes = None
+        self.start_bytes = None
+        self.peak_bytes = None
+        self.peak_parent_bytes = None
+        self.peak_children_bytes = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample_total(self) -> Optional[int]:
+        rss = current_rss()
+        if rss is None:
+            return None
+        children = _children_rss(self.child_pids()) if self.child_pids is not None else 0
+        if self.peak_parent_bytes is None or rss > self.peak_parent_bytes:
+            self.peak_parent_bytes = rss
+        if self.peak_children_bytes is None or children > self.peak_children_bytes:
+            self.peak_children_bytes = children
+        return rss + children
+
+    def _sample(self):
+        total = self._sample_total()
+        if total is None:
+            return
+        if self.peak_bytes is None or total > self.peak_bytes:
+            self.peak_bytes = total
+        if self.limit_bytes is not None and total > self.limit_bytes and self.exceeded_bytes is None:
+            self.exceeded_bytes = total
+
+    def check(self):
+        """상한을 넘은 샘플이 있었으면 MemoryLimitExceeded"""
+        if self.exceeded_bytes is not None:
+            mib = 1024 * 1024
+            raise MemoryLimitExceeded(
+                f"Memory limit exceeded: {self.exceeded_bytes / mib:.0f} MiB used "
+                f"(including render workers), limit is {self.limit_bytes / mib:.0f} MiB"
+            )
+
+    def guard(self, items: Iterable) -> Iterator:
+        """항목을 하나 넘길 때마다 상한을 확인하며 그대로 흘려보냄"""
+        for item in items:
+            self.check()
+            yield item
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> 'PeakRSSMonitor':
+        self.start_bytes = self._sample_total()
+        self.peak_bytes = self.start_bytes
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+    @property
+    def growth_bytes(self) -> Optional[int]:
+        if self.start_bytes is None or self.peak_bytes is None:
+            return None
+        return self.peak_bytes - self.start_bytes
+
+    def report(self) -> dict:
+        mib = 1024 * 1024
+        if self.peak_bytes is None:
+            return {'peak_rss_mib': None, 'start_rss_mib': None, 'growth_mib': None,
+                    'peak_parent_rss_mib': None, 'peak_children_rss_mib': None}
+        # peak_rss_mib 는 (현재 + 자식) 합계의 최대, 나머지 두 값은 각각의 최대
+        return {
+            'peak_rss_mib': round(self.peak_bytes / mib, 1),
+            'start_rss_mib': round(self.start_bytes / mib, 1),
+            'growth_mib': round(self.growth_bytes / mib, 1),
+            'peak_parent_rss_mib': round(self.peak_parent_bytes / mib, 1),
+            'peak_children_rss_mib': round(self.peak_children_bytes / mib, 1),
+        }
@@ -0,0 +1,323 @@
+"""처리 단계별 시간/바이트 측정, Prometheus 텍스트 형식 /metrics, 샘플링 프로파일러
+
+    with stage('db_fetch', nbytes=len(blob)):
+        ...
+    FRAMES.inc(source='rendered')
+    render_metrics()          # /metrics 응답 본문
+
+단계 시간은 중첩을 고려한 자기 시간(안쪽 단계 시간 제외)으로 기록하므로, 렌더링 결과를
+기다리는 동안 안쪽에서 일어난 조회/처리 시간은 render 에 섞이지 않는다.
+요청 단위 집계(RequestTimings)는 contextvars 로 전달되어 Server-Timing 헤더가 된다.
+렌더링 워커 프로세스 안의 시간은 요청 프로세스에서 결과를 기다린 시간으로만 잡힌다.
+"""
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Counts
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROFILE_INTERVAL = float(os.environ.get('WRF_PROFILE_INTERVAL', '0.01'))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self) -> str:
+        return f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> str:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + ''.join(
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}\n" for key, value in items)
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # 레이블별 [구간별 개수..., +Inf 개수, 합계]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def render(self) -> str:
+        with self._lock:
+            items = sorted((key, list(counts)) for key, counts in self._values.items())
+        lines = [self.header()]
+        for key, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts[:-1]):
+                cumulative += count
+                le = 'le="%s"' % ('+Inf' if bound == float('inf') else repr(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}\n")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {counts[-1]}\n")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}\n")
+        return ''.join(lines)
+
+
+REGISTRY: list = []
+
+STAGE_SECONDS = Histogram('wrf_stage_seconds', 'Self time spent in each processing stage', ['stage'])
+STAGE_BYTES = Counter('wrf_stage_bytes_total', 'Bytes handled by each processing stage', ['stage'])
+FRAMES = Counter('wrf_frames_total', 'Animation frames served, by where they came from', ['source'])
+CACHE_REQUESTS = Counter('wrf_cache_requests_total', 'Cache lookups', ['cache', 'result'])
+IN_FLIGHT = Gauge('wrf_jobs_in_flight', 'Animation requests currently being processed', ['kind'])
+REQUEST_SECONDS = Histogram('wrf_request_seconds', 'HTTP request latency', ['route', 'status'])
+
+
+def render_metrics() -> str:
+    """등록된 모든 지표를 Prometheus 텍스트 형식(0.0.4)으로"""
+    return ''.join(metric.render() for metric in REGISTRY)
+
+
+class RequestTimings:
+    """한 요청 동안의 단계별 (시간, 바이트) 합계"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float, nbytes: int = 0):
+        with self._lock:
+            entry = self.stages.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += nbytes
+
+    def server_timing(self) -> str:
+        """Server-Timing 헤더 값 (ms)"""
+        with self._lock:
+            items = list(self.stages.items())
+        parts = []
+        for name, (seconds, nbytes) in items:
+            desc = f';desc="{nbytes / 1024 / 1024:.1f} MiB"' if nbytes else ''
+            parts.append(f"{name};dur={seconds * 1000:.1f}{desc}")
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ', '.join(parts)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {name: {'seconds': round(seconds, 4), 'bytes': nbytes}
+                    for name, (seconds, nbytes) in self.stages.items()}
+
+
+_request: ContextVar[Optional[RequestTimings]] = ContextVar('wrf_request_timings', default=None)
+# 스레드별 진행 중인 단계 스택 [(이름, 시작 시각, 안쪽 단계 시간)]
+_stack = threading.local()
+
+
+def begin_request() -> Tuple[RequestTimings, object]:
+    timings = RequestTimings()
+    return timings, _request.set(timings)
+
+
+def end_request(token):
+    _request.reset(token)
+
+
+def current_request() -> Optional[RequestTimings]:
+    return _request.get()
+
+
+def record(name: str, seconds: float, nbytes: int = 0):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    if nbytes:
+        STAGE_BYTES.inc(nbytes, stage=name)
+    timings = _request.get()
+    if timings is not None:
+        timings.add(name, seconds, nbytes)
+
+
+def add_bytes(name: str, nbytes: int):
+    """name 단계가 처리한 바이트 수만 더함 (시간은 stage 로 따로 기록)"""
+    STAGE_BYTES.inc(nbytes, stage=name)
+    timings = _request.get()
+    if timings is not None:
+        timings.add(name, 0.0, nbytes)
+
+
+@contextmanager
+def stage(name: str, nbytes: int = 0):
+    """with 블록의 자기 시간(안쪽 stage 제외)을 name 단계로 기록"""
+    stack = getattr(_stack, 'frames', None)
+    if stack is None:
+        stack = _stack.frames = []
+    frame = [name, time.perf_counter(), 0.0]
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        stack.pop()
+        elapsed = time.perf_counter() - frame[1]
+        if stack:
+            stack[-1][2] += elapsed
+        record(name, elapsed - frame[2], nbytes)
+
+
+def timed_iter(iterable: Iterable, name: str,
+               nbytes: Optional[Callable[[object], int]] = None) -> Iterator:
+    """다음 항목을 가져오는 데 걸린 시간을 name 단계로 기록하며 그대로 내보냄"""
+    iterator = iter(iterable)
+    try:
+        while True:
+            with stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            if nbytes is not None:
+                add_bytes(name, nbytes(item))
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+
+
+class SamplingProfiler:
+    """모든 스레드의 스택을 주기적으로 샘플링해 접힌 스택(collapsed stack) 개수로 집계
+
+    실행 중에 start()/stop() 으로 켜고 끌 수 있으며, collapsed() 결과는
+    flamegraph.pl / speedscope 에 바로 넣을 수 있다.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.started_at = None
+        self._counts: _Counts = _Counts()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: Optional[float] = None, reset: bool = True) -> bool:
+        if self.running:
+            return False
+        if interval is not None:
+            self.interval = interval
+        if reset:
+            with self._lock:
+                self._counts.clear()
+                self.samples = 0
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> bool:
+        if not self.running:
+            return False
+        self._stop.set()
+        self._thread.join()
+        return True
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            stacks = []
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                parts = []
+                while frame is not None and len(parts) < self.max_depth:
+                    code = frame.f_code
+                    parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                parts.append(names.get(ident, str(ident)))
+                stacks.append(';'.join(reversed(parts)))
+            with self._lock:
+                self._counts.update(stacks)
+                self.samples += 1
+
+    def collapsed(self, limit: Optional[int] = None) -> str:
+        with self._lock:
+            items = self._counts.most_common(limit)
+        return ''.join(f"{stack} {count}\n" for stack, count in items)
+
+    def status(self) -> dict:
+        return {'running': self.running, 'interval': self.interval, 'samples': self.samples,
+                'stacks': len(self._counts), 'started_at': self.started_at}
+
+
+profiler = SamplingProfiler()
+if os.environ.get('WRF_PROFILER', '0') == '1':
+    profiler.start()
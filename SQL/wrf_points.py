@@ -0,0 +1,142 @@
+"""wrfout 격자점을 WRF_2024_01 (격자점당 한 행) 에 적재
+
+INSERT_WRF_DATA 노트북의 process_nc_file 을 대체한다. 격자를 한 칸씩 순회하는 대신
+범위 마스크를 한 번에 계산하고, executemany 대신 COPY 로 적재한다.
+
+    python wrf_points.py /home/yurim2/WRF/SQL --pattern 'wrfout_d01_2024-01-01*'
+"""
+import argparse
+import glob
+import io
+import os
+import time
+from datetime import datetime
+from typing import Dict, Tuple
+
+import numpy as np
+import xarray as xr
+
+from wrf_db import close_pool, pooled_connection
+from wrf_io import destagger, parse_wrfout_time
+
+LAT_RANGE = (33.0, 38.6)
+LONG_RANGE = (124.0, 131.0)
+POINT_COLUMNS = ('xlat', 'xlong', 't2', 'u', 'v', 'u_adjusted', 'v_adjusted')
+
+
+def select_points(ds: xr.Dataset, lat_range=LAT_RANGE, long_range=LONG_RANGE) -> Dict[str, np.ndarray]:
+    """범위 안 격자점의 값들을 1차원 배열로 추출 (NaN = NULL)
+
+    u/v 는 스태거 격자의 [i, j] 값, u_adjusted/v_adjusted 는 기존 테이블과 같이
+    질량 격자 보간값의 [i, j-1], [i-1, j] 값이다.
+    NULL 위치는 노트북과 같이 첫 열(j = 0)에서 두 값 모두 NULL 이고, 추가로 첫 행(i = 0)의
+    v_adjusted 도 NULL 이다 (노트북은 [i-1, j] 가 마지막 행으로 넘어가 도메인 반대편 값을 넣었음).
+    """
+    xlat = ds['XLAT'].isel(Time=0).values
+    xlong = ds['XLONG'].isel(Time=0).values
+    t2 = ds['T2'].isel(Time=0).values - 273.15
+    u = ds['U'].mean(dim='bottom_top').isel(Time=0).values
+    v = ds['V'].mean(dim='bottom_top').isel(Time=0).values
+    u_adj, v_adj = destagger(u, v)
+
+    mask = ((xlat >= lat_range[0]) & (xlat <= lat_range[1]) &
+            (xlong >= long_range[0]) & (xlong <= long_range[1]))
+    rows, cols = np.nonzero(mask)
+
+    u_shift = np.full(xlat.shape, np.nan)
+    u_shift[:, 1:] = u_adj[:, :-1]
+    v_shift = np.full(xlat.shape, np.nan)
+    v_shift[1:, :] = v_adj[:-1, :]
+    v_shift[:, 0] = np.nan
+
+    return {
+        'xlat': xlat[rows, cols],
+        'xlong': xlong[rows, cols],
+        't2': t2[rows, cols],
+        'u': u[rows, cols],
+        'v': v[rows, cols],
+        'u_adjusted': u_shift[rows, cols],
+        'v_adjusted': v_shift[rows, cols],
+    }
+
+
+def points_csv(timestamp: datetime, points: Dict[str, np.ndarray]) -> str:
+    """COPY ... (FORMAT csv) 입력 문자열 (빈 값 = NULL)"""
+    table = np.column_stack([points[name].astype(np.float64) for name in POINT_COLUMNS])
+    if not len(table):
+        return ''
+    buf = io.StringIO()
+    fmt = timestamp.strftime('%Y-%m-%d %H:%M:%S') + ',' + ','.join(['%.9g'] * len(POINT_COLUMNS))
+    np.savetxt(buf, table, fmt=fmt)
+    return buf.getvalue().replace('nan', '')
+
+
+def insert_points(conn, timestamp: datetime, points: Dict[str, np.ndarray]) -> int:
+    """격자점들을 COPY 로 WRF_2024_01 에 적재"""
+    data = points_csv(timestamp, points)
+    if data:
+        with conn.cursor() as cursor:
+            cursor.copy_expert(
+                "COPY WRF_2024_01 (timestamp, " + ", ".join(POINT_COLUMNS) + ") "
+                "FROM STDIN WITH (FORMAT csv)",
+                io.StringIO(data)
+            )
+    return len(points['xlat'])
+
+
+def process_nc_file(file_path: str, lat_range=LAT_RANGE, long_range=LONG_RANGE) -> Tuple[bool, int]:
+    """파일 하나를 적재하고 (성공 여부, 행 수) 반환"""
+    timestamp = parse_wrfout_time(file_path)
+    if timestamp is None:
+        print(f'{file_path}의 형식이 잘못되었습니다.')
+        return False, 0
+
+    with xr.open_dataset(file_path) as ds:
+        points = select_points(ds, lat_range, long_range)
+    try:
+        with pooled_connection() as conn:
+            count = insert_points(conn, timestamp, points)
+            conn.commit()
+    except Exception as e:
+        print(f'{timestamp} 데이터 삽입에 실패했습니다:', e)
+        return False, 0
+    print(f'{timestamp} 데이터 {count}행이 성공적으로 삽입되었습니다.')
+    return True, count
+
+
+def process_all_file(folder_path: str, lat_range=LAT_RANGE, long_range=LONG_RANGE,
+                     pattern: str = 'wrfout_d01_*'):
+    success_count = 0
+    fail_count = 0
+    total_rows = 0
+    t0 = time.perf_counter()
+
+    for file_path in sorted(glob.glob(os.path.join(folder_path, pattern))):
+        ok, count = process_nc_file(file_path, lat_range, long_range)
+        if ok:
+            success_count += 1
+            total_rows += count
+        else:
+            fail_count += 1
+
+    elapsed = time.perf_counter() - t0
+    print(f'\n처리 완료 ({elapsed:.1f}s, {total_rows / max(elapsed, 1e-9):.0f} rows/s):')
+    print(f'성공: {success_count} 파일 ({total_rows}행)')
+    print(f'실패: {fail_count} 파일')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="wrfout 격자점을 WRF_2024_01 에 적재")
+    parser.add_argument('folder')
+    parser.add_argument('--pattern', default='wrfout_d01_*')
+    parser.add_argument('--lat-range', type=float, nargs=2, default=LAT_RANGE, metavar=('MIN', 'MAX'))
+    parser.add_argument('--long-range', type=float, nargs=2, default=LONG_RANGE, metavar=('MIN', 'MAX'))
+    args = parser.parse_args()
+    try:
+        process_all_file(args.folder, tuple(args.lat_range), tuple(args.long_range), args.pattern)
+    finally:
+        close_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,39 @@
 from fastapi import FastAPI, Query, HTTPException, Request  
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from datetime import datetime, timedelta
 import psycopg2
+from datetime import datetime, timedelta
 import xarray as xr
 import matplotlib.pyplot as plt
-import geopandas as gpd
-import numpy as np
 import base64
+import gzip
+import hashlib
 import os
-import io
+import json
+import re
+import time
 from matplotlib.gridspec import GridSpec
 import matplotlib.animation as animation
 import tempfile
-from typing import List, Tuple
-from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+from functools import lru_cache
 from pathlib import Path
+from urllib.parse import urlencode
 from fastapi.middleware.cors import CORSMiddleware
-from matplotlib.animation import PillowWriter
+from wrf_cache import FrameCache, LRUCache
+from wrf_io import (open_nc_bytes, extract_fields, dataset_window, get_window, crop_fields,
+                    parse_wind_level, DEFAULT_WIND_LEVEL, INGEST_WIND_LEVEL, WindLevelError)
+from wrf_db import PoolTimeout, fetch_latest_timestamps, fetch_nc_blob, iter_nc_timestamps
+from wrf_compact import CompactReader
+from frame_renderer import FrameRenderer, draw_frame
+from wrf_boundary import DEFAULT_SHAPEFILE, get_boundary
+from animation_encoder import FORMATS, EncoderUnavailable, encode_animation, parse_format
+from wrf_field_pack import grid_id, pack_fields, pack_grid, parse_encoding
+from wrf_tiles import TILE_VARIABLES, get_tile
+from wrf_timeseries import query_timeseries
+from wrf_aggregate import STATISTICS, aggregate, parse_statistic, render_png, summary
+from wrf_metrics import (CACHE_REQUESTS, FRAMES, IN_FLIGHT, REQUEST_SECONDS, add_bytes, begin_request,
+                         end_request, profiler, render_metrics, stage, timed_iter)
 
 
 app = FastAPI(title="WRF Animation Viewer")
@@ -32,147 +48,631 @@ app.add_middleware(
 )
 templates = Jinja2Templates(directory="templates")  # HTML 템플릿 폴더 설정
 
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(
-            host="172.27.80.1",
-            database="calpuff",
-            user="postgres",
-            password="1201"
-        )
-        return conn
-    except Exception as e:
-        print("데이터베이스 연결에 실패했습니다:", e)
-    return None
+# 겹치는 애니메이션 요청 간에 공유되는 프레임 캐시
+FRAME_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frame_cache")
+frame_cache = FrameCache(FRAME_CACHE_DIR)
+FRAME_VARIABLES = ('T2', 'U', 'V')
+FRAME_KEY_PATTERN = re.compile(r'^[0-9a-f]{40}$')
+
+# 시각별로 처리가 끝난 (xlat, xlong, t2, u, v) 배열 캐시
+field_cache = LRUCache(max_items=48)
+
+# 전체 화면 프레임의 바람 벡터 간격 (잘라낸 격자도 같은 격자점에 화살표가 찍히도록 정렬)
+FULL_VIEW_STRIDE = 3
+
+# 브라우저 렌더링용으로 보낸 격자 (grid id -> 바이너리), 한 요청에 받을 수 있는 최대 시간 수
+# 재시작/다른 uvicorn 워커에서도 같은 URL 로 받을 수 있도록 디스크에 저장
+GRID_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grid_cache")
+grid_payloads = FrameCache(GRID_CACHE_DIR, max_memory_bytes=64 * 1024 * 1024, suffix=".bin")
+FIELDS_MAX_HOURS = int(os.environ.get('WRF_FIELDS_MAX_HOURS', '744'))
+
+# 기간 집계: (구간, 바람 높이, 지점, 임계값) -> RunningStats, (같은 키 + 통계, 형식) -> 응답
+aggregate_stats = LRUCache(max_items=16, max_bytes=256 * 1024 * 1024)
+aggregate_results = LRUCache(max_items=64)
+AGGREGATE_MAX_HOURS = int(os.environ.get('WRF_AGGREGATE_MAX_HOURS', '8784'))
+
+# 필드 저장소: 'blob' = WRF_2024_01_NC 전체 파일, 'compact' = wrf_fields 압축 배열
+FIELD_SOURCE = os.environ.get('WRF_FIELD_SOURCE', 'blob')
+
+# 모든 응답에 Server-Timing 헤더를 붙임 (0 이면 X-Server-Timing: 1 요청 헤더가 있을 때만)
+SERVER_TIMING = os.environ.get('WRF_SERVER_TIMING', '0') == '1'
+
+# 프레임 렌더링 프로세스 풀 (WRF_RENDER_WORKERS 로 워커 수 지정)
+frame_renderer = FrameRenderer()
+
+def db_error(e: Exception) -> HTTPException:
+    """DB 조회 오류 응답 (풀이 가득 찬 일시적 상태는 503 + Retry-After)"""
+    print("데이터베이스 조회에 실패했습니다:", e)
+    if isinstance(e, PoolTimeout):
+        return HTTPException(status_code=503, detail="Database busy, retry shortly",
+                             headers={"Retry-After": "5"})
+    return HTTPException(status_code=500, detail="Database connection failed")
 
-@contextmanager
-def temporary_files():
-    """임시 파일들을 관리하는 context manager"""
-    temp_files = []
-    try:
-        yield temp_files
-    finally:
-        for file in temp_files:
-            try:
-                os.remove(file)
-            except OSError:
-                pass
-            
-            
 class WRFDataProcessor:
-    def __init__(self, shapefile_path: str = "/home/yurim2/WRF/pohang_shp/pohang.shp"):
+    def __init__(self, shapefile_path: str = DEFAULT_SHAPEFILE,
+                 cache: FrameCache = frame_cache,
+                 fields: LRUCache = field_cache,
+                 renderer: FrameRenderer = frame_renderer,
+                 source: str = FIELD_SOURCE,
+                 crop: bool = True,
+                 wind_level: Optional[str] = None):
         self.shapefile_path = shapefile_path
-        self.gdf = gpd.read_file(shapefile_path)
-        self.bounds = self.gdf.total_bounds
+        # 앱 시작 시 한 번 읽어 둔 경계 (단순화 경로 포함), 요청마다 shapefile 을 읽지 않음
+        self.boundary = get_boundary(shapefile_path)
+        self.gdf = self.boundary.gdf
+        self.bounds = self.boundary.bounds
         plt.switch_backend('Agg')
         self.temp_cmap = 'coolwarm'
+        self.frame_cache = cache
+        self.field_cache = fields
+        self.renderer = renderer
+        self.last_encode_report = None
+        self.compact = CompactReader() if source == 'compact' else None
+        # 프레임에 보이는 영역(shapefile 범위)만 읽도록 잘라낼 영역, None 이면 전체 도메인
+        self.crop_bbox = tuple(float(x) for x in self.bounds) if crop else None
+        # 압축 저장소에는 적재 시 계산한 U/V 만 있으므로 기본값이 'ingest'
+        if wind_level is None:
+            wind_level = INGEST_WIND_LEVEL if self.compact is not None else DEFAULT_WIND_LEVEL
+        self.wind_level = parse_wind_level(wind_level)
+        if (self.wind_level == INGEST_WIND_LEVEL) != (self.compact is not None):
+            raise ValueError(
+                f"wind_level={self.wind_level} is not available with WRF_FIELD_SOURCE={source}"
+            )
+        # 프레임 모양을 결정하는 값들 (캐시 키에 포함)
+        self.frame_style = {
+            'figsize': (70, 70),
+            'dpi': 100,
+            'levels': (-5.0, 10.0, 0.5),
+            'cmap': self.temp_cmap,
+            'quiver_scale': 200,
+            'quiver_color': 'green',
+            'boundary_linewidth': 0.5,
+            'grid_alpha': 0.5,
+        }
 
-    def get_db_data(self, timestamp: datetime) -> Tuple[xr.Dataset, str]:
-        """DB에서 데이터를 가져와 xarray Dataset으로 변환"""
-        conn = get_db_connection()
-        if conn is None:
-            raise HTTPException(status_code=500, detail="Database connection failed")
-        
+    def get_db_data(self, timestamp: datetime) -> xr.Dataset:
+        """DB에서 데이터를 가져와 xarray Dataset으로 변환 (사용 후 close 필요)"""
         try:
-            with conn.cursor() as cursor:
-                cursor.execute(
-                    "SELECT nc_data FROM WRF_2024_01_NC WHERE timestamp = %s",
-                    (timestamp,)
-                )
-                result = cursor.fetchone()
-                
-                if result is None:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"No data found for timestamp: {timestamp}"
-                    )
-
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".nc") as tmp_file:
-                    tmp_file.write(result[0])
-                    return xr.open_dataset(tmp_file.name), tmp_file.name
-        finally:
-            conn.close()
+            with stage('db_fetch'):
+                nc_data = fetch_nc_blob(timestamp)
+        except psycopg2.Error as e:
+            raise db_error(e)
+
+        if nc_data is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No data found for timestamp: {timestamp}"
+            )
+        add_bytes('db_fetch', len(nc_data))
+        with stage('decode'):
+            return open_nc_bytes(nc_data)
 
     def process_data(self, ds: xr.Dataset):
-        """데이터셋에서 필요한 변수들을 추출하고 처리"""
-        xlat = ds['XLAT'].isel(Time=0)
-        xlong = ds['XLONG'].isel(Time=0)
-        t2 = ds['T2'].isel(Time=0) - 273.15  # 섭씨 변환
-        u = ds['U'].mean(dim='bottom_top').isel(Time=0)
-        v = ds['V'].mean(dim='bottom_top').isel(Time=0)
-        
-        return xlat, xlong, t2, u, v
+        """데이터셋에서 필요한 변수들을 추출하고 처리 (NumPy 배열 반환)"""
+        # quiver 좌표(xlong, xlat)와 모양을 맞추기 위해 U/V는 질량 격자로 보간됨
+        with stage('process'):
+            window = None
+            if self.crop_bbox is not None:
+                window = dataset_window(ds, self.crop_bbox, align=FULL_VIEW_STRIDE)
+            try:
+                return extract_fields(ds, window, self.wind_level)
+            except WindLevelError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+    def _process_blob(self, nc_data: bytes):
+        with stage('decode'):
+            ds = open_nc_bytes(nc_data)
+        try:
+            return self.process_data(ds)
+        finally:
+            ds.close()
+
+    def _crop_compact(self, fields):
+        """압축 저장소에서 읽은 전체 도메인 필드를 잘라냄"""
+        if fields is None or self.crop_bbox is None:
+            return fields
+        window = get_window(self.compact.domain, fields[0].shape, self.crop_bbox,
+                            self.compact.get_grid, align=FULL_VIEW_STRIDE)
+        return crop_fields(fields, window)
+
+    def _field_key(self, timestamp: datetime):
+        # 잘라낸 필드와 전체 도메인 필드(타일용)를 구분
+        return timestamp, self.crop_bbox, self.wind_level
+
+    def _load_fields(self, timestamp: datetime):
+        if self.compact is None:
+            ds = self.get_db_data(timestamp)
+            try:
+                return self.process_data(ds)
+            finally:
+                ds.close()
+
+        try:
+            with stage('db_fetch'):
+                fields = self._crop_compact(self.compact.get_fields(timestamp))
+        except (psycopg2.Error, LookupError) as e:
+            raise db_error(e)
+        if fields is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No data found for timestamp: {timestamp}"
+            )
+        return fields
+
+    def get_fields(self, timestamp: datetime):
+        """처리된 필드를 캐시에서 가져오거나 DB에서 읽어 처리"""
+        fields = self.field_cache.get(self._field_key(timestamp))
+        if fields is not None:
+            CACHE_REQUESTS.inc(cache='fields', result='hit')
+            return fields
+
+        CACHE_REQUESTS.inc(cache='fields', result='miss')
+        fields = self._load_fields(timestamp)
+        self.field_cache.put(self._field_key(timestamp), fields)
+        return fields
+
+    def _iter_rows(self, timestamps: List[datetime]) -> Iterator[Tuple[datetime, tuple]]:
+        """저장소에서 (시각, 필드) 를 시간순으로 한 번에 조회"""
+        if self.compact is not None:
+            for ts, fields in timed_iter(self.compact.iter_fields(timestamps), 'db_fetch'):
+                yield ts, self._crop_compact(fields)
+            return
+        rows = timed_iter(iter_nc_timestamps(timestamps), 'db_fetch', lambda row: len(row[1]))
+        try:
+            for ts, nc_data in rows:
+                yield ts, self._process_blob(nc_data)
+        finally:
+            rows.close()
+
+    def iter_fields(self, timestamps: List[datetime]) -> Iterator[Tuple[datetime, tuple]]:
+        """여러 시각의 처리된 필드를 시간순으로 생성
+
+        캐시에 없는 시각들은 풀 커넥션의 서버 측 커서로 한 번에 조회한다.
+        """
+        ordered = sorted(set(timestamps))
+        to_fetch = [ts for ts in ordered if self._field_key(ts) not in self.field_cache]
+        pending = set(to_fetch)
+        CACHE_REQUESTS.inc(len(ordered) - len(to_fetch), cache='fields', result='hit')
+        CACHE_REQUESTS.inc(len(to_fetch), cache='fields', result='miss')
+        rows = self._iter_rows(to_fetch) if to_fetch else None
+        try:
+            for ts in ordered:
+                if ts in pending:
+                    row = next(rows, None)
+                    if row is None or row[0] != ts:
+                        raise HTTPException(
+                            status_code=404,
+                            detail=f"No data found for timestamp: {ts}"
+                        )
+                    fields = row[1]
+                    self.field_cache.put(self._field_key(ts), fields)
+                else:
+                    # 조회 사이에 캐시에서 밀려났으면 단건 조회로 대체
+                    fields = self.get_fields(ts)
+                yield ts, fields
+        except (psycopg2.Error, LookupError) as e:
+            raise db_error(e)
+        finally:
+            if rows is not None:
+                rows.close()
+
+    def frame_variables(self) -> Tuple[str, ...]:
+        """프레임 캐시 키에 들어가는 변수 목록 (바람 높이 포함, 기본값은 기존 키 유지)"""
+        if self.wind_level == DEFAULT_WIND_LEVEL:
+            return FRAME_VARIABLES
+        return ('T2', f'U:{self.wind_level}', f'V:{self.wind_level}')
+
+    def get_frame_style(self, zoom_box=None) -> dict:
+        """확대 영역에 따른 프레임 스타일 (표시 범위, 바람 벡터 간격 포함)"""
+        style = dict(self.frame_style)
+        style['bbox'] = tuple(self.bounds) if zoom_box is None else tuple(zoom_box)
+        style['quiver_stride'] = FULL_VIEW_STRIDE if zoom_box is None else 1
+        return style
 
     def plot_frame(self, ax, xlat, xlong, t2, u, v, zoom_box=None):
         """단일 프레임 플롯"""
-        # 기본 범위 설정
-        if zoom_box is None:
-            ax.set_xlim(self.bounds[0], self.bounds[2])
-            ax.set_ylim(self.bounds[1], self.bounds[3])
-        else:
-            ax.set_xlim(zoom_box[0], zoom_box[2])
-            ax.set_ylim(zoom_box[1], zoom_box[3])
-        
-        # 온도 컨투어
-        levels = np.arange(-5.0, 10.0, 0.5)
-        contour = ax.contourf(xlong, xlat, t2, cmap='coolwarm', levels=levels)
-        
-        # 바람 벡터
-        stride = 3 if zoom_box is None else 1
-        quiver = ax.quiver(xlong[::stride, ::stride], 
-                          xlat[::stride, ::stride],
-                          u[::stride, ::stride], 
-                          v[::stride, ::stride],
-                          scale=200, color='green')
-        
-        # 지형도 플롯
-        self.gdf.plot(ax=ax, edgecolor='black', facecolor='none', linewidth=0.5)
-        
-        # 격자선 추가
-        ax.grid(True, linestyle='--', alpha=0.5)
-        
-        return contour, quiver
+        frame = {'xlat': xlat, 'xlong': xlong, 't2': t2, 'u': u, 'v': v}
+        return draw_frame(ax, self.boundary, self.get_frame_style(zoom_box), frame)
+
+    @staticmethod
+    def _frame_data(timestamp: datetime, fields: tuple) -> dict:
+        xlat, xlong, t2, u, v = fields
+        return {'xlat': xlat, 'xlong': xlong, 't2': t2, 'u': u, 'v': v,
+                'title': timestamp.strftime('%Y-%m-%d %H:%M')}
+
+    def iter_frames(self, timestamps: List[datetime], zoom_box=None) -> Iterator[Tuple[datetime, str, bytes]]:
+        """(시각, 캐시 키, PNG) 를 시간순으로 생성
 
-    def create_animation(self, timestamps: List[datetime]) -> str:
-            """Generates animation as a temporary GIF file and returns its path."""
+        이미 렌더링된 프레임은 캐시에서 바로 내보내고, 없는 프레임만 병렬로 렌더링하여
+        완성되는 대로 순서대로 내보낸다.
+        """
+        style = self.get_frame_style(zoom_box)
+        ordered = sorted(set(timestamps))
+        keys = {
+            ts: self.frame_cache.make_key(ts, self.frame_variables(), zoom_box, style)
+            for ts in ordered
+        }
+        missing_keys = set(self.frame_cache.missing(keys.values()))
+        missing = [ts for ts in ordered if keys[ts] in missing_keys]
+        print(f"총 {len(ordered)}개 프레임 중 {len(missing)}개를 새로 렌더링합니다.")
+        CACHE_REQUESTS.inc(len(ordered) - len(missing), cache='frames', result='hit')
+        CACHE_REQUESTS.inc(len(missing), cache='frames', result='miss')
+
+        to_render = (
+            self._frame_data(ts, fields) for ts, fields in self.iter_fields(missing)
+        )
+        # 렌더링 결과를 기다린 시간 (안쪽의 조회/처리 시간은 각 단계로 따로 기록됨)
+        rendered = timed_iter(self.renderer.render_iter(self.shapefile_path, style, to_render), 'render')
+        try:
+            for ts in ordered:
+                key = keys[ts]
+                if key in missing_keys:
+                    png = next(rendered)
+                    self.frame_cache.put(key, png)
+                    FRAMES.inc(source='rendered')
+                else:
+                    png = self.frame_cache.get(key)
+                    if png is None:
+                        # 확인 이후 캐시에서 밀려난 프레임은 단독으로 다시 렌더링
+                        frame = self._frame_data(ts, self.get_fields(ts))
+                        with stage('render'):
+                            png = self.renderer.render(self.shapefile_path, style, [frame])[0]
+                        self.frame_cache.put(key, png)
+                        FRAMES.inc(source='rendered')
+                    else:
+                        FRAMES.inc(source='cache')
+                yield ts, key, png
+        finally:
+            rendered.close()
+
+    def create_animation(self, timestamps: List[datetime], zoom_box=None, fmt: str = 'gif') -> str:
+            """Generates animation as a temporary file in the given format and returns its path.
+
+            이미 렌더링된 프레임은 캐시에서 가져오고, 없는 프레임만 병렬로 렌더링한다.
+            인코딩 결과(형식, 크기, 시간)는 last_encode_report 에 남는다.
+            """
             try:
-                fig, ax = plt.subplots(figsize=(70, 70))
-                processed_data = []
-                
-                with temporary_files() as temp_files:
-                    for ts in timestamps:
-                        ds, temp_file = self.get_db_data(ts)
-                        temp_files.append(temp_file)
-                        processed_data.append(self.process_data(ds))
-
-                    def update(frame):
-                        ax.clear()
-                        xlat, xlong, t2, u, v = processed_data[frame]
-                        contour, quiver = self.plot_frame(ax, xlat, xlong, t2, u, v)
-                        ax.set_title(timestamps[frame].strftime('%Y-%m-%d %H:%M'))
-                        return contour, quiver
-
-                    # 임시 파일에 애니메이션 저장
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".gif") as tmp_file:
-                        ani = animation.FuncAnimation(fig, update, frames=len(processed_data), interval=1000, blit=False)
-                        ani.save(tmp_file.name, writer="pillow", fps=2)
-                        plt.close(fig)
-
-                        # GIF 파일 경로 반환
-                        return tmp_file.name
+                frames = {ts: png for ts, _, png in self.iter_frames(timestamps, zoom_box)}
 
+                # 캐시된 프레임들로 애니메이션 조립 (fps=2)
+                with tempfile.NamedTemporaryFile(delete=False, suffix=FORMATS[fmt]['suffix']) as tmp_file:
+                    path = tmp_file.name
+                try:
+                    with stage('encode'):
+                        self.last_encode_report = encode_animation(
+                            [frames[ts] for ts in timestamps], path, fmt, fps=2)
+                except Exception:
+                    os.remove(path)
+                    raise
+                return path
+
+            except HTTPException:
+                raise
+            except EncoderUnavailable as e:
+                raise HTTPException(status_code=501, detail=str(e))
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"Animation creation failed: {str(e)}")
 
+def hourly_timestamps(start_time: datetime, end_time: datetime) -> List[datetime]:
+    """[start_time, end_time] 구간의 1시간 간격 시각 목록"""
+    return [
+        start_time + timedelta(hours=i)
+        for i in range(int((end_time - start_time).total_seconds() / 3600) + 1)
+    ]
+
+def make_processor(wind_level: Optional[str] = None) -> "WRFDataProcessor":
+    """요청별 WRFDataProcessor (잘못된 바람 높이는 400)"""
+    try:
+        return WRFDataProcessor(wind_level=wind_level)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@lru_cache(maxsize=1)
+def get_shared_processor() -> "WRFDataProcessor":
+    """요청 간에 공유하는 WRFDataProcessor (타일용, 전체 도메인을 읽음)"""
+    return WRFDataProcessor(crop=False)
+
+@app.on_event("startup")
+def preload_boundary():
+    """경계 shapefile 과 단순화 단계를 요청 전에 미리 준비"""
+    get_boundary(DEFAULT_SHAPEFILE)
+
+@app.on_event("shutdown")
+def close_renderer():
+    """렌더링 워커 프로세스 정리"""
+    frame_renderer.close()
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """요청별 단계 시간을 모아 지연 시간 지표와 Server-Timing 헤더로 내보냄"""
+    timings, token = begin_request()
+    try:
+        response = await call_next(request)
+    finally:
+        end_request(token)
+    route = request.scope.get('route')
+    REQUEST_SECONDS.observe(time.perf_counter() - timings.started,
+                            route=getattr(route, 'path', 'unmatched'), status=response.status_code)
+    if SERVER_TIMING or request.headers.get('X-Server-Timing') == '1':
+        response.headers['Server-Timing'] = timings.server_timing()
+    return response
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     return templates.TemplateResponse("animation.html", {"request": request})
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """프레임/필드/집계 캐시 적중 통계"""
+    return {"frames": frame_cache.stats(), "fields": field_cache.stats(),
+            "aggregate": aggregate_results.stats()}
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus 수집용 지표 (단계별 시간/바이트, 프레임, 캐시, 진행 중 작업)"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profiler")
+def profiler_status(
+    action: Optional[str] = Query(None, description="start or stop"),
+    interval: Optional[float] = Query(None, gt=0, description="Sampling interval in seconds"),
+):
+    """샘플링 프로파일러 상태 확인 / 켜기 / 끄기"""
+    if action == "start":
+        profiler.start(interval)
+    elif action == "stop":
+        profiler.stop()
+    elif action is not None:
+        raise HTTPException(status_code=400, detail="action must be start or stop")
+    return profiler.status()
+
+@app.get("/debug/profiler/stacks")
+def profiler_stacks(limit: Optional[int] = Query(None, gt=0)):
+    """지금까지 모은 스택 샘플 (flamegraph 용 collapsed stack 형식)"""
+    return PlainTextResponse(profiler.collapsed(limit))
+
+def _binary_response(request: Request, payload: bytes, cache_control: str) -> Response:
+    """ETag/If-None-Match 와 gzip(Accept-Encoding) 을 처리한 바이너리 응답"""
+    etag = '"%s"' % hashlib.sha1(payload).hexdigest()
+    headers = {"Cache-Control": cache_control, "ETag": etag, "Vary": "Accept-Encoding"}
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        with stage('compress'):
+            payload = gzip.compress(payload, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=payload, media_type="application/octet-stream", headers=headers)
+
+@app.get("/fields")
+def get_fields_binary(
+    request: Request,
+    start_time: datetime = Query(..., description="Start time (YYYY-MM-DD HH:MM:SS)"),
+    end_time: datetime = Query(..., description="End time (YYYY-MM-DD HH:MM:SS)"),
+    wind_level: Optional[str] = Query(None, description="Wind level: column, 10m, k0, kA-B or ingest"),
+    encoding: str = Query("uint8", description="Array encoding: uint8 (scale/offset) or float16"),
+):
+    """브라우저 렌더링용 T2/U/V 시계열 바이너리 (wrf_field_pack 형식)
+
+    격자 좌표는 헤더의 grid id 로 /fields/grid/{grid}.bin 에서 한 번만 받는다.
+    """
+    if end_time < start_time:
+        raise HTTPException(status_code=400, detail="End time must not be before start time")
+    try:
+        encoding = parse_encoding(encoding)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    timestamps = hourly_timestamps(start_time, end_time)
+    if len(timestamps) > FIELDS_MAX_HOURS:
+        raise HTTPException(status_code=400, detail=f"At most {FIELDS_MAX_HOURS} hours per request")
+
+    processor = make_processor(wind_level)
+    rows = list(processor.iter_fields(timestamps))
+    xlat, xlong = rows[0][1][0], rows[0][1][1]
+    grid = grid_id(xlat, xlong)
+    if grid_payloads.missing([grid]):
+        grid_payloads.put(grid, pack_grid(xlat, xlong))
+    with stage('pack'):
+        payload = pack_fields([ts for ts, _ in rows], [fields for _, fields in rows], encoding,
+                              style=processor.get_frame_style(), grid=grid)
+    add_bytes('pack', len(payload))
+    # 실시간 적재로 같은 구간의 값이 바뀔 수 있으므로 짧게만 캐시
+    return _binary_response(request, payload, "public, max-age=300")
+
+def rebuild_grid_payload(grid: str) -> Optional[bytes]:
+    """디스크 캐시에도 없는 격자 id 를 가장 최근 시각의 (잘라낸) 격자로 다시 만들어 봄"""
+    timestamps = fetch_latest_timestamps(1)
+    if not timestamps:
+        return None
+    xlat, xlong = make_processor().get_fields(timestamps[0])[:2]
+    if grid_id(xlat, xlong) != grid:
+        return None
+    payload = pack_grid(xlat, xlong)
+    grid_payloads.put(grid, payload)
+    return payload
+
+@app.get("/fields/grid/{grid}.bin")
+def get_grid_binary(request: Request, grid: str):
+    """정적 격자 좌표 (내용으로 정한 id 이므로 변하지 않음)"""
+    if not re.fullmatch(r'[0-9a-f]{16}', grid):
+        raise HTTPException(status_code=404, detail="Unknown grid")
+    payload = grid_payloads.get(grid)
+    if payload is None:
+        payload = rebuild_grid_payload(grid)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Unknown grid; request /fields first")
+    return _binary_response(request, payload, "public, max-age=31536000, immutable")
+
+@app.get("/fields/boundary.geojson")
+def get_boundary_geojson():
+    """브라우저 렌더러가 그릴 경계선 (900px canvas 에 맞춰 단순화한 GeoJSON)"""
+    boundary = get_boundary(DEFAULT_SHAPEFILE)
+    return Response(
+        content=boundary.geojson(boundary.tolerance_for({'figsize': (9, 9), 'dpi': 100})),
+        media_type="application/geo+json",
+        headers={"Cache-Control": "public, max-age=86400"}
+    )
+
+@app.get("/frames/{key}.png")
+async def get_frame(key: str):
+    """프레임 캐시에 저장된 단일 프레임 PNG"""
+    if not FRAME_KEY_PATTERN.match(key):
+        raise HTTPException(status_code=404, detail="Frame not found")
+    png = frame_cache.get(key)
+    if png is None:
+        raise HTTPException(status_code=404, detail="Frame not found")
+    # 키가 프레임 내용을 결정하므로 변하지 않음
+    return Response(
+        content=png,
+        media_type="image/png",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+@app.get("/tiles/{var}/{timestamp}/{z}/{x}/{y}.png")
+def get_map_tile(var: str, timestamp: datetime, z: int, x: int, y: int):
+    """WRF_2024_01_NC 격자로 렌더링한 XYZ 지도 타일 (T2 또는 바람)"""
+    if var not in TILE_VARIABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown tile variable: {var}")
+    if not (0 <= z <= 18 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+
+    png = get_tile(var, timestamp, z, x, y, get_shared_processor().get_fields)
+    return Response(
+        content=png,
+        media_type="image/png",
+        headers={"Cache-Control": "public, max-age=86400"}
+    )
+
+@app.get("/timeseries")
+def get_timeseries(
+    lat: float = Query(..., description="Latitude"),
+    lon: float = Query(..., description="Longitude"),
+    start: datetime = Query(..., description="Start time (YYYY-MM-DD HH:MM:SS)"),
+    end: datetime = Query(..., description="End time (YYYY-MM-DD HH:MM:SS)")
+):
+    """지점의 최근접 격자 T2/바람 시계열 (wrf_timeseries.py 로 만든 저장소 사용)"""
+    if end < start:
+        raise HTTPException(status_code=400, detail="End time must not be before start time")
+    try:
+        return query_timeseries(lat, lon, start, end)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/aggregate")
+def get_aggregate(
+    start_time: datetime = Query(..., description="Start time (YYYY-MM-DD HH:MM:SS)"),
+    end_time: datetime = Query(..., description="End time (YYYY-MM-DD HH:MM:SS)"),
+    stat: str = Query("t2_mean", description="Statistic: " + ", ".join(STATISTICS)),
+    format: str = Query("json", description="Output: json or png"),
+    wind_level: Optional[str] = Query(None, description="Wind level: column, 10m, k0, kA-B or ingest"),
+    threshold: float = Query(0.0, description="freezing_hours threshold (°C)"),
+    lat: Optional[float] = Query(None, description="Point latitude (point value / wind rose)"),
+    lon: Optional[float] = Query(None, description="Point longitude"),
+    grid: bool = Query(False, description="Include grid values in JSON"),
+):
+    """기간 통계 지도/바람장미 (시각별 필드를 한 번씩만 읽는 wrf_aggregate 집계)
+
+    한 번 집계하면 모든 통계를 함께 구하므로 같은 구간의 다른 통계는 다시 읽지 않는다.
+    """
+    if end_time < start_time:
+        raise HTTPException(status_code=400, detail="End time must not be before start time")
+    if format not in ("json", "png"):
+        raise HTTPException(status_code=400, detail="format must be json or png")
+    if (lat is None) != (lon is None):
+        raise HTTPException(status_code=400, detail="lat and lon must be given together")
+    try:
+        stat = parse_statistic(stat)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    timestamps = hourly_timestamps(start_time, end_time)
+    if len(timestamps) > AGGREGATE_MAX_HOURS:
+        raise HTTPException(status_code=400, detail=f"At most {AGGREGATE_MAX_HOURS} hours per request")
+
+    processor = make_processor(wind_level)
+    point = None if lat is None else (lat, lon)
+    thresholds = tuple(sorted({0.0, float(threshold)}))
+    stats_key = (start_time, end_time, processor.wind_level, FIELD_SOURCE, processor.crop_bbox, point, thresholds)
+    result_key = stats_key + (stat, format, grid)
+
+    result = aggregate_results.get(result_key)
+    CACHE_REQUESTS.inc(cache='aggregate', result='miss' if result is None else 'hit')
+    if result is None:
+        stats = aggregate_stats.get(stats_key)
+        if stats is None:
+            with IN_FLIGHT.track_inprogress(kind='aggregate'), stage('aggregate'):
+                try:
+                    stats = aggregate(timestamps, processor.crop_bbox, point, processor.wind_level, thresholds,
+                                      'compact' if processor.compact is not None else 'blob')
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+        if stats.hours == 0:
+            raise HTTPException(status_code=404, detail="No data in the requested range")
+
+        if format == "png":
+            with stage('render'):
+                result = render_png(stats, stat, threshold, processor.boundary, processor.crop_bbox)
+            add_bytes('render', len(result))
+        else:
+            result = summary(stats, stat, threshold, include_grid=grid)
+        # 빠진 시각은 실시간 적재로 채워질 수 있으므로 구간이 다 찼을 때만 캐시
+        if stats.hours == len(timestamps):
+            aggregate_stats.put(stats_key, stats)
+            aggregate_results.put(result_key, result)
+
+    if format == "png":
+        return Response(content=result, media_type="image/png",
+                        headers={"Cache-Control": "public, max-age=300"})
+    return result
+
+@app.get("/wrf-result-animation/stream")
+def stream_animation(
+    start_time: datetime = Query(..., description="Start time (YYYY-MM-DD HH:MM:SS)"),
+    end_time: datetime = Query(..., description="End time (YYYY-MM-DD HH:MM:SS)"),
+    wind_level: Optional[str] = Query(None, description="Wind level: column, 10m, k0, kA-B or ingest"),
+):
+    """프레임이 렌더링되는 대로 프레임 URL을 server-sent events 로 전송"""
+    if end_time <= start_time:
+        raise HTTPException(
+            status_code=400,
+            detail="End time must be after start time"
+        )
+
+    processor = make_processor(wind_level)
+    timestamps = hourly_timestamps(start_time, end_time)
+
+    def events():
+        total = len(timestamps)
+        try:
+            with IN_FLIGHT.track_inprogress(kind='stream'):
+                for index, (ts, key, _) in enumerate(processor.iter_frames(timestamps)):
+                    payload = {
+                        "index": index,
+                        "total": total,
+                        "timestamp": ts.isoformat(),
+                        "url": f"/frames/{key}.png",
+                    }
+                    yield f"event: frame\ndata: {json.dumps(payload)}\n\n"
+                yield "event: done\ndata: {}\n\n"
+        except HTTPException as e:
+            yield f"event: error\ndata: {json.dumps({'detail': e.detail})}\n\n"
+        except Exception as e:
+            print(f"프레임 스트리밍 중 오류 발생: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/wrf-result-animation", response_class=HTMLResponse)
 async def generate_animation(
     request: Request,
     start_time: datetime = Query(..., description="Start time (YYYY-MM-DD HH:MM:SS)"),
-    end_time: datetime = Query(..., description="End time (YYYY-MM-DD HH:MM:SS)")
+    end_time: datetime = Query(..., description="End time (YYYY-MM-DD HH:MM:SS)"),
+    stream: bool = Query(False, description="Play frames as they are rendered"),
+    client: bool = Query(False, description="Render frames in the browser from /fields"),
+    wind_level: Optional[str] = Query(None, description="Wind level: column, 10m, k0, kA-B or ingest"),
+    format: str = Query("gif", description="Animation format: gif, webp, mp4 or webm"),
 ):
     """WRF 결과 애니메이션 생성 API 엔드포인트"""
     if end_time <= start_time:
@@ -180,16 +680,47 @@ async def generate_animation(
             status_code=400,
             detail="End time must be after start time"
         )
+    try:
+        fmt = parse_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    processor = WRFDataProcessor()
-    timestamps = [
-        start_time + timedelta(hours=i)
-        for i in range(int((end_time - start_time).total_seconds() / 3600) + 1)
-    ]
+    if client:
+        # 필드 바이너리만 받아서 canvas 에 직접 그림 (서버 렌더링 없음)
+        params = {"start_time": start_time.isoformat(), "end_time": end_time.isoformat()}
+        if wind_level:
+            params["wind_level"] = wind_level
+        return templates.TemplateResponse(
+            "animation.html",
+            {
+                "request": request,
+                "fields_url": f"/fields?{urlencode(params)}"
+            }
+        )
+
+    processor = make_processor(wind_level)
+
+    if stream:
+        # 페이지는 바로 반환하고, 프레임은 /wrf-result-animation/stream 으로 받아 재생
+        params = {"start_time": start_time.isoformat(), "end_time": end_time.isoformat()}
+        if wind_level:
+            params["wind_level"] = wind_level
+        query = urlencode(params)
+        return templates.TemplateResponse(
+            "animation.html",
+            {
+                "request": request,
+                "stream_url": f"/wrf-result-animation/stream?{query}"
+            }
+        )
+
+    timestamps = hourly_timestamps(start_time, end_time)
 
     try:
         # 임시 파일에 애니메이션 생성
-        animation_path = processor.create_animation(timestamps)
+        with IN_FLIGHT.track_inprogress(kind='animation'):
+            animation_path = processor.create_animation(timestamps, fmt=fmt)
+        report = processor.last_encode_report
         
         # 파일을 읽어 Base64로 인코딩
         with open(animation_path, "rb") as f:
@@ -199,13 +730,21 @@ async def generate_animation(
         os.remove(animation_path)
 
         # HTML 템플릿에 인코딩된 애니메이션 전달
-        return templates.TemplateResponse(
+        response = templates.TemplateResponse(
             "animation.html", 
             {
                 "request": request,
-                "image_base64": image_base64_data
+                "image_base64": image_base64_data,
+                "mime_type": report['mime'],
+                "encode_report": report,
             }
         )
+        response.headers['X-Animation-Format'] = report['format']
+        response.headers['X-Animation-Bytes'] = str(report['bytes'])
+        response.headers['X-Encode-Seconds'] = str(report['seconds'])
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -4,16 +4,22 @@ from fastapi.templating import Jinja2Templates
 from datetime import datetime
 import xarray as xr
 import matplotlib.pyplot as plt
-import geopandas as gpd
-import numpy as np
 import base64
 import os
 from matplotlib.gridspec import GridSpec
 import matplotlib.animation as animation
 import tempfile
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 from pathlib import Path
 from fastapi.middleware.cors import CORSMiddleware
+from frame_renderer import FrameRenderer
+from wrf_boundary import DEFAULT_SHAPEFILE, get_boundary
+from animation_encoder import FORMATS, EncoderUnavailable, encode_animation, parse_format
+from wrf_io import dataset_window, extract_fields, parse_wind_level, INGEST_WIND_LEVEL, WindLevelError
+from wrf_timeseries import query_timeseries
+from wrf_catalog import get_catalog
+from wrf_loader import MEMORY_LIMIT_MB, chunk_budget_mb, iter_fields_lazy, lazy_available
+from wrf_memory import MemoryLimitExceeded, PeakRSSMonitor
 
 app = FastAPI(title="WRF Animation Viewer")
 
@@ -27,17 +33,52 @@ app.add_middleware(
 )
 templates = Jinja2Templates(directory="templates")  # HTML 템플릿 폴더 설정
 
+# 프레임 렌더링 프로세스 풀 (WRF_RENDER_WORKERS 로 워커 수 지정)
+frame_renderer = FrameRenderer()
+
+# 파일 읽기 방식: eager = 파일별로 읽음, lazy = 시간 청크 단위 지연 로딩, auto = 긴 구간만 lazy
+NC_LOADER = os.environ.get('WRF_NC_LOADER', 'auto')
+LAZY_MIN_FILES = 24
+
 class WRFDataProcessor:
     def __init__(self, 
                  data_dir: str = "/home/yurim2/WRF/SQL/", 
-                 shapefile_path: str = "/home/yurim2/WRF/pohang_shp/pohang.shp"):
+                 shapefile_path: str = DEFAULT_SHAPEFILE,
+                 renderer: FrameRenderer = frame_renderer,
+                 wind_level: Optional[str] = None,
+                 loader: str = NC_LOADER,
+                 memory_limit_mb: int = MEMORY_LIMIT_MB):
+        self.wind_level = parse_wind_level(wind_level)
+        self.loader = loader
+        self.memory_limit_mb = memory_limit_mb
+        self.last_memory_report = None
+        self.last_encode_report = None
+        if self.wind_level == INGEST_WIND_LEVEL:
+            raise ValueError("wind_level=ingest is only available from the compact DB store")
         self.data_dir = Path(data_dir)
+        self.catalog = get_catalog(data_dir)
         self.shapefile_path = shapefile_path
-        self.gdf = gpd.read_file(shapefile_path)
+        # 앱 시작 시 한 번 읽어 둔 경계 (요청마다 shapefile 을 읽지 않음)
+        self.boundary = get_boundary(shapefile_path)
+        self.gdf = self.boundary.gdf
         plt.switch_backend('Agg')
         
-        self.temp_levels = np.arange(-15.0, 40.0, 0.5)
         self.temp_cmap = 'coolwarm'
+        self.renderer = renderer
+        self.frame_style = {
+            'figsize': (14, 12),
+            'dpi': 100,
+            'levels': (-5.0, 10.0, 0.5),
+            'cmap': self.temp_cmap,
+            'quiver_scale': 300,
+            'quiver_color': 'black',
+            'quiver_alpha': 0.6,
+            'bbox': (128.88, 35.82, 129.6, 36.35),
+            'grid_alpha': 0.3,
+            'colorbar_label': '기온 (°C)',
+            'title_fontsize': 14,
+            'title_pad': 20,
+        }
     
     def _get_datetime_from_filename(self, filename: str) -> datetime:
         try:
@@ -47,14 +88,9 @@ class WRFDataProcessor:
             print(f"Error parsing datetime from filename {filename}: {e}")
             return None
 
-    def find_files_in_timerange(self, start_time: datetime, end_time: datetime) -> List[str]:
-        all_files = sorted(self.data_dir.glob('wrfout_d01_*'))
-        files_in_range = []
-        
-        for file_path in all_files:
-            file_time = self._get_datetime_from_filename(file_path.name)
-            if file_time and start_time <= file_time <= end_time:
-                files_in_range.append(str(file_path))
+    def find_timed_files(self, start_time: datetime, end_time: datetime) -> List[Tuple[datetime, str]]:
+        # 폴더를 매번 훑지 않고 카탈로그(바뀐 파일만 갱신)에서 이분 탐색
+        files_in_range = self.catalog.find(start_time, end_time, 'd01')
         
         if not files_in_range:
             raise HTTPException(
@@ -64,17 +100,38 @@ class WRFDataProcessor:
         
         return files_in_range
 
+    def find_files_in_timerange(self, start_time: datetime, end_time: datetime) -> List[str]:
+        return [path for _, path in self.find_timed_files(start_time, end_time)]
+
+    def _window(self, file_path: str):
+        """그려지는 영역의 잘라내기 범위 (도메인별로 한 번만 계산)"""
+        with xr.open_dataset(file_path) as ds:
+            return dataset_window(ds, self.frame_style['bbox'], align=self.frame_style.get('quiver_stride', 1))
+
+    def iter_frame_data(self, files: List[Tuple[datetime, str]]) -> Iterator[dict]:
+        """프레임 데이터를 시간순으로 생성 (긴 구간은 시간 청크 단위 지연 로딩)"""
+        lazy = self.loader == 'lazy' or (self.loader == 'auto' and len(files) >= LAZY_MIN_FILES)
+        if lazy and not lazy_available():
+            print("dask 가 없어 파일별로 읽습니다.")
+            lazy = False
+
+        if not lazy:
+            for _, file_path in files:
+                print(f"현재 파일: {file_path}")
+                yield self.process_file_data(file_path)
+            return
+
+        window = self._window(files[0][1])
+        for timestamp, (xlat, xlong, t2, u, v) in iter_fields_lazy(
+                files, window, self.wind_level, chunk_budget_mb(self.memory_limit_mb)):
+            yield {'xlat': xlat, 'xlong': xlong, 't2': t2, 'u': u, 'v': v, 'timestamp': timestamp}
+
     def process_file_data(self, file_path: str) -> dict:
         try:
             ds = xr.open_dataset(file_path)
-            xlat = ds['XLAT'].isel(Time=0)
-            xlong = ds['XLONG'].isel(Time=0)
-            t2 = ds['T2'].isel(Time=0) - 273.15
-            
-            u = ds['U'].mean(dim='bottom_top').isel(Time=0)
-            v = ds['V'].mean(dim='bottom_top').isel(Time=0)
-            u_adj = 0.5 * (u[:, :-1] + u[:, 1:])
-            v_adj = 0.5 * (v[:-1, :] + v[1:, :])
+            # 그려지는 영역만 읽도록 T2/U/V 를 읽기 전에 잘라냄 (범위는 도메인별로 한 번만 계산)
+            window = dataset_window(ds, self.frame_style['bbox'], align=self.frame_style.get('quiver_stride', 1))
+            xlat, xlong, t2, u_adj, v_adj = extract_fields(ds, window, self.wind_level)
             
             ds.close()
             
@@ -86,13 +143,16 @@ class WRFDataProcessor:
                 'v': v_adj,
                 'timestamp': self._get_datetime_from_filename(Path(file_path).name)
             }
+        except WindLevelError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             print(f"Error processing file {file_path}: {e}")
             raise HTTPException(status_code=500, detail=f"Error processing WRF file: {str(e)}")
 
-    def create_animation(self, start_time: datetime, end_time: datetime, save_path: str = "/home/yurim2/WRF/SQL/animations") -> str:
+    def create_animation(self, start_time: datetime, end_time: datetime, save_path: str = "/home/yurim2/WRF/SQL/animations",
+                         fmt: str = 'gif') -> str:
         try:
-            wrf_files = self.find_files_in_timerange(start_time, end_time)
+            wrf_files = self.find_timed_files(start_time, end_time)
             print(f"Found {len(wrf_files)} files to process")
 
             if not wrf_files:
@@ -101,97 +161,89 @@ class WRFDataProcessor:
                     detail="No data found for the specified time range"
                 )
                 
-            fig = plt.figure(figsize=(14, 12))
-            gs = GridSpec(1, 1)
-            ax = fig.add_subplot(gs[0])
-
             print(f"총 {len(wrf_files)}개의 파일을 처리합니다.")
-            processed_data = []
-            for file_path in wrf_files:
-                print(f"현재 파일: {file_path}")
-                processed_data.append(self.process_file_data(file_path))
             print("애니메이션 생성 시작")
 
-            # Add a colorbar only once, outside the update function
-            first_data = processed_data[0]
-            contour = ax.contourf(
-                first_data['xlong'], 
-                first_data['xlat'], 
-                first_data['t2'],
-                cmap='coolwarm',
-                levels=np.arange(-5.0, 10.0, 0.5)
-            )
-            plt.colorbar(contour, ax=ax, label='기온 (°C)')
+            # 바람 높이별로 다른 파일, 임시 파일에 쓴 뒤 교체해 동시 요청이 섞이지 않음
+            suffix = FORMATS[fmt]['suffix']
+            save_file_path = os.path.join(save_path, f"wrf_animation_{start_time.strftime('%Y%m%d_%H%M')}_{end_time.strftime('%Y%m%d_%H%M')}_{self.wind_level}{suffix}")
+            fd, tmp_path = tempfile.mkstemp(dir=save_path, suffix=suffix)
+            os.close(fd)
 
-            def update(frame):
-                ax.clear()
-                data = processed_data[frame]
-                
-                contour = ax.contourf(
-                    data['xlong'], 
-                    data['xlat'], 
-                    data['t2'],
-                    cmap='coolwarm',
-                    levels=np.arange(-5.0, 10.0, 0.5)
-                )
-                
-                ax.quiver(
-                    data['xlong'],  # 격자 간격 조정
-                    data['xlat'],
-                    data['u'],
-                    data['v'],
-                    scale=300,
-                    color='black',
-                    alpha=0.6
-                )
-                
-                self.gdf.plot(ax=ax, edgecolor='black', facecolor='none')
-                
-                ax.set_xlim(128.88, 129.6)
-                ax.set_ylim(35.82, 36.35)
-                
-                timestamp_str = data['timestamp'].strftime('%Y-%m-%d %H:%M')
-                ax.set_title(f'포항 지역 기상 예측 - {timestamp_str}', fontsize=14, pad=20)
-                
-                ax.grid(True, linestyle='--', alpha=0.3)
-                
-                return contour,
-
-            ani = animation.FuncAnimation(
-                fig,
-                update,
-                frames=len(processed_data),
-                interval=2000,
-                blit=False
-            )
-
-            # Save to a specific path
-            save_file_path = os.path.join(save_path, f"wrf_animation_{start_time.strftime('%Y%m%d_%H%M')}_{end_time.strftime('%Y%m%d_%H%M')}.gif")
-            print("애니메이션 저장 중...")
-            ani.save(
-                save_file_path,
-                writer='pillow',
-                fps=2
-            )
+            # 처리된 배열도 PNG 목록도 모아두지 않고 렌더링되는 대로 인코더로 흘려보냄,
+            # 렌더링 워커를 포함한 RSS 가 메모리 상한을 넘으면 그 자리에서 중단
+            memory = PeakRSSMonitor(child_pids=self.renderer.worker_pids,
+                                    limit_bytes=self.memory_limit_mb * 1024 * 1024)
+            try:
+                with memory:
+                    frames = (
+                        dict(data, title=f"포항 지역 기상 예측 - {data['timestamp'].strftime('%Y-%m-%d %H:%M')}")
+                        for data in self.iter_frame_data(wrf_files)
+                    )
+                    rendered = self.renderer.render_iter(self.shapefile_path, self.frame_style, frames)
+                    self.last_encode_report = encode_animation(memory.guard(rendered), tmp_path, fmt, fps=2)
+                os.replace(tmp_path, save_file_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            finally:
+                self.last_memory_report = memory.report()
+                print(f"메모리 사용량: {self.last_memory_report}")
+            self.last_encode_report['path'] = save_file_path
             print(f"애니메이션 저장 완료: {save_file_path}")
             
             return save_file_path
 
+        except HTTPException:
+            raise
+        except WindLevelError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except EncoderUnavailable as e:
+            raise HTTPException(status_code=501, detail=str(e))
+        except MemoryLimitExceeded as e:
+            raise HTTPException(status_code=503, detail=f"{e} (WRF_LOADER_MEMORY_MB); request a shorter time range")
         except Exception as e:
             print(f"Animation creation error: {e}")
             raise HTTPException(status_code=500, detail=f"Animation creation failed: {str(e)}")
 
 
+@app.on_event("startup")
+def preload_boundary():
+    """경계 shapefile 과 단순화 단계를 요청 전에 미리 준비"""
+    get_boundary(DEFAULT_SHAPEFILE)
+
+@app.on_event("shutdown")
+def close_renderer():
+    """렌더링 워커 프로세스 정리"""
+    frame_renderer.close()
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     return templates.TemplateResponse("animation.html", {"request": request})
 
 
+@app.get("/timeseries")
+def get_timeseries(
+    lat: float = Query(..., description="Latitude"),
+    lon: float = Query(..., description="Longitude"),
+    start: datetime = Query(..., description="Start time (YYYY-MM-DD HH:MM:SS)"),
+    end: datetime = Query(..., description="End time (YYYY-MM-DD HH:MM:SS)")
+):
+    """지점의 최근접 격자 T2/바람 시계열 (wrf_timeseries.py 로 만든 저장소 사용)"""
+    if end < start:
+        raise HTTPException(status_code=400, detail="End time must not be before start time")
+    try:
+        return query_timeseries(lat, lon, start, end)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @app.get("/wrf-result-animation", response_class=HTMLResponse)
 async def generate_animation(
     request: Request,
     start_time: datetime = Query(..., description="Start time (YYYY-MM-DD HH:MM:SS)"),
-    end_time: datetime = Query(..., description="End time (YYYY-MM-DD HH:MM:SS)")
+    end_time: datetime = Query(..., description="End time (YYYY-MM-DD HH:MM:SS)"),
+    wind_level: Optional[str] = Query(None, description="Wind level: column, 10m, k0 or kA-B"),
+    format: str = Query("gif", description="Animation format: gif, webp, mp4 or webm"),
 ):
     """WRF 결과 애니메이션 생성 API 엔드포인트"""
     if end_time <= start_time:
@@ -200,17 +252,35 @@ async def generate_animation(
             detail="End time must be after start time"
         )
 
-    processor = WRFDataProcessor()
+    try:
+        fmt = parse_format(format)
+        processor = WRFDataProcessor(wind_level=wind_level)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     try:
-        image_base64_data = processor.create_animation(start_time, end_time)
-        return templates.TemplateResponse(
+        animation_path = processor.create_animation(start_time, end_time, fmt=fmt)
+        report = processor.last_encode_report
+        # 저장된 파일은 animations 폴더에 남겨 두고 페이지에는 Base64 로 전달
+        with open(animation_path, "rb") as f:
+            image_base64_data = base64.b64encode(f.read()).decode("utf-8")
+        response = templates.TemplateResponse(
             "animation.html", 
             {
                 "request": request,
-                "image_base64_data": image_base64_data
+                "image_base64": image_base64_data,
+                "mime_type": report['mime'],
+                "encode_report": report,
             }
         )
+        if processor.last_memory_report and processor.last_memory_report['peak_rss_mib'] is not None:
+            response.headers['X-Peak-RSS-MiB'] = str(processor.last_memory_report['peak_rss_mib'])
+        response.headers['X-Animation-Format'] = report['format']
+        response.headers['X-Animation-Bytes'] = str(report['bytes'])
+        response.headers['X-Encode-Seconds'] = str(report['seconds'])
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
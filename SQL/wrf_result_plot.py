@@ -1,19 +1,19 @@
-from flask import Flask, jsonify, send_from_directory
-import psycopg2
+from flask import Flask, jsonify, request, send_from_directory
 import requests
 from bs4 import BeautifulSoup
 import os
+import io
 from urllib.parse import urljoin
-from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import xarray as xr
 import matplotlib.pyplot as plt
-import geopandas as gpd
 import numpy as np
-import tempfile
-from typing import List, Tuple
-from contextlib import contextmanager
-import matplotlib.animation as animation
+from typing import Callable, List, Optional
+from wrf_io import open_nc_bytes, destagger
+from wrf_db import fetch_nc_blob, iter_nc_timestamps
+from wrf_jobs import JobQueue, QueueFull
+from animation_encoder import FORMATS, encode_animation, parse_format
+from wrf_boundary import DEFAULT_SHAPEFILE, draw_boundary, get_boundary
 
 app = Flask(__name__)
 
@@ -21,108 +21,87 @@ app = Flask(__name__)
 STATIC_DIR = os.path.join(app.root_path, 'static')
 os.makedirs(STATIC_DIR, exist_ok=True)  # static 폴더가 없으면 생성
 
-# 비동기 작업을 위한 ThreadPoolExecutor 설정
-executor = ThreadPoolExecutor(max_workers=2)
+# 애니메이션 작업 큐 설정 (동시 실행 수 / 대기 가능 작업 수)
+JOB_WORKERS = int(os.environ.get('WRF_JOB_WORKERS', '2'))
+JOB_MAX_PENDING = int(os.environ.get('WRF_JOB_MAX_PENDING', '8'))
+# 작업 하나가 요청할 수 있는 최대 시간 수 (한 달)
+JOB_MAX_HOURS = int(os.environ.get('WRF_JOB_MAX_HOURS', '744'))
 
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(
-            host="172.27.80.1",
-            database="calpuff",
-            user="postgres",
-            password="1201"
-        )
-        return conn
-    except Exception as e:
-        print("데이터베이스 연결에 실패했습니다:", e)
-    return None
-
-@contextmanager
-def temporary_files():
-    """임시 파일들을 관리하는 context manager"""
-    temp_files = []
-    try:
-        yield temp_files
-    finally:
-        for file in temp_files:
-            try:
-                os.remove(file)
-            except OSError:
-                pass
-            
 class WRFDataProcessor:
-    def __init__(self, shapefile_path: str = "/home/yurim2/WRF/pohang_shp/pohang.shp"):
+    def __init__(self, shapefile_path: str = DEFAULT_SHAPEFILE):
         self.shapefile_path = shapefile_path
-        self.gdf = gpd.read_file(shapefile_path)
+        self.boundary = get_boundary(shapefile_path)
+        self.gdf = self.boundary.gdf
         plt.switch_backend('Agg')
         self.temp_cmap = 'coolwarm'
         
-    def get_db_data(self, timestamp: datetime) -> Tuple[xr.Dataset, str]:
-        """DB에서 데이터를 가져와 xarray Dataset으로 변환"""
-        conn = get_db_connection()
-        if conn is None:
-            raise Exception("Database connection failed")
-        
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute(
-                    "SELECT nc_data FROM WRF_2024_01_NC WHERE timestamp = %s",
-                    (timestamp,)
-                )
-                result = cursor.fetchone()
-                
-                if result is None:
-                    raise Exception(f"No data found for timestamp: {timestamp}")
-
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".nc") as tmp_file:
-                    tmp_file.write(result[0])
-                    return xr.open_dataset(tmp_file.name), tmp_file.name
-        finally:
-            conn.close()
+    def get_db_data(self, timestamp: datetime) -> xr.Dataset:
+        """DB에서 데이터를 가져와 xarray Dataset으로 변환 (사용 후 close 필요)"""
+        nc_data = fetch_nc_blob(timestamp)
+        if nc_data is None:
+            raise Exception(f"No data found for timestamp: {timestamp}")
+        return open_nc_bytes(nc_data)
             
     def process_timestamp_data(self, ds: xr.Dataset) -> dict:
         """단일 시점의 데이터 처리"""
         try:
-            xlat = ds['XLAT'].isel(Time=0)
-            xlong = ds['XLONG'].isel(Time=0)
-            t2 = ds['T2'].isel(Time=0) - 273.15  # Kelvin to Celsius
-            u = ds['U'].mean(dim='bottom_top').isel(Time=0)
-            v = ds['V'].mean(dim='bottom_top').isel(Time=0)
-            u_adj = 0.5 * (u[:, :-1] + u[:, 1:])
-            v_adj = 0.5 * (v[:-1, :] + v[1:, :])
+            xlat = ds['XLAT'].isel(Time=0).values
+            xlong = ds['XLONG'].isel(Time=0).values
+            t2 = ds['T2'].isel(Time=0).values - 273.15  # Kelvin to Celsius
+            u = ds['U'].mean(dim='bottom_top').isel(Time=0).values
+            v = ds['V'].mean(dim='bottom_top').isel(Time=0).values
+            u_adj, v_adj = destagger(u, v)
             return {'xlat': xlat, 'xlong': xlong, 't2': t2, 'u': u_adj, 'v': v_adj}
         except Exception as e:
             print(f"Data processing error: {e}")
             raise Exception(f"Data processing failed: {str(e)}")
 
-    def create_animation(self, timestamps: List[datetime]) -> str:
+    def create_animation(self, timestamps: List[datetime],
+                         progress: Optional[Callable[[int, int], None]] = None,
+                         fmt: str = 'gif') -> dict:
+        """프레임을 PNG 로 그린 뒤 fmt 형식으로 인코딩하고 인코딩 보고(경로, 크기, 시간)를 반환"""
         try:
             fig, ax = plt.subplots(figsize=(10, 10))
+            # 출력 크기에 맞는 단순화 경계를 고르기 위한 표시 범위/크기
+            boundary_style = {'bbox': (128.88, 35.82, 129.6, 36.35), 'figsize': (10, 10), 'dpi': fig.dpi}
             print(f"총 {len(timestamps)}개의 파일을 처리합니다.")
-            processed_data = []
-
-            with temporary_files() as temp_files:
-                for ts in timestamps:
-                    ds, temp_file = self.get_db_data(ts)
-                    temp_files.append(temp_file)
-                    processed_data.append(self.process_timestamp_data(ds))
-                
-                def update(frame):
-                    ax.clear()
-                    data = processed_data[frame]
-                    contour = ax.contourf(data['xlong'], data['xlat'], data['t2'], cmap=self.temp_cmap, levels=np.arange(-5.0, 10.0, 0.5))
-                    ax.quiver(data['xlong'], data['xlat'], data['u'], data['v'], scale=300, color='green')
-                    self.gdf.plot(ax=ax, edgecolor='black', facecolor='none')
-                    ax.set_xlim(128.88, 129.6)
-                    ax.set_ylim(35.82, 36.35)
-                    ax.set_title(timestamps[frame].strftime('%Y-%m-%d %H:%M'))
-                    return contour,
-
-                ani = animation.FuncAnimation(fig, update, frames=len(processed_data), interval=2000, blit=False)
-                save_file_path = os.path.join(STATIC_DIR, f"wrf_animation_{timestamps[0].strftime('%Y%m%d_%H%M')}_{timestamps[-1].strftime('%Y%m%d_%H%M')}.gif")
-                ani.save(save_file_path, writer="pillow", fps=2)
-                print(f"애니메이션 저장 완료: {save_file_path}")
-                return save_file_path
+
+            def update(frame, data):
+                if progress is not None:
+                    progress(frame + 1, len(timestamps))
+                ax.clear()
+                contour = ax.contourf(data['xlong'], data['xlat'], data['t2'], cmap=self.temp_cmap, levels=np.arange(-5.0, 10.0, 0.5))
+                ax.quiver(data['xlong'], data['xlat'], data['u'], data['v'], scale=300, color='green')
+                draw_boundary(ax, self.boundary, boundary_style)
+                ax.set_xlim(128.88, 129.6)
+                ax.set_ylim(35.82, 36.35)
+                ax.set_title(timestamps[frame].strftime('%Y-%m-%d %H:%M'))
+                return contour,
+
+            # 전체 구간을 한 번의 쿼리로 스트리밍하며 시각마다 처리 후 바로 그림 (처리된 배열은 모아두지 않음)
+            frames = []
+            try:
+                for ts, nc_data in iter_nc_timestamps(timestamps):
+                    if ts != timestamps[len(frames)]:
+                        raise Exception(f"No data found for timestamp: {timestamps[len(frames)]}")
+                    ds = open_nc_bytes(nc_data)
+                    try:
+                        data = self.process_timestamp_data(ds)
+                    finally:
+                        ds.close()
+                    update(len(frames), data)
+                    buf = io.BytesIO()
+                    fig.savefig(buf, format='png')
+                    frames.append(buf.getvalue())
+                if len(frames) < len(timestamps):
+                    raise Exception(f"No data found for timestamp: {timestamps[len(frames)]}")
+            finally:
+                plt.close(fig)
+
+            save_file_path = os.path.join(STATIC_DIR, f"wrf_animation_{timestamps[0].strftime('%Y%m%d_%H%M')}_{timestamps[-1].strftime('%Y%m%d_%H%M')}{FORMATS[fmt]['suffix']}")
+            report = encode_animation(frames, save_file_path, fmt, fps=2)
+            print(f"애니메이션 저장 완료: {save_file_path}")
+            return report
         except Exception as e:
             print(f"애니메이션 저장 중 오류 발생: {str(e)}")
             raise Exception(f"Animation creation failed: {str(e)}")
@@ -130,15 +109,93 @@ class WRFDataProcessor:
 
 wrf_processor = WRFDataProcessor()
 
+
+def run_animation_job(job, timestamps: List[datetime], fmt: str = 'gif') -> dict:
+    job.set_progress(0, len(timestamps))
+    report = wrf_processor.create_animation(timestamps, progress=job.set_progress, fmt=fmt)
+    return {'file': os.path.basename(report['path']), 'format': report['format'],
+            'bytes': report['bytes'], 'encode_seconds': report['seconds']}
+
+
+def result_exists(job) -> bool:
+    return os.path.exists(os.path.join(STATIC_DIR, job.result['file']))
+
+
+animation_jobs = JobQueue(run_animation_job, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING,
+                          reuse_result=result_exists)
+
+
+def job_response(job, status_code: int = 200):
+    body = job.to_dict()
+    body['position'] = animation_jobs.position(job)
+    body['status_url'] = f"/RESULT/{job.id}"
+    body['progress_url'] = f"/RESULT/{job.id}/progress"
+    body['result_url'] = f"/RESULT/{job.id}/result"
+    return jsonify(body), status_code
+
 @app.route('/')
 def home():
     return jsonify({"message": "Welcome to the File Download wrf_result_plot Service. Use /RESULT to start the download."})
 
 @app.route('/RESULT', methods=['GET'])
 def result():
-    timestamps = [datetime(2024, 1, 1, hour) for hour in range(6)]  # 예시 타임스탬프
-    future = executor.submit(wrf_processor.create_animation, timestamps)
-    return jsonify({"status": "in_progress", "message": "애니메이션 생성이 시작되었습니다. 생성된 애니메이션은 static 디렉토리에서 확인할 수 있습니다."})
+    """애니메이션 작업 등록 (같은 구간의 작업이 진행 중이면 그 작업을 반환)"""
+    try:
+        start_time = datetime.fromisoformat(request.args.get('start_time', '2024-01-01T00:00:00'))
+        end_time = datetime.fromisoformat(request.args.get('end_time', '2024-01-01T05:00:00'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"잘못된 시간 형식입니다: {e}"}), 400
+    if end_time < start_time:
+        return jsonify({"status": "error", "message": "end_time 이 start_time 보다 앞섭니다."}), 400
+    try:
+        fmt = parse_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    hours = int((end_time - start_time).total_seconds() // 3600)
+    if hours + 1 > JOB_MAX_HOURS:
+        return jsonify({"status": "error",
+                        "message": f"한 작업은 최대 {JOB_MAX_HOURS}시간까지 요청할 수 있습니다 ({hours + 1}시간 요청)."}), 400
+    timestamps = [start_time + timedelta(hours=i) for i in range(hours + 1)]
+    try:
+        job, created = animation_jobs.submit((start_time, end_time, fmt), (timestamps, fmt))
+    except QueueFull as e:
+        response = jsonify({"status": "rejected", "message": f"대기 중인 작업이 너무 많습니다 ({e})."})
+        response.headers['Retry-After'] = '30'
+        return response, 429
+    return job_response(job, 202 if created else 200)
+
+@app.route('/RESULT/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = animation_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "작업을 찾을 수 없습니다."}), 404
+    return job_response(job)
+
+@app.route('/RESULT/<job_id>/progress', methods=['GET'])
+def job_progress(job_id):
+    job = animation_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "작업을 찾을 수 없습니다."}), 404
+    return jsonify({"job_id": job.id, "status": job.status, "done": job.done, "total": job.total,
+                    "position": animation_jobs.position(job)})
+
+@app.route('/RESULT/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = animation_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "작업을 찾을 수 없습니다."}), 404
+    if job.status == 'failed':
+        return jsonify({"job_id": job.id, "status": job.status, "message": job.error}), 500
+    if job.status != 'done':
+        return jsonify({"job_id": job.id, "status": job.status, "message": "작업이 아직 끝나지 않았습니다."}), 409
+    return jsonify({"job_id": job.id, "status": job.status, "url": f"/static/result/{job.result['file']}",
+                    "format": job.result['format'], "bytes": job.result['bytes'],
+                    "encode_seconds": job.result['encode_seconds']})
+
+@app.route('/RESULT/queue', methods=['GET'])
+def job_queue_stats():
+    return jsonify(animation_jobs.stats())
 
 @app.route('/static/result/<path:filename>')
 def serve_file(filename):
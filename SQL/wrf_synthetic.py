@@ -0,0 +1,121 @@
+"""벤치마크/개발용 합성 wrfout 파일 생성
+
+실제 WRF 출력 없이 같은 차원 구성(Time, bottom_top, south_north, west_east 와
+스태거 차원 west_east_stag / south_north_stag)과 XLAT/XLONG/T2/U/V/U10/V10 을 가진
+netCDF 파일을 만든다. 기본 격자는 포항 주변을 덮는다.
+
+    python wrf_synthetic.py /tmp/wrf_synth --hours 24 --ny 120 --nx 150 --nz 30
+"""
+import argparse
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+import xarray as xr
+
+# 포항 (shapefile 범위 128.88~129.6, 35.82~36.35) 을 가운데에 둔 기본 격자
+DEFAULT_CENTER = (36.08, 129.24)
+DEFAULT_SPACING = 0.03
+DEFAULT_BBOX = (128.88, 35.82, 129.6, 36.35)
+
+
+def wrfout_name(timestamp: datetime, domain: str = 'd01') -> str:
+    return f"wrfout_{domain}_{timestamp.strftime('%Y-%m-%d_%H:%M:%S')}"
+
+
+def make_wrfout(timestamp: datetime, ny: int = 60, nx: int = 70, nz: int = 20,
+                center: Tuple[float, float] = DEFAULT_CENTER, spacing: float = DEFAULT_SPACING,
+                seed: Optional[int] = None) -> xr.Dataset:
+    """한 시각의 wrfout 모양 Dataset (float32, Time=1)"""
+    rng = np.random.default_rng(seed if seed is not None else int(timestamp.timestamp()))
+    lat0, lon0 = center
+    lat = lat0 + (np.arange(ny, dtype=np.float32) - (ny - 1) / 2) * spacing
+    lon = lon0 + (np.arange(nx, dtype=np.float32) - (nx - 1) / 2) * spacing
+    xlong, xlat = np.meshgrid(lon, lat)
+
+    hour = timestamp.hour + timestamp.minute / 60
+    diurnal = 4.0 * np.sin((hour - 9) / 24 * 2 * np.pi)
+    t2 = (275.0 + diurnal + 3.0 * np.sin(xlat * 8) * np.cos(xlong * 6)
+          + rng.normal(0, 0.3, (ny, nx)))
+
+    # 높이에 따라 강해지는 서풍 + 공간 변동 (스태거 격자에 바로 생성)
+    level = np.linspace(0.5, 1.5, nz, dtype=np.float32)[:, None, None]
+    u = level * (6.0 + 2.0 * np.sin(np.linspace(0, 3, nx + 1))[None, None, :]) \
+        + rng.normal(0, 0.5, (nz, ny, nx + 1))
+    v = level * (1.5 * np.cos(np.linspace(0, 3, ny + 1))[None, :, None]) \
+        + rng.normal(0, 0.5, (nz, ny + 1, nx))
+
+    def var(data, dims, units, description):
+        return xr.Variable(('Time',) + dims, data[None].astype(np.float32),
+                           {'units': units, 'description': description})
+
+    mass = ('south_north', 'west_east')
+    ds = xr.Dataset({
+        'Times': xr.Variable(('Time',), np.array([timestamp.strftime('%Y-%m-%d_%H:%M:%S')], dtype='S19')),
+        'XLAT': var(xlat, mass, 'degree_north', 'LATITUDE, SOUTH IS NEGATIVE'),
+        'XLONG': var(xlong, mass, 'degree_east', 'LONGITUDE, WEST IS NEGATIVE'),
+        'T2': var(t2, mass, 'K', 'TEMP at 2 M'),
+        'U10': var(u[0, :, :-1], mass, 'm s-1', 'U at 10 M'),
+        'V10': var(v[0, :-1, :], mass, 'm s-1', 'V at 10 M'),
+        'U': var(u, ('bottom_top', 'south_north', 'west_east_stag'), 'm s-1', 'x-wind component'),
+        'V': var(v, ('bottom_top', 'south_north_stag', 'west_east'), 'm s-1', 'y-wind component'),
+    })
+    ds.attrs.update({'TITLE': ' OUTPUT FROM SYNTHETIC WRF FIXTURE', 'DX': spacing * 111000.0,
+                     'DY': spacing * 111000.0, 'SIMULATION_START_DATE': timestamp.strftime('%Y-%m-%d_%H:%M:%S')})
+    return ds
+
+
+def write_wrfout(folder: str, timestamp: datetime, domain: str = 'd01', **kwargs) -> str:
+    """folder 에 wrfout_<domain>_<시각> 파일을 쓰고 경로를 반환"""
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, wrfout_name(timestamp, domain))
+    ds = make_wrfout(timestamp, **kwargs)
+    ds.to_netcdf(path, format='NETCDF4', unlimited_dims=['Time'])
+    return path
+
+
+def generate(folder: str, start: datetime = datetime(2024, 1, 1), hours: int = 6,
+             domain: str = 'd01', **kwargs) -> List[Tuple[datetime, str]]:
+    """start 부터 1시간 간격으로 hours 개 파일 생성"""
+    files = []
+    for i in range(hours):
+        timestamp = start + timedelta(hours=i)
+        files.append((timestamp, write_wrfout(folder, timestamp, domain, **kwargs)))
+    return files
+
+
+def write_boundary(path: str, bbox=DEFAULT_BBOX) -> str:
+    """bbox 를 덮는 단순 경계 shapefile (실제 포항 shapefile 대용)"""
+    import geopandas as gpd
+    from shapely.geometry import box
+
+    minx, miny, maxx, maxy = bbox
+    dx, dy = (maxx - minx) / 4, (maxy - miny) / 4
+    geometry = [box(minx + dx, miny + dy, maxx - dx, maxy - dy),
+                box(minx + 2 * dx, miny + 0.5 * dy, maxx - 0.5 * dx, miny + 2 * dy)]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    gpd.GeoDataFrame({'name': ['a', 'b']}, geometry=geometry, crs='EPSG:4326').to_file(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="합성 wrfout 파일 생성")
+    parser.add_argument('folder')
+    parser.add_argument('--start', type=datetime.fromisoformat, default=datetime(2024, 1, 1))
+    parser.add_argument('--hours', type=int, default=6)
+    parser.add_argument('--ny', type=int, default=60)
+    parser.add_argument('--nx', type=int, default=70)
+    parser.add_argument('--nz', type=int, default=20)
+    parser.add_argument('--boundary', help="경계 shapefile 도 함께 만들 경로")
+    args = parser.parse_args()
+
+    files = generate(args.folder, args.start, args.hours, ny=args.ny, nx=args.nx, nz=args.nz)
+    size = sum(os.path.getsize(path) for _, path in files)
+    print(f"{len(files)}개 파일 생성 ({size / 1024 / 1024:.1f} MiB): {args.folder}")
+    if args.boundary:
+        print(f"경계 shapefile: {write_boundary(args.boundary)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""WRF 격자 필드로 XYZ 지도 타일(Web Mercator, 256x256 PNG) 렌더링
+
+Leaflet/folium 지도에서 `/tiles/{var}/{timestamp}/{z}/{x}/{y}.png` 형식으로 사용한다.
+렌더링된 타일은 메모리 + 디스크 캐시에 저장되며, 최근 N시간 타일을 미리 만들어 둘 수 있다.
+
+    python wrf_tiles.py --hours 24 --zoom 8 12
+"""
+import argparse
+import hashlib
+import io
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from wrf_cache import FrameCache
+
+TILE_SIZE = 256
+TILE_VARIABLES = ('t2', 'wind')
+EARTH_RADIUS = 6378137.0
+MAX_LATITUDE = 85.0511287798
+
+TILE_STYLE = {
+    'levels': (-15.0, 40.0, 0.5),
+    'cmap': 'coolwarm',
+    'alpha': 0.7,
+    'quiver_spacing': 24,  # 바람 벡터 간격 (픽셀)
+    'quiver_color': 'black',
+}
+
+TILE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tile_cache")
+tile_cache = FrameCache(TILE_CACHE_DIR, max_memory_bytes=128 * 1024 * 1024)
+
+
+def _empty_tile() -> bytes:
+    fig = Figure(figsize=(1, 1), dpi=TILE_SIZE)
+    fig.patch.set_alpha(0)
+    buf = io.BytesIO()
+    FigureCanvasAgg(fig).print_png(buf)
+    return buf.getvalue()
+
+
+EMPTY_TILE = _empty_tile()
+
+
+def tile_key(var: str, timestamp: datetime, z: int, x: int, y: int) -> str:
+    raw = f"{var}|{timestamp.isoformat()}|{z}/{x}/{y}|{sorted(TILE_STYLE.items())!r}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def mercator_y(lat):
+    lat = np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE)
+    return EARTH_RADIUS * np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+
+def mercator_x(lon):
+    return EARTH_RADIUS * np.radians(lon)
+
+
+def tile_mercator_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """타일의 (xmin, ymin, xmax, ymax) Web Mercator 좌표"""
+    size = 2 * math.pi * EARTH_RADIUS / (2 ** z)
+    origin = math.pi * EARTH_RADIUS
+    return (-origin + x * size, origin - (y + 1) * size,
+            -origin + (x + 1) * size, origin - y * size)
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """타일의 (west, south, east, north) 경위도"""
+    n = 2 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def tiles_for_bbox(bbox, z: int) -> Iterator[Tuple[int, int]]:
+    """(west, south, east, north) 영역을 덮는 z 레벨의 타일 (x, y)"""
+    west, south, east, north = bbox
+    n = 2 ** z
+
+    def to_tile(lon, lat):
+        lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+        tx = int((lon + 180.0) / 360.0 * n)
+        ty = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+        return min(max(tx, 0), n - 1), min(max(ty, 0), n - 1)
+
+    x0, y0 = to_tile(west, north)
+    x1, y1 = to_tile(east, south)
+    for tx in range(x0, x1 + 1):
+        for ty in range(y0, y1 + 1):
+            yield tx, ty
+
+
+def _crop(fields: tuple, bounds, pad: int = 2) -> Optional[tuple]:
+    """타일 영역(+여유 격자)에 해당하는 부분 격자만 잘라낸다"""
+    xlat, xlong = fields[0], fields[1]
+    west, south, east, north = bounds
+    inside = (xlong >= west) & (xlong <= east) & (xlat >= south) & (xlat <= north)
+    rows = np.flatnonzero(inside.any(axis=1))
+    cols = np.flatnonzero(inside.any(axis=0))
+    if rows.size == 0:
+        # 타일이 격자 셀 하나보다 작을 수 있으므로 가장 가까운 셀 기준으로 다시 확인
+        lat_c, lon_c = (south + north) / 2, (west + east) / 2
+        if not (xlat.min() <= lat_c <= xlat.max() and xlong.min() <= lon_c <= xlong.max()):
+            return None
+        dist = (xlat - lat_c) ** 2 + (xlong - lon_c) ** 2
+        i, j = np.unravel_index(np.argmin(dist), dist.shape)
+        rows, cols = np.array([i]), np.array([j])
+    i0, i1 = max(rows[0] - pad, 0), min(rows[-1] + pad + 1, xlat.shape[0])
+    j0, j1 = max(cols[0] - pad, 0), min(cols[-1] + pad + 1, xlat.shape[1])
+    return tuple(field[i0:i1, j0:j1] for field in fields)
+
+
+def render_tile(var: str, fields: tuple, z: int, x: int, y: int) -> bytes:
+    """(xlat, xlong, t2, u, v) 필드로 타일 하나를 렌더링"""
+    cropped = _crop(fields, tile_bounds(z, x, y))
+    if cropped is None or min(cropped[0].shape) < 2:
+        return EMPTY_TILE
+    xlat, xlong, t2, u, v = cropped
+
+    fig = Figure(figsize=(1, 1), dpi=TILE_SIZE)
+    fig.patch.set_alpha(0)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_axis_off()
+    xmin, ymin, xmax, ymax = tile_mercator_bounds(z, x, y)
+
+    mx, my = mercator_x(xlong), mercator_y(xlat)
+    if var == 't2':
+        ax.contourf(mx, my, t2, levels=np.arange(*TILE_STYLE['levels']),
+                    cmap=TILE_STYLE['cmap'], alpha=TILE_STYLE['alpha'], extend='both')
+    else:
+        # 타일 안에 보이는 격자 수에 맞춰 화살표 간격 조정
+        cells = max(xlat.shape[1] * (xmax - xmin) / max(np.ptp(mx), 1.0), 1.0)
+        stride = max(int(math.ceil(cells / (TILE_SIZE / TILE_STYLE['quiver_spacing']))), 1)
+        ax.quiver(mx[::stride, ::stride], my[::stride, ::stride],
+                  u[::stride, ::stride], v[::stride, ::stride],
+                  color=TILE_STYLE['quiver_color'], pivot='middle')
+    ax.set_xlim(xmin, xmax)
+    ax.set_ylim(ymin, ymax)
+
+    buf = io.BytesIO()
+    FigureCanvasAgg(fig).print_png(buf)
+    return buf.getvalue()
+
+
+def get_tile(var: str, timestamp: datetime, z: int, x: int, y: int, load_fields) -> bytes:
+    """캐시에서 타일을 찾고, 없으면 load_fields(timestamp) 로 필드를 읽어 렌더링"""
+    key = tile_key(var, timestamp, z, x, y)
+    png = tile_cache.get(key)
+    if png is None:
+        png = render_tile(var, load_fields(timestamp), z, x, y)
+        tile_cache.put(key, png)
+    return png
+
+
+def _render_batch(args) -> list:
+    """한 시각의 필드로 타일 여러 개를 렌더링해 (키, PNG) 로 반환 (캐시 저장은 부모 프로세스)
+
+    필드는 작업마다가 아니라 (시각, 워커) 당 한 번만 전달된다.
+    """
+    timestamp, fields, tiles = args
+    return [(tile_key(var, timestamp, z, x, y), render_tile(var, fields, z, x, y))
+            for var, z, x, y in tiles]
+
+
+def seed_tiles(hours: int, zooms, variables=TILE_VARIABLES, workers: int = 1) -> int:
+    """최근 hours 시간의 타일을 미리 렌더링하여 캐시에 저장"""
+    from wrf_db import fetch_latest_timestamps, iter_nc_timestamps
+    from wrf_io import extract_fields, open_nc_bytes
+
+    timestamps = fetch_latest_timestamps(hours)
+    if not timestamps:
+        print("미리 만들 시각이 없습니다.")
+        return 0
+
+    t0 = time.perf_counter()
+    rendered = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for timestamp, nc_data in iter_nc_timestamps(timestamps):
+            ds = open_nc_bytes(nc_data)
+            try:
+                fields = extract_fields(ds)
+            finally:
+                ds.close()
+            bbox = (float(fields[1].min()), float(fields[0].min()),
+                    float(fields[1].max()), float(fields[0].max()))
+            tiles = [
+                (var, z, x, y)
+                for z in zooms
+                for x, y in tiles_for_bbox(bbox, z)
+                for var in variables
+            ]
+            # 이미 캐시에 있는 타일은 부모에서 걸러 내고, 남은 타일을 워커 수만큼 나눔
+            keys = [tile_key(var, timestamp, z, x, y) for var, z, x, y in tiles]
+            missing = set(tile_cache.missing(keys))
+            todo = [tile for tile, key in zip(tiles, keys) if key in missing]
+            # 줌 레벨별 타일 수가 크게 다르므로 번갈아 나눠 워커 부담을 맞춤
+            batches = [(timestamp, fields, todo[i::workers]) for i in range(workers) if todo[i::workers]]
+            count = 0
+            for results in executor.map(_render_batch, batches):
+                for key, png in results:
+                    tile_cache.put(key, png)
+                count += len(results)
+            rendered += count
+            print(f"{timestamp}: 타일 {count}/{len(tiles)}개 렌더링")
+
+    print(f"타일 {rendered}개 렌더링 완료 ({time.perf_counter() - t0:.1f}s)")
+    return rendered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="최근 N시간의 WRF 지도 타일 미리 렌더링")
+    parser.add_argument('--hours', type=int, default=24)
+    parser.add_argument('--zoom', type=int, nargs=2, default=(6, 11), metavar=('MIN', 'MAX'))
+    parser.add_argument('--var', nargs='+', choices=TILE_VARIABLES, default=list(TILE_VARIABLES))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    seed_tiles(args.hours, range(args.zoom[0], args.zoom[1] + 1), args.var, args.workers)
+
+
+if __name__ == '__main__':
+    main()
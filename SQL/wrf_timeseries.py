@@ -0,0 +1,301 @@
+"""격자점 시계열 조회 (최근접 격자 KD-tree + 시간 우선 배열 저장소)
+
+시각별 파일/BYTEA 를 모두 여는 대신, (ny, nx, nt) 순서의 float32 배열로 저장해 두어
+한 지점의 한 달치 시계열을 연속된 한 번의 읽기로 가져온다.
+
+저장소 만들기:
+    python wrf_timeseries.py --start 2024-01-01T00:00 --end 2024-01-31T23:00
+    python wrf_timeseries.py --start 2024-01-01T00:00 --end 2024-01-31T23:00 --from-dir /home/yurim2/WRF/WRF-4.1.2/test/em_real
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import xarray as xr
+from scipy.spatial import cKDTree
+
+from wrf_cache import LRUCache
+from wrf_io import extract_fields, parse_wrfout_time
+
+SERIES_VARIABLES = ('t2', 'u', 'v')
+EARTH_RADIUS_KM = 6371.0
+TIMESERIES_DIR = os.environ.get(
+    'WRF_TIMESERIES_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "timeseries_store")
+)
+WRITE_BLOCK_HOURS = 24
+
+
+def _to_xyz(lat, lon) -> np.ndarray:
+    """경위도를 단위 구 위의 3차원 좌표로 변환"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+class GridIndex:
+    """XLAT/XLONG 격자의 최근접 격자점 검색"""
+
+    def __init__(self, xlat: np.ndarray, xlong: np.ndarray):
+        self.shape = xlat.shape
+        xyz = _to_xyz(xlat, xlong)
+        self.tree = cKDTree(xyz.reshape(-1, 3))
+        # 가장 넓은 격자 간격의 1.5배보다 멀면 도메인 밖으로 판단
+        spacing = max(np.linalg.norm(xyz[:, 1:] - xyz[:, :-1], axis=-1).max(),
+                      np.linalg.norm(xyz[1:, :] - xyz[:-1, :], axis=-1).max())
+        self.max_chord = 1.5 * spacing
+
+    def query(self, lat: float, lon: float) -> Optional[Tuple[int, int, float]]:
+        """(i, j, 거리 km), 도메인 밖이면 None"""
+        chord, index = self.tree.query(_to_xyz(lat, lon))
+        if chord > self.max_chord:
+            return None
+        i, j = np.unravel_index(index, self.shape)
+        distance_km = 2 * EARTH_RADIUS_KM * np.arcsin(min(chord / 2, 1.0))
+        return int(i), int(j), float(distance_km)
+
+
+class TimeSeriesStore:
+    """한 도메인의 시간 우선 배열 저장소 (변수별 (ny, nx, nt) float32 memmap)
+
+    한 시간 간격의 [start, start + nt 시간) 구간을 저장하며, 데이터가 없는 시각은 NaN 이다.
+    """
+
+    def __init__(self, path: str, mode: str = 'r'):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.shape = (self.meta['ny'], self.meta['nx'], self.meta['nt'])
+        self.start = datetime.fromisoformat(self.meta['start'])
+        self.nt = self.meta['nt']
+        self.xlat = np.load(os.path.join(path, 'xlat.npy'))
+        self.xlong = np.load(os.path.join(path, 'xlong.npy'))
+        self.arrays = {
+            var: np.memmap(os.path.join(path, f'{var}.f4'), dtype='<f4', mode=mode, shape=self.shape)
+            for var in SERIES_VARIABLES
+        }
+        self._index = None
+        self._index_lock = threading.Lock()
+        self.locations = LRUCache(max_items=4096)
+        self.series_cache = LRUCache(max_items=256, max_bytes=64 * 1024 * 1024)
+
+    @classmethod
+    def create(cls, path: str, xlat: np.ndarray, xlong: np.ndarray, start: datetime, hours: int,
+               domain: str = 'd01') -> 'TimeSeriesStore':
+        """빈 저장소 생성 (모든 값 NaN)"""
+        os.makedirs(path, exist_ok=True)
+        ny, nx = xlat.shape
+        np.save(os.path.join(path, 'xlat.npy'), np.asarray(xlat, dtype=np.float32))
+        np.save(os.path.join(path, 'xlong.npy'), np.asarray(xlong, dtype=np.float32))
+        for var in SERIES_VARIABLES:
+            array = np.memmap(os.path.join(path, f'{var}.f4'), dtype='<f4', mode='w+', shape=(ny, nx, hours))
+            array[:] = np.nan
+            array.flush()
+            del array
+        # meta.json 을 마지막에 써서 완성된 저장소만 열리도록 함
+        meta = {'domain': domain, 'ny': ny, 'nx': nx, 'nt': hours,
+                'start': start.isoformat(), 'variables': list(SERIES_VARIABLES)}
+        tmp_path = os.path.join(path, 'meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(path, 'meta.json'))
+        return cls(path, mode='r+')
+
+    @property
+    def index(self) -> GridIndex:
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    self._index = GridIndex(self.xlat, self.xlong)
+        return self._index
+
+    @property
+    def timestamps(self) -> List[datetime]:
+        return [self.start + timedelta(hours=k) for k in range(self.nt)]
+
+    def locate(self, lat: float, lon: float) -> Optional[Tuple[int, int, float]]:
+        """지점의 최근접 격자 (캐시됨)"""
+        key = (round(lat, 5), round(lon, 5))
+        found = self.locations.get(key)
+        if found is None:
+            found = self.index.query(lat, lon) or ()
+            self.locations.put(key, found)
+        return found or None
+
+    def time_slice(self, start: datetime, end: datetime) -> slice:
+        """[start, end] 구간의 시간 인덱스 범위 (저장 구간으로 잘림)"""
+        k0 = int(np.ceil((start - self.start).total_seconds() / 3600))
+        k1 = int(np.floor((end - self.start).total_seconds() / 3600)) + 1
+        return slice(min(max(k0, 0), self.nt), min(max(k1, 0), self.nt))
+
+    def read_series(self, i: int, j: int, start: datetime, end: datetime) -> Tuple[List[datetime], dict]:
+        """격자점 (i, j) 의 [start, end] 시계열"""
+        window = self.time_slice(start, end)
+        key = (i, j, window.start, window.stop)
+        series = self.series_cache.get(key)
+        if series is None:
+            # (ny, nx, nt) 배치이므로 변수마다 연속된 구간 한 번만 읽음
+            series = {var: np.array(self.arrays[var][i, j, window]) for var in SERIES_VARIABLES}
+            self.series_cache.put(key, series)
+        times = [self.start + timedelta(hours=k) for k in range(window.start, window.stop)]
+        return times, series
+
+    def write_block(self, k0: int, block: dict):
+        """시간 인덱스 k0 부터 (ny, nx, n) 블록 쓰기"""
+        for var in SERIES_VARIABLES:
+            values = block[var]
+            self.arrays[var][:, :, k0:k0 + values.shape[2]] = values
+
+    def flush(self):
+        for array in self.arrays.values():
+            array.flush()
+
+
+_store = None
+_store_mtime = None
+_store_lock = threading.Lock()
+
+
+def get_store(path: str = TIMESERIES_DIR) -> Optional[TimeSeriesStore]:
+    """읽기용 저장소 (다시 만들어졌으면 새로 연다, 없으면 None)"""
+    global _store, _store_mtime
+    meta_path = os.path.join(path, 'meta.json')
+    try:
+        mtime = os.path.getmtime(meta_path)
+    except OSError:
+        return None
+    with _store_lock:
+        if _store is None or _store.path != path or _store_mtime != mtime:
+            _store = TimeSeriesStore(path)
+            _store_mtime = mtime
+        return _store
+
+
+def query_timeseries(lat: float, lon: float, start: datetime, end: datetime,
+                     path: str = TIMESERIES_DIR) -> dict:
+    """지점 시계열을 JSON 으로 보낼 수 있는 dict 로 반환
+
+    저장소가 없거나 지점이 도메인 밖이면 LookupError.
+    """
+    store = get_store(path)
+    if store is None:
+        raise LookupError("Time-series store has not been built")
+    found = store.locate(lat, lon)
+    if found is None:
+        raise LookupError(f"Point ({lat}, {lon}) is outside the WRF domain")
+    i, j, distance_km = found
+    times, series = store.read_series(i, j, start, end)
+
+    def to_list(values):
+        return [None if np.isnan(x) else round(float(x), 3) for x in values]
+
+    speed = np.hypot(series['u'], series['v'])
+    return {
+        'lat': lat,
+        'lon': lon,
+        'grid': {'i': i, 'j': j,
+                 'xlat': float(store.xlat[i, j]), 'xlong': float(store.xlong[i, j]),
+                 'distance_km': round(distance_km, 3)},
+        'timestamps': [t.isoformat() for t in times],
+        't2': to_list(series['t2']),
+        'u': to_list(series['u']),
+        'v': to_list(series['v']),
+        'wind_speed': to_list(speed),
+    }
+
+
+def _iter_db_fields(start: datetime, end: datetime) -> Iterator[Tuple[datetime, tuple]]:
+    from wrf_db import iter_nc_range
+    from wrf_io import open_nc_bytes
+
+    for timestamp, nc_data in iter_nc_range(start, end):
+        ds = open_nc_bytes(nc_data)
+        try:
+            yield timestamp, extract_fields(ds)
+        finally:
+            ds.close()
+
+
+def _iter_file_fields(folder: str, start: datetime, end: datetime) -> Iterator[Tuple[datetime, tuple]]:
+    files = sorted(
+        (ts, path) for path in glob.glob(os.path.join(folder, 'wrfout_d01_*'))
+        for ts in [parse_wrfout_time(path)]
+        if ts is not None and start <= ts <= end
+    )
+    for timestamp, path in files:
+        with xr.open_dataset(path) as ds:
+            yield timestamp, extract_fields(ds)
+
+
+def build_store(start: datetime, end: datetime, path: str = TIMESERIES_DIR,
+                folder: Optional[str] = None, domain: str = 'd01') -> int:
+    """[start, end] 구간의 시계열 저장소를 새로 만듦 (folder 가 없으면 DB 에서 읽음)"""
+    hours = int((end - start).total_seconds() // 3600) + 1
+    source = _iter_file_fields(folder, start, end) if folder else _iter_db_fields(start, end)
+
+    t0 = time.perf_counter()
+    tmp_path = path.rstrip('/') + '.building'
+    store = None
+    block, block_k0, count = None, 0, 0
+
+    def flush_block():
+        if block is not None:
+            store.write_block(block_k0, block)
+
+    for timestamp, (xlat, xlong, t2, u, v) in source:
+        k = int((timestamp - start).total_seconds() // 3600)
+        if store is None:
+            store = TimeSeriesStore.create(tmp_path, xlat, xlong, start, hours, domain)
+        # WRITE_BLOCK_HOURS 시간씩 모아서 써서 (ny, nx, nt) 배열의 페이지를 덜 건드림
+        if block is None or not (block_k0 <= k < block_k0 + WRITE_BLOCK_HOURS):
+            flush_block()
+            block_k0 = k - k % WRITE_BLOCK_HOURS
+            n = min(WRITE_BLOCK_HOURS, hours - block_k0)
+            block = {var: np.full(xlat.shape + (n,), np.nan, dtype=np.float32) for var in SERIES_VARIABLES}
+        for var, values in zip(SERIES_VARIABLES, (t2, u, v)):
+            block[var][:, :, k - block_k0] = values
+        count += 1
+        if count % 24 == 0:
+            print(f"{timestamp} 까지 {count}개 시각 처리 ({time.perf_counter() - t0:.1f}s)")
+
+    if store is None:
+        print("저장할 데이터가 없습니다.")
+        return 0
+    flush_block()
+    store.flush()
+    del store
+
+    # 완성된 저장소로 교체
+    if os.path.isdir(path):
+        old_path = path.rstrip('/') + '.old'
+        # 중단된 이전 교체가 남긴 .old 가 있으면 그 위로 옮길 수 없으므로 먼저 지움
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path)
+    else:
+        os.replace(tmp_path, path)
+    print(f"총 {count}/{hours}개 시각 저장 완료 ({time.perf_counter() - t0:.1f}s): {path}")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="격자점 시계열 저장소 생성")
+    parser.add_argument('--start', type=datetime.fromisoformat, required=True)
+    parser.add_argument('--end', type=datetime.fromisoformat, required=True)
+    parser.add_argument('--path', default=TIMESERIES_DIR)
+    parser.add_argument('--from-dir', dest='folder', help="DB 대신 wrfout 파일 폴더에서 읽음")
+    parser.add_argument('--domain', default='d01')
+    args = parser.parse_args()
+    build_store(args.start, args.end, args.path, args.folder, args.domain)
+
+
+if __name__ == '__main__':
+    main()